@@ -6,14 +6,78 @@
 
 import os
 import sys
+import bz2
 import copy
+import gzip
+import math
+import json
+import hashlib
+import time
+import itertools
 import random
 import tempfile
+import functools
+import threading
 import subprocess
 
+import numpy as np
 import networkx as nx
-from operator import itemgetter
 import multiprocessing as mp
+import multiprocessing.util
+from queue import Queue
+
+from OmicsIntegrator.forest_telemetry import stage, telemetryMark, \
+    telemetryRecords, telemetryEnabled
+from OmicsIntegrator.forest_profile import profiledTask
+from OmicsIntegrator.forest_store import RunStore
+from OmicsIntegrator.forest_mitab import isMitab, MitabReader
+
+
+# Types of the parameters read by PCSFInput.readParameters, by attribute name
+PARAMETER_TYPES = {
+    "w": float, "b": float, "D": int, "mu": float, "gb": float, "r": float,
+    "g": float, "noise": float, "threads": int, "processes": int,
+}
+
+
+class ForestError(Exception):
+    """Base class of the errors raised by Forest"""
+
+
+class InputError(ForestError):
+    """Raised when the input files or parameters are invalid"""
+
+
+class SolverError(ForestError):
+    """
+    Raised when msgsteiner fails or returns a forest that does not match its
+    input
+    """
+
+
+class OutputError(ForestError):
+    """Raised when output files could not be written"""
+
+
+class BudgetExceeded(ForestError):
+    """Raised when a run is stopped because the time budget is used up"""
+
+
+def negativePrizes(degrees, mu, musquared):
+    """
+    Vectorized score of a numpy array of node degrees
+
+    RETURNS: numpy array of the negative prizes of the degrees
+    """
+    if mu <= 0:
+        raise ValueError("User variable mu is not greater than zero.")
+    # The same operations as score, so the prizes are the same floats
+    values = -degrees.astype(np.float64)
+    if musquared:
+        values = -(values * values)
+    values = values * mu
+    values[degrees == 1] = 0.0
+    return values
 
 
 def score(value, mu, musquared):
@@ -79,11 +143,10 @@ class PCSFInput(object):
                 self.mu, self.g, self.r, self.threads, self.noise - parameters
         """
         if prizeFile is None or edgeFile is None:
-            sys.exit("PCSF.py failed. Needs -p and -e arguments."
-                     "Run PCSF.py -h for help.")
-        warnings = 0
-        selfedges = 0
-        knockoutCount = 0
+            raise InputError(
+                "PCSF.py failed. Needs -p and -e arguments."
+                "Run PCSF.py -h for help."
+            )
         # Check that dummyMode is a valid entry
         if (
             dummyMode != "terminals"
@@ -91,17 +154,51 @@ class PCSFInput(object):
             and dummyMode != "others"
         ):
             try:
-                dummyFile = open(dummyMode, "r")
+                open(dummyMode, "r").close()
             except Exception:
-                sys.exit(
+                raise InputError(
                     'dummyMode value not recognized. Accepted values include'
                     ' "all", "terminals", "others", or a path to a text file'
                     ' on your computer containing a list of proteins.'
                 )
 
+        warnings = self.readParameters(confFile)
+        # Keep track of nodes for dummyMode all and shufflePrizes
+        warnings += self.readEdges(
+            edgeFile, knockout, dummyMode == "all" or shuffle != 0
+        )
+        warnings += self.readPrizes(prizeFile, garnet)
+
+        print(
+            "Input prize files and edge files have been successfully read.\n"
+        )
+
+        warnings += self.connectDummyNode(dummyMode)
+        self.musquared = musquared
+
+        self.assignNegPrizes(musquared, excludeT)
+
+        if warnings > 0:
+            print(
+                "THERE WERE %s WARNING(S) WHEN READING THE INPUT FILES.\n"
+                % warnings
+            )
+
+    def readParameters(self, confFile):
+        """
+        Reads the parameters w, b, D, mu, garnetBeta, r, g, noise, threads,
+        processes and the PSI-MITAB options mitabScore and mitabNames from
+        confFile, with defaults for all but w, b and D.
+
+        RETURNS: the number of warnings
+        """
+        warnings = 0
         # Read configuration file to record parameters for this object
         print(("Reading text file containing parameters %s..." % confFile))
         c = open(confFile, "r")
+        # Defaults of the PSI-MITAB options, see MitabReader
+        mitabScore = None
+        mitabNames = None
         for line in c:
             if line.startswith("w ="):
                 w = line.strip().split()[-1]
@@ -123,6 +220,11 @@ class PCSFInput(object):
                 processes = line.strip().split()[-1]
             if line.startswith("noise ="):
                 noise = line.strip().split()[-1]
+            # Values of the PSI-MITAB options may contain spaces
+            if line.startswith("mitabScore ="):
+                mitabScore = line.split("=", 1)[1].strip()
+            if line.startswith("mitabNames ="):
+                mitabNames = line.split("=", 1)[1].strip()
         c.close()
         try:
             mu = float(mu)
@@ -151,7 +253,8 @@ class PCSFInput(object):
         except Exception:
             noise = 0.333  # Default edge noise (standard deviation)
         try:
-            threads = int(threads)
+            # 0 lets the ThreadScheduler choose the threads of every run
+            threads = 0 if threads == "auto" else int(threads)
         except Exception:
             threads = 1
         try:
@@ -163,9 +266,11 @@ class PCSFInput(object):
                   " g = %f, garnetBeta = %f, r = %f, noise = %f."
                   % (float(w), float(b), int(D), mu, g, gb, r, noise))
         except Exception:
-            sys.exit("ERROR: There was a problem reading the file containing"
-                     " parameters. Please include appropriate values for w, b,"
-                     " D, and optionally mu, r, garnetBeta, g, or noise.")
+            raise InputError(
+                "ERROR: There was a problem reading the file containing"
+                " parameters. Please include appropriate values for w, b,"
+                " D, and optionally mu, r, garnetBeta, g, or noise."
+            )
         self.w = float(w)
         self.b = float(b)
         self.D = int(D)
@@ -176,54 +281,92 @@ class PCSFInput(object):
         self.noise = noise
         self.threads = threads
         self.processes = processes
+        self.mitabScore = mitabScore or None
+        self.mitabNames = mitabNames or None
+        return warnings
+
+    def readEdges(self, edgeFile, knockout, trackNodes):
+        """
+        Reads the interactome edges of edgeFile into self.dirEdges and
+        self.undirEdges, leaving out the edges of knockout proteins and
+        self-edges. If trackNodes is True, self.interactomeNodes lists all
+        nodes in the interactome, otherwise it is empty.
+
+        RETURNS: the number of warnings
+        """
+        readStage = stage("parse_edges").start()
+        warnings = 0
+        selfedges = 0
+        knockoutCount = 0
 
         print("Reading text file containing interactome edges: %s..."
               % edgeFile)
         dirEdges = {}
         undirEdges = {}
-        interactomeNodes = []
+        # Ordered set of the nodes, a dictionary keeps the order they are
+        # first seen in
+        interactomeNodes = {}
         try:
-            e = open(edgeFile, "r")
+            e = openInputFile(edgeFile)
         except IOError:
-            sys.exit("ERROR: No such file %s, aborting program.\n" % edgeFile)
+            raise InputError(
+                "ERROR: No such file %s, aborting program.\n" % edgeFile
+            )
         line = e.readline()
-        words = line.strip().split()
-        try:
-            words[2] = float(words[2])
-        except ValueError:
-            # Skipping header line
-            line = e.readline()
-        # See if edgeFile contains directionality infomation in 4th column
-        if len(words) == 3:
+        mitab = None
+        if isMitab(line):
+            # PSI-MITAB interactions are undirected edges
             col = 3
-            print("File does not contain direction information."
-                  " Treating all edges as undirected\n")
-        elif len(words) == 4:
-            col = 4
-            print("File contains four columns. Fourth column will be"
-                  " interpreted as directionality information\n")
+            print("File is in PSI-MITAB format. Treating all edges as"
+                  " undirected\n")
+            mitab = MitabReader(itertools.chain([line], e), self.mitabScore,
+                                self.mitabNames)
+            rows = iter(mitab)
         else:
-            print("current line:", line)
-            sys.exit("ERROR: File containing interactome edges should have 3"
-                     " or 4 columns: ProteinA\tProteinB\tWeight\t"
-                     "Directionality(U or D). Protein names should not"
-                     " have spaces.")
+            words = line.strip().split()
+            try:
+                words[2] = float(words[2])
+            except ValueError:
+                # Skipping header line
+                line = e.readline()
+            # See if edgeFile contains directionality infomation in 4th
+            # column
+            if len(words) == 3:
+                col = 3
+                print("File does not contain direction information."
+                      " Treating all edges as undirected\n")
+            elif len(words) == 4:
+                col = 4
+                print("File contains four columns. Fourth column will be"
+                      " interpreted as directionality information\n")
+            else:
+                print("current line:", line)
+                raise InputError(
+                    "ERROR: File containing interactome edges should have 3"
+                    " or 4 columns: ProteinA\tProteinB\tWeight\t"
+                    "Directionality(U or D). Protein names should not"
+                    " have spaces."
+                )
+            # Lines are read as they are used, large files are not loaded
+            # whole
+            rows = ((line, line.strip().split())
+                    for line in itertools.chain([line], e) if line)
         # to avoid printing out too many warnings,
         # here is a way to tally up edited edges
         below_0, above1 = 0, 0
         # Add each edge in edgeFile to undirEdges or dirEdges dictionary,
         # appropriately
-        while line:
-            words = line.strip().split()
+        for (line, words) in rows:
             if len(words) != col:
                 print("current line:", line)
-                sys.exit("ERROR: All lines in the file containing the"
-                         " interactome edges should have the same number"
-                         " of columns. Protein names should not have spaces.")
+                raise InputError(
+                    "ERROR: All lines in the file containing the"
+                    " interactome edges should have the same number"
+                    " of columns. Protein names should not have spaces."
+                )
             # Check for knockouts:
             if words[0] in knockout or words[1] in knockout:
                 knockoutCount += 1
-                line = e.readline()
                 continue
             # Make sure edge weights are numbers between 0 and 0.99
             try:
@@ -236,13 +379,14 @@ class PCSFInput(object):
                     words[2] = "0.99"
                     warnings += 1
             except Exception:
-                sys.exit("ERROR: Your interactome edge file include a"
-                         " non-numerical value in the third column."
-                         " Aborting program.")
+                raise InputError(
+                    "ERROR: Your interactome edge file include a"
+                    " non-numerical value in the third column."
+                    " Aborting program."
+                )
             # Check for self-edges
             if words[0] == words[1]:
                 selfedges += 1
-                line = e.readline()
                 continue
             # Add all edges to undirEdges if there is no directionality
             # information
@@ -275,7 +419,6 @@ class PCSFInput(object):
                     # protein pair, only keep directed
                     if words[0] in dirEdges:
                         if words[1] in dirEdges[words[0]]:
-                            line = e.readline()
                             continue
                     if words[0] not in undirEdges:
                         undirEdges[words[0]] = {}
@@ -324,15 +467,14 @@ class PCSFInput(object):
                                 del undirEdges[words[1]]
                 else:
                     print(("current line:", line))
-                    sys.exit("ERROR: The fourth column in the file containing"
-                             " interactome edges should only contain U or D.")
+                    raise InputError(
+                        "ERROR: The fourth column in the file containing"
+                        " interactome edges should only contain U or D."
+                    )
             # Keep track of nodes for dummyMode all and shufflePrizes
-            if dummyMode == "all" or shuffle != 0:
-                if words[0] not in interactomeNodes:
-                    interactomeNodes.append(words[0])
-                if words[1] not in interactomeNodes:
-                    interactomeNodes.append(words[1])
-            line = e.readline()
+            if trackNodes:
+                interactomeNodes[words[0]] = None
+                interactomeNodes[words[1]] = None
         e.close()
 
         # dirEndpoints stores edge endpoints of all directed edges together in
@@ -342,8 +484,10 @@ class PCSFInput(object):
             dirEndpoints.add(k)
             for k2 in list(v.keys()):
                 dirEndpoints.add(k2)
-
-        self.interactomeNodes = interactomeNodes
+        self.dirEndpoints = dirEndpoints
+        self.dirEdges = dirEdges
+        self.undirEdges = undirEdges
+        self.interactomeNodes = list(interactomeNodes)
         if above1 > 0:
             print("WARNING!! All edgeweights should be a probability of"
                   " protein interaction. "
@@ -357,13 +501,63 @@ class PCSFInput(object):
                   + " of your edge weights include a number below than 0. "
                   "These were changed to 0...\n")
 
+        # Warning for self-edges
+        if selfedges > 0:
+            print(
+                    "WARNING: There were %i self-edges in your interactome."
+                    " We ignored these edges.\n" % selfedges
+            )
+            warnings += 1
+
+        # Notice for knockouts
+        if knockoutCount > 0:
+            print(
+                "There were %i edges connected to your knockout"
+                " protein(s). We ignored these edges.\n" % knockoutCount
+            )
+
+        # Warnings for PSI-MITAB interactions that could not be used
+        if mitab is not None and mitab.missingNames > 0:
+            print(
+                "WARNING: %i interactions in your interactome have no %s"
+                " name for one of their interactors. We ignored these"
+                " interactions.\n"
+                % (mitab.missingNames, self.mitabNames or "identifier")
+            )
+            warnings += 1
+        if mitab is not None and mitab.missingScores > 0:
+            print(
+                "WARNING: %i interactions in your interactome have no %s"
+                " confidence score. We ignored these interactions.\n"
+                % (mitab.missingScores, self.mitabScore or "numerical")
+            )
+            warnings += 1
+
+        readStage.stop()
+        return warnings
+
+    def readPrizes(self, prizeFile, garnet):
+        """
+        Reads the prizes of prizeFile, and of the garnet file of TF
+        regression results if garnet is not None, into self.origPrizes and
+        self.terminalTypes. Proteins not in the interactome are ignored.
+
+        RETURNS: the number of warnings
+        """
+        readStage = stage("read_prizes").start()
+        warnings = 0
+        undirEdges = self.undirEdges
+        dirEndpoints = self.dirEndpoints
+
         print("Reading text file containing prizes: %s...\n" % prizeFile)
         origPrizes = {}
         terminalTypes = {}
         try:
             p = open(prizeFile, "r")
         except IOError:
-            sys.exit("ERROR: No such file %s, aborting program.\n" % prizeFile)
+            raise InputError(
+                "ERROR: No such file %s, aborting program.\n" % prizeFile
+            )
         # Count how many of these proteins are not in the interactome
         count = 0
         # Add each node in prizeFile to origPrizes dictionary
@@ -378,9 +572,11 @@ class PCSFInput(object):
             words = line.strip().split()
             if len(words) != 2:
                 print(("current line:", line))
-                sys.exit("ERROR: File containing prizes should have exactly"
-                         "two columns: ProteinName\tPrizeValue. Protein names"
-                         " should not have spaces.")
+                raise InputError(
+                    "ERROR: File containing prizes should have exactly"
+                    "two columns: ProteinName\tPrizeValue. Protein names"
+                    " should not have spaces."
+                )
             # Increase count if this is not in the interactome
             if words[0] not in undirEdges and words[0] not in dirEndpoints:
                 count += 1
@@ -400,10 +596,12 @@ class PCSFInput(object):
                         words = line.strip().split()
                         if len(words) != 2:
                             print("current line:", line)
-                            sys.exit("ERROR: File containing TFs should have"
-                                     " exactly two columns: TF_Name\t"
-                                     "PrizeValue. TF names should not have"
-                                     " spaces.")
+                            raise InputError(
+                                "ERROR: File containing TFs should have"
+                                " exactly two columns: TF_Name\t"
+                                "PrizeValue. TF names should not have"
+                                " spaces."
+                            )
                         # Increase count if this is not in the interactome
                         if (
                             words[0] not in undirEdges
@@ -422,14 +620,16 @@ class PCSFInput(object):
                                 terminalTypes[words[0]] = "TF"
                         line = g.readline()
             else:
-                sys.exit("ERROR: No such garnet file %s" % garnet)
+                raise InputError(
+                    "ERROR: No such garnet file %s" % garnet
+                )
 
         # Warning if supplied proteins were not in the interactome
         percentexcluded = (
             count / float(len(list(origPrizes.keys())) + count)
         ) * 100
         if percentexcluded > 90:
-            sys.exit(
+            raise InputError(
                 "ERROR: %i percent of your prize nodes are not included in"
                 " the interactome! Make sure the protein names you are using"
                 " are the same in your prize file as in your edge file."
@@ -447,24 +647,24 @@ class PCSFInput(object):
             )
             warnings += 1
 
-        # Warning for self-edges
-        if selfedges > 0:
-            print(
-                    "WARNING: There were %i self-edges in your interactome."
-                    " We ignored these edges.\n" % selfedges
-            )
-            warnings += 1
+        self.origPrizes = origPrizes
+        self.terminalTypes = terminalTypes
+        readStage.stop()
+        return warnings
 
-        # Notice for knockouts
-        if knockoutCount > 0:
-            print(
-                "There were %i edges connected to your knockout"
-                " protein(s). We ignored these edges.\n" % knockoutCount
-            )
+    def connectDummyNode(self, dummyMode):
+        """
+        Sets self.dummyNodeNeighbors, the nodes the dummy node has edges to,
+        depending on dummyMode (see __init__)
 
-        print(
-            "Input prize files and edge files have been successfully read.\n"
-        )
+        RETURNS: the number of warnings
+        """
+        warnings = 0
+        origPrizes = self.origPrizes
+        dirEdges = self.dirEdges
+        undirEdges = self.undirEdges
+        dirEndpoints = self.dirEndpoints
+        interactomeNodes = self.interactomeNodes
 
         # Connect dummy node to nodes in interactome, depending on dummyMode
         dummyNodeNeighbors = []
@@ -483,32 +683,24 @@ class PCSFInput(object):
                 % len(interactomeNodes)
             )
         elif dummyMode == "others":
-            nonterminalNodes = []
-            for node1 in undirEdges:
-                for node2 in undirEdges[node1]:
-                    if (
-                        node2 not in origPrizes
-                        and node2 not in nonterminalNodes
-                    ):
-                        nonterminalNodes.append(node2)
-                if node1 not in origPrizes and node1 not in nonterminalNodes:
-                    nonterminalNodes.append(node1)
-            for node1 in dirEdges:
-                for node2 in dirEdges[node1]:
-                    if (
-                        node2 not in nonterminalNodes
-                        and node2 not in origPrizes
-                    ):
-                        nonterminalNodes.append(node2)
-                if node1 not in nonterminalNodes and node1 not in origPrizes:
-                    nonterminalNodes.append(node1)
-            dummyNodeNeighbors = nonterminalNodes
+            # Ordered set of the nodes without prizes, in the order they are
+            # first seen in
+            nonterminalNodes = {}
+            for edges in (undirEdges, dirEdges):
+                for node1 in edges:
+                    for node2 in edges[node1]:
+                        if node2 not in origPrizes:
+                            nonterminalNodes[node2] = None
+                    if node1 not in origPrizes:
+                        nonterminalNodes[node1] = None
+            dummyNodeNeighbors = list(nonterminalNodes)
             print(
                 "Dummy node has been added, with edges to all %i nodes in"
                 " the interactome which have not been assigned prizes.\n"
                 % len(nonterminalNodes)
             )
         else:
+            dummyFile = open(dummyMode, "r")
             # Keep track of how many genes on dummyNeighbors list are actually
             # in interactome
             countNeighbors = 0.00
@@ -525,7 +717,7 @@ class PCSFInput(object):
                 line = dummyFile.readline()
             dummyFile.close()
             if countNeighbors == 0:
-                sys.exit(
+                raise InputError(
                     "The file you provided for dummyMode does not"
                     " contain any proteins in the interactome. Each"
                     " line in your text file should contain the name of"
@@ -551,28 +743,92 @@ class PCSFInput(object):
                 % int(countNeighbors)
             )
 
-        self.terminalTypes = terminalTypes
-        self.origPrizes = origPrizes
-        self.dirEdges = dirEdges
-        self.undirEdges = undirEdges
+
         self.dummyNodeNeighbors = dummyNodeNeighbors
-        self.musquared = musquared
+        return warnings
 
-        self.assignNegPrizes(musquared, excludeT)
+    @classmethod
+    def interactome(cls, edgeFile, confFile, knockout=(), trackNodes=True):
+        """
+        Reads only an interactome and the default parameters for it, without
+        prizes. Input objects for different prize files share it with
+        withPrizes, so the interactome is read once for many jobs.
+
+        INPUT: edgeFile, confFile, knockout - as for __init__
+               trackNodes - False to not list the interactome nodes, which
+                            dummyMode "all" and shufflePrizes need
 
+        RETURNS: a PCSFInput object with no prizes
+        """
+        inputObj = cls.__new__(cls)
+        warnings = inputObj.readParameters(confFile)
+        warnings += inputObj.readEdges(edgeFile, knockout, trackNodes)
+        inputObj.origPrizes = {}
+        inputObj.terminalTypes = {}
+        inputObj.negPrizes = {}
+        inputObj.totalPrizes = {}
+        inputObj.dummyNodeNeighbors = []
+        inputObj.musquared = False
+        if warnings > 0:
+            print(
+                "THERE WERE %s WARNING(S) WHEN READING THE INTERACTOME.\n"
+                % warnings
+            )
+        return inputObj
+
+    def withPrizes(self, prizeFile, dummyMode="terminals", garnet=None,
+                   confFile=None, parameters=None, musquared=False,
+                   excludeT=False):
+        """
+        Returns a PCSFInputOverlay sharing the interactome of this object,
+        with the prizes of prizeFile (and garnet) and the dummy node
+        connected according to dummyMode, as __init__ would read them.
+
+        INPUT: confFile - text file of parameters replacing those of this
+                          object, or None to keep them
+               parameters - dictionary of parameter values replacing those
+                            of this object and confFile, by attribute
+                            name, e.g. {"w": 5.0, "mu": 0.01}
+               The other arguments are the same as for __init__
+        """
+        if (
+            dummyMode not in ("terminals", "all", "others")
+            and not os.path.exists(dummyMode)
+        ):
+            raise InputError(
+                'dummyMode value not recognized. Accepted values include'
+                ' "all", "terminals", "others", or a path to a text file'
+                ' on your computer containing a list of proteins.'
+            )
+        newObj = PCSFInputOverlay(self, {}, {}, {})
+        warnings = 0
+        if confFile is not None:
+            warnings += newObj.readParameters(confFile)
+        for (name, value) in (parameters or {}).items():
+            if name not in PARAMETER_TYPES:
+                raise InputError(
+                    "ERROR: Unknown parameter %s." % name
+                )
+            setattr(newObj, name, PARAMETER_TYPES[name](value))
+        warnings += newObj.readPrizes(prizeFile, garnet)
+        warnings += newObj.connectDummyNode(dummyMode)
+        newObj.musquared = musquared
+        newObj.assignNegPrizes(musquared, excludeT)
         if warnings > 0:
             print(
                 "THERE WERE %s WARNING(S) WHEN READING THE INPUT FILES.\n"
                 % warnings
             )
+        return newObj
 
     def assignNegPrizes(self, musquared, excludeT):
         """
         Scales original prizes by beta and adds negative prizes to penalize
         nodes with high degrees if mu > 0.
         Scales original prizes by beta if mu = 0.
-        mu < 0 will cause score function to throw a ValueError.
+        mu < 0 will cause negativePrizes to throw a ValueError.
         """
+        negStage = stage("neg_prizes").start()
         negPrizes = {}
         totalPrizes = {}
 
@@ -588,30 +844,34 @@ class PCSFInput(object):
                     "Terminals will retain their assigned prizes,"
                     " no negative prizes."
                 )
-            DegreeDict = self.degreeNegPrize()
-            for prot in self.origPrizes:
-                if not excludeT:
-                    try:
-                        degree = DegreeDict[prot]
-                        negprize = score(degree, self.mu, musquared)
-                        prize = (
-                            self.b * float(self.origPrizes[prot])
-                        ) + negprize
-                        totalPrizes[prot] = prize
-                        negPrizes[prot] = negprize
-                    except KeyError:
-                        continue
-                else:
-                    totalPrizes[prot] = self.b * float(self.origPrizes[prot])
+            (nodes, degrees, position) = self.nodeDegrees()
+            negative = negativePrizes(degrees, self.mu, musquared)
+            origPrizes = self.origPrizes
+            if not excludeT:
+                # Prizes of nodes without edges are left out
+                prizeNodes = [prot for prot in origPrizes if prot in position]
+                prizeNeg = negative[
+                    np.array([position[prot] for prot in prizeNodes],
+                             dtype=np.int64)
+                ]
+                prizes = self.b * np.array(
+                    [float(origPrizes[prot]) for prot in prizeNodes]
+                ) + prizeNeg
+                totalPrizes = dict(zip(prizeNodes, prizes.tolist()))
+                negPrizes = dict(zip(prizeNodes, prizeNeg.tolist()))
+            else:
+                for prot in origPrizes:
+                    totalPrizes[prot] = self.b * float(origPrizes[prot])
                     negPrizes[prot] = 0
-            for protein in DegreeDict:
-                if protein not in self.origPrizes:
-                    degree = DegreeDict[protein]
-                    if degree > 0:
-                        negprize = score(degree, self.mu, musquared)
-                        if negprize != 0:
-                            negPrizes[protein] = negprize
-                            totalPrizes[protein] = negprize
+            # Other nodes only get a negative prize
+            others = negative != 0
+            others[[position[prot] for prot in origPrizes
+                    if prot in position]] = False
+            others = np.flatnonzero(others)
+            values = negative[others].tolist()
+            otherNodes = [nodes[i] for i in others]
+            negPrizes.update(zip(otherNodes, values))
+            totalPrizes.update(zip(otherNodes, values))
         else:
             for prot in self.origPrizes:
                 prize = float(self.origPrizes[prot]) * self.b
@@ -620,22 +880,110 @@ class PCSFInput(object):
 
         self.negPrizes = negPrizes
         self.totalPrizes = totalPrizes
+        negStage.stop()
 
     def degreeNegPrize(self):
         """
-        Helper function for use in assigning negative prizes (when mu != 0)
+        RETURNS: dictionary of the degree of every interactome node, see
+                 nodeDegrees
+        """
+        (nodes, degrees, position) = self.nodeDegrees()
+        return dict(zip(nodes, degrees.tolist()))
+
+    def nodeDegrees(self):
+        """
+        Degrees of the interactome nodes for the negative prizes, the number
+        of distinct neighbors of every node over directed and undirected
+        edges. Built once per interactome and cached, overlays share the
+        degrees of their base object.
+
+        RETURNS: nodes - list of node names, in the order they first appear
+                         in the edges
+                 degrees - numpy array of the degrees of nodes
+                 position - dictionary of the position of every node in
+                            nodes
+        """
+        owner = getattr(self, "base", self)
+        cached = owner.__dict__.get("_nodeDegrees")
+        if cached is not None:
+            return cached
+        neighbors = {}
+        for edges in (self.dirEdges, self.undirEdges):
+            for protA in edges:
+                for protB in edges[protA]:
+                    neighbors.setdefault(protA, set()).add(protB)
+                    neighbors.setdefault(protB, set()).add(protA)
+        nodes = list(neighbors)
+        degrees = np.fromiter((len(neighbors[node]) for node in nodes),
+                              dtype=np.int64, count=len(nodes))
+        position = dict((node, i) for (i, node) in enumerate(nodes))
+        owner._nodeDegrees = (nodes, degrees, position)
+        return owner._nodeDegrees
+
+    def degreeIndex(self):
+        """
+        Index of the interactome nodes sorted by outdegree, used to draw
+        degree-matched random terminals. Built once per interactome and
+        cached, overlays share the index of their base object.
+
+        RETURNS: nodes - list of node names sorted by outdegree
+                 degrees - numpy array of the sorted outdegrees
+                 bucketStart, bucketEnd - numpy arrays with, for every
+                                          position in degrees, the first and
+                                          one past the last position of the
+                                          nodes with the same degree
+                 rank - dictionary of the position of every node in nodes
+        """
+        owner = getattr(self, "base", self)
+        cached = owner.__dict__.get("_degreeIndex")
+        if cached is not None:
+            return cached
+        # outdegree of every node in the interactome
+        names = []
+        counts = []
+        for node in self.undirEdges:
+            names.append(node)
+            counts.append(
+                len(self.undirEdges[node]) + len(self.dirEdges.get(node, ()))
+            )
+        for node in self.dirEdges:
+            if node not in self.undirEdges:
+                names.append(node)
+                counts.append(len(self.dirEdges[node]))
+        counts = np.array(counts, dtype=np.int64)
+        order = np.argsort(counts, kind="mergesort")
+        nodes = [names[i] for i in order]
+        degrees = counts[order]
+        # Bucket boundaries of each run of equal degrees
+        values, starts = np.unique(degrees, return_index=True)
+        ends = np.append(starts[1:], len(degrees))
+        bucket = np.searchsorted(values, degrees)
+        rank = dict((node, i) for i, node in enumerate(nodes))
+        owner._degreeIndex = (
+            nodes, degrees, starts[bucket], ends[bucket], rank
+        )
+        return owner._degreeIndex
+
+    def runtimeFeatures(self):
+        """
+        RETURNS: dictionary of the size of the msgsteiner input of this
+                 object, counted as in solverUsage but without writing the
+                 input, with the depth "D" and the "threads", for
+                 RuntimeModel.predict
         """
-        G = nx.Graph()
-        degreeDict = {}
-        for protA in self.dirEdges:
-            for protB in self.dirEdges[protA]:
-                G.add_edge(protA, protB)
-        for protA in self.undirEdges:
-            for protB in self.undirEdges[protA]:
-                G.add_edge(protA, protB)
-        for node in G.nodes():
-            degreeDict[node] = G.degree(node)
-        return degreeDict
+        dirEdges = self.dirEdges
+        undirEdges = self.undirEdges
+        # Undirected edges are stored in both directions
+        edges = sum(len(dirEdges[node]) for node in dirEdges) + sum(
+            len(undirEdges[node]) for node in undirEdges) // 2
+        return {
+            "nodes": len(self.dirEndpoints.union(undirEdges)),
+            "edges": edges,
+            "prizes": len(self.totalPrizes),
+            "dummyEdges": len(self.dummyNodeNeighbors),
+            "D": self.D,
+            "threads": self.threads,
+        }
 
     def getInputInfo(self):
         """
@@ -673,81 +1021,95 @@ class PCSFInput(object):
             + self.noise
         )
 
-    def runPCSF(self, seed):
+    def solverInput(self):
         """
-        Passes the information in this input object to msgsteiner, and
-        returns the results.
-
-        INPUT: seed - random state
-
-        RETURNS: edgeList - the contents of stdout from msgsteiner: a
-                            list of edges in the optimal Forest info -
-                            the contents of stderr from msgsteiner: if
-                            all goes well, a report on the
-                            optimization
+        RETURNS: the lines of the msgsteiner input of this object, the
+                 edges with their costs, the dummy node edges and the
+                 prizes, sorted, followed by the prize of the dummy node and
+                 the root
         """
-        print(
-            "Preparing information to send to the message passing"
-            " algorithm...\n"
-        )
-        # Create a list of the input information for the msgsteiner subprocess
-        input = tempfile.TemporaryFile(mode="r+")
-        for edgeNode1 in self.dirEdges:
-            for edgeNode2 in self.dirEdges[edgeNode1]:
+        # Local references avoid repeated attribute lookups, which go through
+        # the base object for a PCSFInputOverlay
+        dirEdges = self.dirEdges
+        undirEdges = self.undirEdges
+        lines = []
+        for edgeNode1 in dirEdges:
+            for edgeNode2 in dirEdges[edgeNode1]:
                 # directed edges are flipped so that they point towards the
                 # root node Weights are converted to costs by using 1-weight
                 # (good for Psiquic, needs to be changed -log2(weight)
                 # for String)
-                input.write(
+                lines.append(
                     "D %s %s %f\n"
                     % (
                         edgeNode2,
                         edgeNode1,
-                        1 - float(self.dirEdges[edgeNode1][edgeNode2]),
+                        1 - float(dirEdges[edgeNode1][edgeNode2]),
                     )
                 )
         edgesAdded = {}
-        for edgeNode1 in self.undirEdges:
-            for edgeNode2 in self.undirEdges[edgeNode1]:
+        for edgeNode1 in undirEdges:
+            for edgeNode2 in undirEdges[edgeNode1]:
                 # keep track of undirected edges added so they are only
                 # included once in inputList
                 try:
                     edgesAdded[edgeNode2][edgeNode1] = 2
                 except KeyError:
-                    input.write(
+                    lines.append(
                         "E %s %s %f\n"
                         % (
                             edgeNode1,
                             edgeNode2,
-                            1 - float(self.undirEdges[edgeNode1][edgeNode2]),
+                            1 - float(undirEdges[edgeNode1][edgeNode2]),
                         )
                     )
                     edgesAdded[edgeNode1] = {edgeNode2: 1}
         for node in self.dummyNodeNeighbors:
-            input.write("D %s DUMMY %.4f\n" % (node, self.w))
+            lines.append("D %s DUMMY %.4f\n" % (node, self.w))
         for node in self.totalPrizes:
-            input.write("W %s %f\n" % (node, float(self.totalPrizes[node])))
-
+            lines.append("W %s %f\n" % (node, float(self.totalPrizes[node])))
+        # msgsteiner reads its input sorted
+        lines.sort()
+        lines.append("W DUMMY 100.0\n")
+        lines.append("R DUMMY\n\n")
+        return lines
+
+    def runPCSF(self, seed, deadline=None):
         """
-        sort input for msgsteiner:
-        read from input,
-        sort list,
-        write back to input file
+        Passes the information in this input object to msgsteiner, and
+        returns the results.
+
+        INPUT: seed - random state
+               deadline - time (as returned by time.time()) at which
+                          msgsteiner is killed and BudgetExceeded raised, or
+                          None to wait until msgsteiner is done
+
+        RETURNS: edgeList - the contents of stdout from msgsteiner: a
+                            list of edges in the optimal Forest info -
+                            the contents of stderr from msgsteiner: if
+                            all goes well, a report on the
+                            optimization, followed by the resources used
+                            by msgsteiner
+
+        OUTPUT: self.solverUsage - dictionary of the resources used by
+                msgsteiner and the size of its input, see solverUsage
         """
-        input.seek(0)
-        lines = input.readlines()
-        lines = sorted(lines)
-        input.close()
+        print(
+            "Preparing information to send to the message passing"
+            " algorithm...\n"
+        )
+        # Create a temporary file of the input information for the
+        # msgsteiner subprocess
         input = tempfile.TemporaryFile(mode="r+")
-        for item in lines:
-            input.write(item)
-        input.write("W DUMMY 100.0\n")
-        input.write("R DUMMY\n\n")
+        with stage("solver_input"):
+            lines = self.solverInput()
+            input.write("".join(lines))
 
         print("Input is processed. Piping to msgsteiner code...\n")
 
         # Run msgsteiner as subprocess. Using temporary files for stdin and
         # stdout to avoid broken pipes when data is too big
+        threads = self.threads or acquireThreads()
         subprocArgs = [
             'msgsteiner',
             "-d",
@@ -760,7 +1122,7 @@ class PCSFInput(object):
             "-g",
             str(self.g),
             "-j",
-            str(self.threads),
+            str(threads),
         ]
         # Only supply seed to msgsteiner if one is given by user
         # Use the seed to set the -s (instance seed, which controls random
@@ -773,89 +1135,589 @@ class PCSFInput(object):
             subprocArgs.append(str(seed))
         out = tempfile.TemporaryFile()
         input.seek(0)  # return to first line of temporary file for reading
-        subproc = subprocess.Popen(
-            subprocArgs,
-            bufsize=1,
-            stdin=input,
-            stdout=out,
-            stderr=subprocess.PIPE,
-        )
-        errcode = subproc.wait()
-        if errcode:
-            errmess = subproc.stderr.read()
-            errmess = errmess.decode('utf-8')
-            sys.exit(
-                "ERROR: There was a problem running the message passing"
-                " algorithm. <%s>: %s"
-                % (errcode, errmess)
-            )
+        start = time.time()
+        rusage = None
+        subproc = None
+        # The temporary files and the stderr pipe are closed whatever
+        # happens, failed runs must not leak them in long-lived processes
+        try:
+            try:
+                subproc = subprocess.Popen(
+                    subprocArgs,
+                    bufsize=1,
+                    stdin=input,
+                    stdout=out,
+                    stderr=subprocess.PIPE,
+                )
+            except OSError as e:
+                raise SolverError(
+                    "ERROR: The msgsteiner code could not be run: %s" % e
+                )
+            try:
+                with stage("msgsteiner"):
+                    (errcode, rusage) = waitProcess(subproc, deadline)
+            except subprocess.TimeoutExpired:
+                subproc.kill()
+                subproc.wait()
+                raise BudgetExceeded(
+                    "msgsteiner was stopped at the end of the time budget"
+                )
+            info = subproc.stderr.read()
+            info = info.decode('utf-8')
+            if errcode:
+                raise SolverError(
+                    "ERROR: There was a problem running the message passing"
+                    " algorithm. <%s>: %s"
+                    % (errcode, info)
+                )
+            out.seek(0)
+            edgeList = out.read()
+            edgeList = edgeList.decode('utf-8')
+        finally:
+            if not self.threads:
+                releaseThreads(threads, time.time() - start, rusage)
+            input.close()
+            out.close()
+            if subproc is not None:
+                subproc.stderr.close()
         print(
             "Message passing run finished with the parameters: w = %s,"
             " b = %s, D = %s, mu = %s, g = %s, r = %s\n"
             % (self.w, self.b, self.D, self.mu, self.g, self.r)
         )
-        input.close()
-        info = subproc.stderr.read()
-        info = info.decode('utf-8')
-        subproc.stderr.close()
-        out.seek(0)
-        edgeList = out.read()
-        edgeList = edgeList.decode('utf-8')
-        out.close()
+        # Resources used by msgsteiner, and the size of its input
+        prizes = len(self.totalPrizes)
+        dummyEdges = len(self.dummyNodeNeighbors)
+        self.solverUsage = solverUsage(
+            time.time() - start,
+            rusage,
+            threads,
+            len(self.dirEndpoints.union(self.undirEdges)),
+            len(lines) - 2 - prizes - dummyEdges,
+            prizes,
+            dummyEdges,
+        )
+        info += describeSolverUsage(self.solverUsage)
         return (edgeList, info)
 
 
-class PCSFOutput(object):
-    def __init__(
-        self, inputObj, edgeList, info, outputpath, outputlabel, betweenness
-    ):
-        """ Takes the forest output given by msgsteiner and converts
-        it to two networkx graphs.
+def waitProcess(subproc, deadline=None):
+    """
+    Waits for the subprocess subproc to exit, until deadline (as returned by
+    time.time()) if it is not None.
 
-        INPUT: inputObj - a reference to the PCSFInput object that
-                          stores the correct edges and prizes
-                          dictionaries for this output object edgeList
-                          - the edges in the forest output given by
-                          msgsteiner, contents of stdout info - stats
-                          about the msgsteiner run, contents of stderr
-                          outputpath - path to the directory where
-                          output files should be stored outputlabel -
-                          a label with which to name all of the output
-                          files for this run betweenness - a T/F flag
-                          indicating whether we should do the costly
-                          betweenness calculation
+    RETURNS: (exit code, resource usage of the process as given by
+             os.wait4, or None where os.wait4 is not available). Raises
+             subprocess.TimeoutExpired at the deadline, leaving the process
+             running.
+    """
+    if not hasattr(os, "wait4"):
+        if deadline is None:
+            return (subproc.wait(), None)
+        return (subproc.wait(timeout=max(0, deadline - time.time())), None)
+    delay = 0.001
+    while True:
+        (pid, status, rusage) = os.wait4(
+            subproc.pid, 0 if deadline is None else os.WNOHANG
+        )
+        if pid != 0:
+            break
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(subproc.args, 0)
+        # Poll often at first, short runs are common
+        time.sleep(min(delay, remaining))
+        delay = min(2 * delay, 0.05)
+    # The process is reaped, Popen must not wait for it again
+    subproc.returncode = os.waitstatus_to_exitcode(status)
+    return (subproc.returncode, rusage)
+
+
+def solverUsage(wall, rusage, threads, nodes, edges, prizes, dummyEdges):
+    """
+    RETURNS: dictionary of the "wallSeconds", "userSeconds",
+             "systemSeconds" and "maxRssKb" (None if rusage is None) of one
+             msgsteiner run with the given number of "threads", and the
+             number of interactome "nodes", "edges", "prizes" and
+             "dummyEdges" of its input
+    """
+    usage = {
+        "wallSeconds": wall,
+        "userSeconds": None,
+        "systemSeconds": None,
+        "maxRssKb": None,
+        "threads": threads,
+        "nodes": nodes,
+        "edges": edges,
+        "prizes": prizes,
+        "dummyEdges": dummyEdges,
+    }
+    if rusage is not None:
+        usage["userSeconds"] = rusage.ru_utime
+        usage["systemSeconds"] = rusage.ru_stime
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        if sys.platform == "darwin":
+            usage["maxRssKb"] = rusage.ru_maxrss // 1024
+        else:
+            usage["maxRssKb"] = rusage.ru_maxrss
+    return usage
 
-        OUTPUT: self.optForest - a networkx digraph storing the forest
-                returned by msgsteiner self.augForest - a networkx
-                digraph storing the forest returned by msgsteiner,
-                plus all of the edges in the interactome between nodes
-                in that forest self.dumForest - a networkx digraph
-                storing the dummy node edges in the optimal forest
-                self.inputObj - a reference to the PCSFInput object
-                that created this output object <outputlabel>_info.txt
-                - a text file containing the contents of stderr and
-                info """
-        # Write output stderr file before attempting to do anything else so the
-        # info is there if the program breaks
-        err = open("%s/%s_info.txt" % (outputpath, outputlabel), "w")
-        err.write(info)
 
-        # Create networkx graph storing the result of msgsteiner
-        optForest = nx.DiGraph()
-        dumForest = nx.DiGraph()
+def describeSolverUsage(usage):
+    """Returns the lines of the info file describing solverUsage usage"""
+    if usage["userSeconds"] is None:
+        resources = "%.2f s wall time" % usage["wallSeconds"]
+    else:
+        resources = (
+            "%.2f s wall time, %.2f s user CPU, %.2f s system CPU, %i KB"
+            " maximum resident set size"
+            % (usage["wallSeconds"], usage["userSeconds"],
+               usage["systemSeconds"], usage["maxRssKb"])
+        )
+    return (
+        "msgsteiner used %s with %s threads.\n"
+        "msgsteiner input: %i nodes, %i edges, %i prizes, %i dummy"
+        " edges.\n"
+        % (resources, usage["threads"], usage["nodes"], usage["edges"],
+           usage["prizes"], usage["dummyEdges"])
+    )
 
-        # Compute the objective function score of the msgsteiner solution
-        # as defined in Eq 3 of Tuncbag et al 2016
-        # prizeTerm computed below
-        edgeTerm = 0  # cummulative edge costs of included edges
-        treesTerm = 0  # penalty for multiple trees
-        edges = edgeList.split("\n")
-        for edge in edges:
-            words = edge.split()
-            if len(words) > 0:
-                # If edge includes dummy node, only add to dumForest
-                if words[0] == "DUMMY":
-                    sys.exit(
+
+def summarizeSolverUsage(usages):
+    """
+    Sums up the msgsteiner resource usage of many runs, see solverUsage.
+
+    RETURNS: a line for the ensemble report with the mean wall time and CPU
+             time per run, the mean number of CPUs busy while msgsteiner
+             ran (CPU time / wall time, to compare to the threads given to
+             it) and the largest maximum resident set size
+    """
+    wall = sum(usage["wallSeconds"] for usage in usages) / len(usages)
+    measured = [usage for usage in usages if usage["userSeconds"] is not None]
+    if not measured:
+        return "msgsteiner mean wall seconds per run: %.2f" % wall
+    cpu = sum(usage["userSeconds"] + usage["systemSeconds"]
+              for usage in measured) / len(measured)
+    threads = sorted(set(usage["threads"] for usage in usages))
+    if len(threads) > 1:
+        # Chosen per run by the ThreadScheduler
+        threads = ["%i-%i" % (threads[0], threads[-1])]
+    return (
+        "msgsteiner per run: mean wall seconds %.2f, mean CPU seconds %.2f,"
+        " mean CPUs busy %.2f with %s threads, largest maximum resident set"
+        " size %i KB"
+        % (wall, cpu, cpu / wall if wall > 0 else 0.0, threads[0],
+           max(usage["maxRssKb"] for usage in measured))
+    )
+
+
+# Coefficients of RuntimeModel before any run is recorded: the intercept,
+# nodes, edges, D, dummy edges and threads
+RUNTIME_PRIOR = np.array([0.0, 0.0, 1.0, 1.0, 0.25, -0.5])
+
+# The ThreadScheduler of the pool of this process, see createPool
+_threadScheduler = None
+
+
+class ThreadScheduler(object):
+    def __init__(self, processes=None, cores=None, window=8):
+        """ Chooses the msgsteiner threads (-j) of every run when the
+        threads parameter is auto. It is created before the pool is forked,
+        and its counters are shared by the parent and all workers.
+
+        Runs are parallel in processes first, which scales best, and the
+        cores left over go to the runs starting when fewer runs than cores
+        are left, e.g. the last runs of an ensemble or a small ensemble.
+        Each run starting gets an equal share of the idle cores with the
+        runs that are about to start. When a run does not keep even half of
+        its threads busy, the threads of later runs are capped at the
+        number of CPUs it kept busy. The cap is recomputed from the last
+        window runs, so that a few small runs, e.g. of one job of a Forest
+        server, do not hold back the runs of later jobs: it is the largest
+        number of threads any of them used well, and it is lifted when none
+        of them ran with several threads.
+
+        INPUT: processes - the number of workers of the pool, all CPUs if
+                           None
+               cores - the number of cores to share, all CPUs if None
+               window - the number of runs the cap is computed from
+        """
+        self.cores = cores or mp.cpu_count()
+        self.processes = processes or mp.cpu_count()
+        self.lock = mp.Lock()
+        # Tasks submitted and not started
+        self.waiting = mp.RawValue("i", 0)
+        # Tasks started and not finished
+        self.running = mp.RawValue("i", 0)
+        # Running tasks that have not started msgsteiner yet
+        self.starting = mp.RawValue("i", 0)
+        # Threads of the msgsteiner runs going on
+        self.busyThreads = mp.RawValue("i", 0)
+        self.maxThreads = mp.RawValue("i", self.cores)
+        # Threads each of the last window runs kept busy, the cores for the
+        # runs that used their threads well and 0 for the runs with one
+        # thread or of unknown usage, which tell nothing about scaling
+        self.recentThreads = mp.RawArray("i", window)
+        self.finished = mp.RawValue("i", 0)
+        # Whether the task of this process has started msgsteiner
+        self.solved = False
+
+    def submitted(self, numTasks):
+        """Counts numTasks tasks submitted to the pool"""
+        with self.lock:
+            self.waiting.value += numTasks
+
+    def taskStarted(self):
+        with self.lock:
+            self.waiting.value = max(0, self.waiting.value - 1)
+            self.running.value += 1
+            self.starting.value += 1
+        self.solved = False
+
+    def taskFinished(self):
+        with self.lock:
+            self.running.value -= 1
+            if not self.solved:
+                self.starting.value -= 1
+
+    def acquire(self):
+        """Returns the number of threads of a msgsteiner run starting"""
+        with self.lock:
+            if not self.solved and self.starting.value > 0:
+                self.starting.value -= 1
+            idle = max(0, self.processes - self.running.value)
+            contenders = (1 + self.starting.value
+                          + min(self.waiting.value, idle))
+            free = self.cores - self.busyThreads.value
+            threads = max(1, min(self.maxThreads.value, free // contenders))
+            self.busyThreads.value += threads
+        self.solved = True
+        return threads
+
+    def release(self, threads, wall, rusage):
+        """
+        Returns the threads of a msgsteiner run that took wall seconds and
+        used the resources rusage, or None if they are not known
+        """
+        used = 0
+        if threads > 1 and rusage is not None and wall > 0:
+            busy = (rusage.ru_utime + rusage.ru_stime) / wall
+            if busy < threads / 2.0:
+                used = max(1, int(math.ceil(busy)))
+            else:
+                used = self.cores
+        with self.lock:
+            self.busyThreads.value -= threads
+            recent = self.recentThreads
+            recent[self.finished.value % len(recent)] = used
+            self.finished.value += 1
+            self.maxThreads.value = max(recent) or self.cores
+
+
+def scheduledTask(func):
+    """
+    Decorates a function run as a pool task so that the ThreadScheduler of
+    the pool knows which tasks are running
+    """
+    @functools.wraps(func)
+    def task(*args, **kwargs):
+        scheduler = _threadScheduler
+        if scheduler is None:
+            return func(*args, **kwargs)
+        scheduler.taskStarted()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            scheduler.taskFinished()
+    return task
+
+
+def acquireThreads():
+    """
+    Returns the number of threads of a msgsteiner run with the threads
+    parameter auto, chosen by the ThreadScheduler of the pool. Without a
+    scheduler, a run in the main process gets all CPUs and a run in a
+    worker, e.g. of a Forest server, gets one.
+    """
+    if _threadScheduler is not None:
+        return _threadScheduler.acquire()
+    if mp.parent_process() is None:
+        return mp.cpu_count()
+    return 1
+
+
+def releaseThreads(threads, wall, rusage):
+    """Returns the threads given by acquireThreads"""
+    if _threadScheduler is not None:
+        _threadScheduler.release(threads, wall, rusage)
+
+
+def scheduleTasks(numTasks):
+    """Counts numTasks tasks submitted to the pool of the ThreadScheduler"""
+    if _threadScheduler is not None:
+        _threadScheduler.submitted(numTasks)
+
+
+class RuntimeModel(object):
+    def __init__(self, ridge=1.0):
+        """ Predicts the wall time of msgsteiner runs from the size of their
+        input, their depth D and their threads, with a linear model of the
+        logarithms fitted to recorded runs:
+
+            log(seconds) = c + a1 log(nodes) + a2 log(edges) + a3 log(D)
+                           + a4 log(1 + dummy edges) + a5 log(threads)
+
+        The coefficients are pulled towards a prior, the time of message
+        passing growing with edges x D, so that the predictions are ordered
+        sensibly before any run is recorded and a few runs of similar sizes
+        do not make the fit degenerate.
+
+        INPUT: ridge - weight of the prior
+        """
+        self.ridge = ridge
+        self.rows = []
+        self.times = []
+        self.coefficients = RUNTIME_PRIOR
+        self.fitted = True
+
+    @staticmethod
+    def featureRow(features):
+        """Returns the row of the model for a dictionary of features"""
+        return [
+            1.0,
+            math.log(max(1, features["nodes"])),
+            math.log(max(1, features["edges"])),
+            math.log(max(1, features["D"])),
+            math.log(1 + features["dummyEdges"]),
+            # Runs with the threads parameter auto record the threads used
+            math.log(max(1, features["threads"])),
+        ]
+
+    def add(self, usage, D):
+        """
+        Records one msgsteiner run with depth D and the resources and input
+        size usage, see solverUsage
+        """
+        if usage["wallSeconds"] <= 0:
+            return
+        self.rows.append(RuntimeModel.featureRow(dict(usage, D=D)))
+        self.times.append(math.log(usage["wallSeconds"]))
+        self.fitted = False
+
+    def addManifest(self, path):
+        """Records the runs of the run manifest at path"""
+        (header, records) = RunManifest.read(path)
+        for record in records:
+            if record.get("solver") is not None:
+                self.add(record["solver"], header["params"]["D"])
+
+    def addStore(self, path):
+        """Records the runs of the run store at path"""
+        store = RunStore(path)
+        try:
+            for (usage, D) in store.solverRuns():
+                self.add(usage, D)
+        finally:
+            store.close()
+
+    def addDirectory(self, path):
+        """
+        Records the runs of all run manifests and run stores in the output
+        directory path of earlier jobs
+        """
+        for name in sorted(os.listdir(path)):
+            if name.endswith("_runs.jsonl"):
+                self.addManifest(os.path.join(path, name))
+            elif name.endswith("_runs.sqlite"):
+                self.addStore(os.path.join(path, name))
+
+    def fit(self):
+        """
+        Fits the coefficients to the recorded runs, by least squares with a
+        ridge penalty on their distance to the prior. The intercept is not
+        penalized.
+        """
+        if not self.rows:
+            self.coefficients = RUNTIME_PRIOR
+        else:
+            X = np.array(self.rows)
+            y = np.array(self.times)
+            penalty = self.ridge * np.eye(len(RUNTIME_PRIOR))
+            penalty[0, 0] = 0.0
+            self.coefficients = np.linalg.solve(
+                X.T.dot(X) + penalty,
+                X.T.dot(y) + penalty.dot(RUNTIME_PRIOR),
+            )
+        self.fitted = True
+
+    def predict(self, features):
+        """
+        RETURNS: the predicted wall seconds of a run with the features of
+                 PCSFInput.runtimeFeatures
+        """
+        if not self.fitted:
+            self.fit()
+        return math.exp(
+            np.dot(self.coefficients, RuntimeModel.featureRow(features))
+        )
+
+    def longestFirst(self, featureList):
+        """
+        RETURNS: the indices of featureList, the features of many runs, in
+                 the order of decreasing predicted time. Runs predicted to
+                 take the same time keep their order.
+        """
+        predicted = [self.predict(features) for features in featureList]
+        return sorted(range(len(featureList)), key=lambda i: -predicted[i])
+
+
+def startThreadScheduler(processes=None):
+    """
+    Creates the ThreadScheduler of a pool of processes workers, all CPUs if
+    None, to be called just before the pool is created. Only the runs with
+    the threads parameter auto use it. The workers get it from the
+    initializer of the pool, see initWorker and initSharedWorker, so that
+    they share it whatever the start method of the processes.
+
+    RETURNS: the ThreadScheduler
+    """
+    global _threadScheduler
+    _threadScheduler = ThreadScheduler(processes)
+    return _threadScheduler
+
+
+def createPool(inputObj):
+    """
+    Creates a pool of inputObj.processes workers (all CPUs if None) sharing
+    inputObj, see initWorker, and its ThreadScheduler
+    """
+    scheduler = startThreadScheduler(inputObj.processes)
+    return mp.Pool(inputObj.processes, initWorker, (inputObj, scheduler))
+
+
+class PCSFInputOverlay(PCSFInput):
+    def __init__(
+        self, base, origPrizes, negPrizes=None, totalPrizes=None,
+        excludeT=False
+    ):
+        """ A copy-on-write view of a PCSFInput object that replaces only the
+        prize dictionaries. The interactome edges, dummy node neighbors and
+        parameters are shared with the base object instead of being copied, so
+        creating a perturbed input costs O(#prizes) rather than O(#edges).
+
+        INPUT: base - the PCSFInput object (or another overlay) to share
+                      edges and parameters with
+               origPrizes - dictionary of the prizes for this run.
+                            {ProteinName: PrizeValue}
+               negPrizes, totalPrizes - dictionaries of negative and total
+                                        prizes. If either is None, both are
+                                        recomputed from origPrizes with
+                                        assignNegPrizes.
+               excludeT - passed to assignNegPrizes when recomputing prizes
+        """
+        # Never stack overlays, lookups always go straight to the base object.
+        # What the other overlay replaces besides the prizes is kept.
+        if isinstance(base, PCSFInputOverlay):
+            self.__dict__.update(
+                (name, value) for (name, value) in base.__dict__.items()
+                if name not in ("origPrizes", "negPrizes", "totalPrizes")
+            )
+            base = base.base
+        self.base = base
+        self.origPrizes = origPrizes
+        if negPrizes is None or totalPrizes is None:
+            self.assignNegPrizes(base.musquared, excludeT)
+        else:
+            self.negPrizes = negPrizes
+            self.totalPrizes = totalPrizes
+
+    def __getattr__(self, name):
+        # Only called for attributes missing from the overlay itself. Guard
+        # against recursion while unpickling, before self.base is restored.
+        if name == "base" or name == "sharedName" or name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.base, name)
+
+    def share(self, name):
+        """
+        Pickles this overlay with name in place of its base object, which
+        must be shared under that name with shareInputs in the processes
+        unpickling it, e.g. the workers of a pool created with
+        initSharedWorker. Tasks on the overlay then only send its prizes.
+        """
+        self.sharedName = name
+        return self
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if "sharedName" in state:
+            del state["base"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "base" not in state:
+            self.base = _sharedInputs[state["sharedName"]]
+
+
+class PCSFOutput(object):
+    def __init__(
+        self, inputObj, edgeList, info, outputpath, outputlabel, betweenness
+    ):
+        """ Takes the forest output given by msgsteiner and converts
+        it to two networkx graphs.
+
+        INPUT: inputObj - a reference to the PCSFInput object that
+                          stores the correct edges and prizes
+                          dictionaries for this output object edgeList
+                          - the edges in the forest output given by
+                          msgsteiner, contents of stdout info - stats
+                          about the msgsteiner run, contents of stderr
+                          outputpath - path to the directory where
+                          output files should be stored, or None to not
+                          write the info file outputlabel -
+                          a label with which to name all of the output
+                          files for this run betweenness - a T/F flag
+                          indicating whether we should do the costly
+                          betweenness calculation
+
+        OUTPUT: self.optForest - a networkx digraph storing the forest
+                returned by msgsteiner self.augForest - a networkx
+                digraph storing the forest returned by msgsteiner,
+                plus all of the edges in the interactome between nodes
+                in that forest self.dumForest - a networkx digraph
+                storing the dummy node edges in the optimal forest
+                self.inputObj - a reference to the PCSFInput object
+                that created this output object <outputlabel>_info.txt
+                - a text file containing the contents of stderr and
+                info """
+        # Write output stderr file before attempting to do anything else so the
+        # info is there if the program breaks
+        if outputpath is None:
+            self.infoFile = None
+            err = open(os.devnull, "w")
+        else:
+            self.infoFile = "%s/%s_info.txt" % (outputpath, outputlabel)
+            err = open(self.infoFile, "w")
+        err.write(info)
+
+        parseStage = stage("parse_output").start()
+        # Create networkx graph storing the result of msgsteiner
+        optForest = nx.DiGraph()
+        dumForest = nx.DiGraph()
+
+        # Compute the objective function score of the msgsteiner solution
+        # as defined in Eq 3 of Tuncbag et al 2016
+        # prizeTerm computed below
+        edgeTerm = 0  # cummulative edge costs of included edges
+        treesTerm = 0  # penalty for multiple trees
+        edges = edgeList.split("\n")
+        for edge in edges:
+            words = edge.split()
+            if len(words) > 0:
+                # If edge includes dummy node, only add to dumForest
+                if words[0] == "DUMMY":
+                    raise SolverError(
                         "ERROR: Tree returned from message passing"
                         " algorithm has incorrect edges pointing towards"
                         " the root dummy node!"
@@ -882,7 +1744,7 @@ class PCSFOutput(object):
                             inputObj.undirEdges[words[1]][words[0]]
                             != inputObj.undirEdges[words[0]][words[1]]
                         ):
-                            sys.exit(
+                            raise InputError(
                                 "ERROR: Undirected edges must have symmetric"
                                 " costs"
                             )
@@ -902,7 +1764,7 @@ class PCSFOutput(object):
                         edgeTerm += 1 - float(edgeWeight)
                     # edge not found in either dictionary
                     except KeyError:
-                        sys.exit(
+                        raise SolverError(
                             "ERROR: Edges were returned from the message"
                             " passing algorithm that were not found in the"
                             "  input data. Aborting program."
@@ -937,32 +1799,13 @@ class PCSFOutput(object):
             except KeyError:
                 ttype = ""
             optForest.nodes[node]["TerminalType"] = ttype
-        # Create networkx graph storing the "augmented forest",
-        # the result of msgsteiner plus all interactome edges between nodes
-        # present in the forest
-        augForest = copy.deepcopy(optForest)
-        for node in augForest.nodes():
-            edges = {}
-            try:
-                edges.update(inputObj.undirEdges[node])
-            except KeyError:
-                pass
-            try:
-                edges.update(inputObj.dirEdges[node])
-            except KeyError:
-                pass
-            for node2 in edges:
-                if node2 in augForest.nodes():
-                    if (node, node2) not in optForest.edges():
-                        augForest.add_edge(
-                            node,
-                            node2,
-                            weight=edges[node2],
-                            fracOptContaining=0.0,
-                        )
+        parseStage.stop()
+        with stage("aug_forest"):
+            augForest = augmentForest(optForest, inputObj)
         # Calculate betweenness centrality for all nodes in augmented forest
         if betweenness:
-            betweenness = nx.betweenness_centrality(augForest)
+            with stage("betweenness"):
+                betweenness = nx.betweenness_centrality(augForest)
             nx.set_node_attributes(augForest, betweenness, 'betweenness')
         else:
             for node in augForest.nodes():
@@ -1012,8 +1855,87 @@ class PCSFOutput(object):
         self.optForest = optForest
         self.dumForest = dumForest
         self.inputObj = inputObj
+        self.objective = {
+            "total": prizeTerm + edgeTerm + treesTerm,
+            "excludedPrizes": prizeTerm,
+            "edgeCosts": edgeTerm,
+            "trees": treesTerm,
+        }
+
+    def summary(self):
+        """
+        Returns a compact summary of the optimal forest that is enough to
+        merge runs with EnsembleMerger, without the networkx graphs or a
+        reference to the interactome.
+
+        RETURNS: a dictionary with the optimal forest "nodes" and directed
+                 "edges" ([node1, node2] lists), the "roots" connected to the
+                 dummy node and the "objective" function terms
+        """
+        return {
+            "nodes": list(self.optForest.nodes()),
+            "edges": [[node1, node2] for (node1, node2)
+                      in self.optForest.edges()],
+            "roots": [node2 for (node1, node2) in self.dumForest.edges()
+                      if node1 == "DUMMY"],
+            "objective": self.objective,
+        }
+
+    def edgeRows(self):
+        """
+        Lists the edges of augForest for the output files, sorted by node
+        names. Undirected interactions are listed once, in the direction
+        with the first node name.
+
+        RETURNS: list of (node1, interaction, node2, weight,
+                 fracOptContaining) tuples, interaction is "pd" for directed
+                 and "pp" for undirected edges
+        """
+        dirEdges = self.inputObj.dirEdges
+        succ = self.augForest.succ
+        rows = []
+        append = rows.append
+        # Walking the sorted adjacency avoids building and sorting a tuple
+        # for every edge
+        for node1 in sorted(succ):
+            neighbors = succ[node1]
+            directed = dirEdges.get(node1, {})
+            for node2 in sorted(neighbors):
+                if node2 in directed:
+                    interaction = "pd"
+                elif (
+                    node2 < node1
+                    and node1 in succ[node2]
+                    and node1 not in dirEdges.get(node2, {})
+                ):
+                    # Don't want to write undirected interactions twice
+                    # (A pp B, B pp A). node2 -> node1 was written first.
+                    continue
+                else:
+                    interaction = "pp"
+                data = neighbors[node2]
+                append(
+                    (node1, interaction, node2, data["weight"],
+                     data["fracOptContaining"])
+                )
+        return rows
+
+    def nodeRows(self):
+        """
+        RETURNS: list of (node, data) tuples of the nodes of augForest,
+                 sorted by node name
+        """
+        nodes = self.augForest.nodes
+        return [(node, nodes[node]) for node in sorted(nodes)]
+
+    def dummyRows(self):
+        """RETURNS: sorted list of the roots connected to the dummy node"""
+        return sorted(
+            node2 for (node1, node2) in self.dumForest.edges()
+            if node1 == "DUMMY"
+        )
 
-    def writeCytoFiles(self, outputpath, outputlabel, cyto30):
+    def writeCytoFiles(self, outputpath, outputlabel, cyto30, compress=False):
         """
         Writes Cytoscape-supported files for viewing the output network.
 
@@ -1021,6 +1943,7 @@ class PCSFOutput(object):
                             stored
                outputlabel - a label with which to name all of the output files
                              for this run
+               compress - gzip the files, and add .gz to their names
 
         OUTPUT: <outputlabel>_optimalForest.sif - a file storing edges of
                                                   optForest in Simple
@@ -1035,252 +1958,268 @@ class PCSFOutput(object):
                                                    storing the node attributes
                 <outputlabel>_edgeattributes.tsv - a tab-delimited file storing
                                                    the edge attributes
+        RETURNS: list of the paths of the files written
         """
+        writeStage = stage("write_cytoscape").start()
+        prefix = "%s/%s" % (outputpath, outputlabel)
+        written = []
+
+        def write(name, lines):
+            written.append(writeOutputFile(prefix + name, lines, compress))
+        edgeRows = self.edgeRows()
+        nodeRows = self.nodeRows()
+        # Every file is formatted in full and written at once
+        augSif = ["%s\t%s\t%s\n" % row[:3] for row in edgeRows]
+        dumSif = ["DUMMY\tpd\t%s\n" % node for node in self.dummyRows()]
         if cyto30:
             # Write Simple Interaction Format files to store edges in a format
             # supported by Cytoscape 3.0
-            optSif = open(
-                "%s/%s_optimalForest.sif" % (outputpath, outputlabel), "w"
-            )
-            augSif = open(
-                "%s/%s_augmentedForest.sif" % (outputpath, outputlabel), "w"
-            )
-            dumSif = open(
-                "%s/%s_dummyForest.sif" % (outputpath, outputlabel), "w"
-            )
+            optSif = [line for (line, row) in zip(augSif, edgeRows)
+                      if row[4] > 0.0]
+            write("_optimalForest.sif", optSif)
+            write("_augmentedForest.sif", augSif)
+            write("_dummyForest.sif", optSif + dumSif)
 
             # Write attribute files in a format supported by Cytoscape
             # The first lines of these files contains the variable names
-            noa = open(
-                "%s/%s_nodeattributes.tsv" % (outputpath, outputlabel), "w"
-            )
-            noa.write(
-                "Protein\tPrize\tBetweennessCentrality\t"
-                "FractionOfOptimalForestsContaining\tTerminalType\n"
-            )
-            eda = open(
-                "%s/%s_edgeattributes.tsv" % (outputpath, outputlabel), "w"
+            write(
+                "_nodeattributes.tsv",
+                ["Protein\tPrize\tBetweennessCentrality\t"
+                 "FractionOfOptimalForestsContaining\tTerminalType\n"]
+                + ["%s\t%s\t%s\t%s\t%s\n"
+                   % (node, data["prize"], data["betweenness"],
+                      data["fracOptContaining"], data["TerminalType"])
+                   for (node, data) in nodeRows],
             )
-            eda.write("Edge\tWeight\tFractionOfOptimalForestsContaining\n")
-
-            undirEdgesAdded = {}
-
-            edgesSorted = list(self.augForest.edges(data=True))
-            edgesSorted.sort(key=itemgetter(0, 1))
-
-            # iterate through edges to record edge types and edge attributes
-            for (node1, node2, data) in edgesSorted:
-                # Check if interaction between node1 and node2 is directed
-                try:
-                    self.inputObj.dirEdges[node1][node2]
-                    augSif.write(node1 + "\tpd\t" + node2 + "\n")
-                    eda.write(
-                        node1
-                        + " (pd) "
-                        + node2
-                        + "\t"
-                        + str(data["weight"])
-                        + "\t"
-                        + str(data["fracOptContaining"])
-                        + "\n"
-                    )
-                    # Check if this edge is in optForest
-                    if data["fracOptContaining"] > 0.0:
-                        optSif.write(node1 + "\tpd\t" + node2 + "\n")
-                        dumSif.write(node1 + "\tpd\t" + node2 + "\n")
-                # Else undirected
-                except KeyError:
-                    # Don't want to write undirected interactions twice
-                    # (A pp B, B pp A).
-                    try:
-                        undirEdgesAdded[node2][node1] = 2
-                    except KeyError:
-                        augSif.write(node1 + "\tpp\t" + node2 + "\n")
-                        eda.write(
-                            node1
-                            + " (pp) "
-                            + node2
-                            + "\t"
-                            + str(data["weight"])
-                            + "\t"
-                            + str(data["fracOptContaining"])
-                            + "\n"
-                        )
-                        if data["fracOptContaining"] > 0.0:
-                            optSif.write(node1 + "\tpp\t" + node2 + "\n")
-                            dumSif.write(node1 + "\tpp\t" + node2 + "\n")
-                        if node1 in undirEdgesAdded:
-                            undirEdgesAdded[node1][node2] = 1
-                        else:
-                            undirEdgesAdded[node1] = {node2: 1}
-
-            nodesSorted = list(self.augForest.nodes(data=True))
-            nodesSorted.sort(key=itemgetter(0, 1))
-            # iterate through nodes to record node attributes
-            for (node, data) in nodesSorted:
-                noa.write(
-                    node
-                    + "\t"
-                    + str(data["prize"])
-                    + "\t"
-                    + str(data["betweenness"])
-                    + "\t"
-                    + str(data["fracOptContaining"])
-                    + "\t"
-                    + data["TerminalType"]
-                    + "\n"
-                )
-
-            dumSorted = list(self.dumForest.edges())
-            dumSorted.sort(key=itemgetter(0, 1))
-            # Record dummy edges
-            for (node1, node2) in dumSorted:
-                if node1 == "DUMMY":
-                    dumSif.write(node1 + "\tpd\t" + node2 + "\n")
-
-            optSif.close()
-            augSif.close()
-            dumSif.close()
-            noa.close()
-            eda.close()
-            print(
-                "Wrote output files for Cytoscape, in directory %s, with"
-                ' names starting with "%s".\n' % (outputpath, outputlabel)
+            write(
+                "_edgeattributes.tsv",
+                ["Edge\tWeight\tFractionOfOptimalForestsContaining\n"]
+                + ["%s (%s) %s\t%s\t%s\n" % row for row in edgeRows],
             )
-
         else:
             # Write Simple Interaction Format files to store edges in a format
-            # supported by
-            # Cytoscape 2.8
-            optSif = open(
-                "%s/%s_optimalForest.sif" % (outputpath, outputlabel), "w"
-            )
-            augSif = open(
-                "%s/%s_augmentedForest.sif" % (outputpath, outputlabel), "w"
-            )
-            dumSif = open(
-                "%s/%s_dummyForest.sif" % (outputpath, outputlabel), "w"
-            )
+            # supported by Cytoscape 2.8
+            optSif = [line for (line, row) in zip(augSif, edgeRows)
+                      if row[4] == 1]
+            write("_optimalForest.sif", optSif)
+            write("_augmentedForest.sif", augSif)
+            write("_dummyForest.sif", optSif + dumSif)
+
+            # Write node attribute files in a format supported by Cytoscape
+            for (name, header, key) in [
+                ("betweennessCentrality",
+                 "BetweennessCentrality (class=Double)", "betweenness"),
+                ("prizes", "Prize (class=Double)", "prize"),
+                ("fracOptContaining",
+                 "FractionOptimalForestsContaining (class=Double)",
+                 "fracOptContaining"),
+                ("termTypes", "TerminalType", "TerminalType"),
+            ]:
+                write(
+                    "_%s.noa" % name,
+                    [header + "\n"]
+                    + ["%s = %s\n" % (node, data[key])
+                       for (node, data) in nodeRows],
+                )
 
-            # Write attribute files in a format supported by Cytoscape
-            bcNoa = open(
-                "%s/%s_betweennessCentrality.noa" % (outputpath, outputlabel),
-                "w",
-            )
-            bcNoa.write("BetweennessCentrality (class=Double)\n")
-            prizeNoa = open(
-                "%s/%s_prizes.noa" % (outputpath, outputlabel), "w"
-            )
-            prizeNoa.write("Prize (class=Double)\n")
-            fracNoa = open(
-                "%s/%s_fracOptContaining.noa" % (outputpath, outputlabel), "w"
+            # Write edge attribute files in a format supported by Cytoscape
+            write(
+                "_weights.eda",
+                ["Weight (class=Double)\n"]
+                + ["%s (%s) %s = %s\n" % row[:4] for row in edgeRows],
             )
-            fracNoa.write("FractionOptimalForestsContaining (class=Double)\n")
-            ttypeNoa = open(
-                "%s/%s_termTypes.noa" % (outputpath, outputlabel), "w"
+            write(
+                "_fracOptContaining.eda",
+                ["FractionOptimalForestsContaining (class=Double)\n"]
+                + ["%s (%s) %s = %s\n" % (row[:3] + row[4:])
+                   for row in edgeRows],
             )
-            ttypeNoa.write("TerminalType\n")
+        writeStage.stop()
+        print(
+            "Wrote output files for Cytoscape, in directory %s, with"
+            ' names starting with "%s".\n' % (outputpath, outputlabel)
+        )
+        return written
 
-            # Write edge attribute files in a format supported by Cytoscape
-            weightEda = open(
-                "%s/%s_weights.eda" % (outputpath, outputlabel), "w"
+    def outputGraph(self):
+        """
+        RETURNS: a networkx digraph of augForest for the GraphML and JSON
+                 files, with undirected interactions once, an
+                 "interaction" ("pd" or "pp") and numeric weights on the
+                 edges, and a "root" flag on the nodes
+        """
+        graph = nx.DiGraph()
+        roots = set(self.dummyRows())
+        for (node, data) in self.nodeRows():
+            graph.add_node(
+                node,
+                prize=float(data["prize"]),
+                betweenness=float(data["betweenness"]),
+                fracOptContaining=float(data["fracOptContaining"]),
+                TerminalType=str(data["TerminalType"]),
+                root=node in roots,
             )
-            weightEda.write("Weight (class=Double)\n")
-            fracEda = open(
-                "%s/%s_fracOptContaining.eda" % (outputpath, outputlabel), "w"
+        for (node1, interaction, node2, weight, frac) in self.edgeRows():
+            graph.add_edge(
+                node1,
+                node2,
+                interaction=interaction,
+                weight=float(weight),
+                fracOptContaining=float(frac),
             )
-            fracEda.write("FractionOptimalForestsContaining (class=Double)\n")
+        return graph
 
-            undirEdgesAdded = {}
-            edgesSorted = self.augForest.edges(data=True)
-            edgesSorted.sort(key=itemgetter(0, 1))
-            # iterate through edges to record edge types and edge attributes
-            for (node1, node2, data) in edgesSorted:
-                try:
-                    # Check if interaction between node1 and node2 is directed
-                    self.inputObj.dirEdges[node1][node2]
-                    augSif.write(node1 + "\tpd\t" + node2 + "\n")
-                    weightEda.write(
-                        node1
-                        + " (pd) "
-                        + node2
-                        + " = "
-                        + data["weight"]
-                        + "\n"
-                    )
-                    fracEda.write(
-                        node1
-                        + " (pd) "
-                        + node2
-                        + " = "
-                        + str(data["fracOptContaining"])
-                        + "\n"
+    def writeGraphFiles(self, outputpath, outputlabel, formats,
+                        compress=False):
+        """
+        Writes the output network in other formats than Cytoscape files.
+
+        INPUT: formats - list of the formats to write, any of "graphml",
+                         "json" and "tsv"
+               compress - gzip the files, and add .gz to their names
+
+        OUTPUT: <outputlabel>_augmentedForest.graphml - the augmented forest
+                                                        in GraphML
+                <outputlabel>_augmentedForest.json - the augmented forest as
+                                                     JSON with lists of
+                                                     "nodes" and "edges"
+                <outputlabel>_edges.tsv, <outputlabel>_nodes.tsv - tables of
+                                                    the edges and nodes of the
+                                                    augmented forest
+        RETURNS: list of the paths of the files written
+        """
+        writeStage = stage("write_graph").start()
+        prefix = "%s/%s" % (outputpath, outputlabel)
+        written = []
+        if "graphml" in formats or "json" in formats:
+            graph = self.outputGraph()
+        if "graphml" in formats:
+            # networkx compresses files ending in .gz
+            path = (prefix + "_augmentedForest.graphml"
+                    + (".gz" if compress else ""))
+            nx.write_graphml(graph, path)
+            written.append(path)
+        if "json" in formats:
+            data = {
+                "nodes": [dict(data, id=node)
+                          for (node, data) in graph.nodes(data=True)],
+                "edges": [dict(data, source=node1, target=node2)
+                          for (node1, node2, data) in graph.edges(data=True)],
+            }
+            written.append(writeOutputFile(
+                prefix + "_augmentedForest.json", [json.dumps(data)], compress
+            ))
+        if "tsv" in formats:
+            written.append(writeOutputFile(
+                prefix + "_edges.tsv",
+                ["Node1\tInteraction\tNode2\tWeight\t"
+                 "FractionOfOptimalForestsContaining\n"]
+                + ["%s\t%s\t%s\t%s\t%s\n" % row for row in self.edgeRows()],
+                compress,
+            ))
+            roots = set(self.dummyRows())
+            written.append(writeOutputFile(
+                prefix + "_nodes.tsv",
+                ["Protein\tPrize\tBetweennessCentrality\t"
+                 "FractionOfOptimalForestsContaining\tTerminalType\tRoot\n"]
+                + ["%s\t%s\t%s\t%s\t%s\t%s\n"
+                   % (node, data["prize"], data["betweenness"],
+                      data["fracOptContaining"], data["TerminalType"],
+                      node in roots)
+                   for (node, data) in self.nodeRows()],
+                compress,
+            ))
+        writeStage.stop()
+        print(
+            "Wrote %s output files, in directory %s, with names starting"
+            ' with "%s".\n' % (", ".join(formats), outputpath, outputlabel)
+        )
+        return written
+
+    def writeFiles(self, outputpath, outputlabel, cyto30,
+                   formats=("cytoscape",), compress=False):
+        """
+        Writes the output files in the given formats, "cytoscape" for the
+        files written by writeCytoFiles or the formats of writeGraphFiles
+
+        RETURNS: list of the paths of the files written
+        """
+        written = []
+        if "cytoscape" in formats:
+            written += self.writeCytoFiles(outputpath, outputlabel, cyto30,
+                                           compress)
+        others = [fmt for fmt in formats if fmt != "cytoscape"]
+        if others:
+            written += self.writeGraphFiles(outputpath, outputlabel, others,
+                                            compress)
+        return written
+
+
+OUTPUT_FORMATS = ("cytoscape", "graphml", "json", "tsv")
+
+
+def openInputFile(path):
+    """
+    Opens the text file path for reading, decompressing it as it is read if
+    it is compressed with gzip or bzip2
+    """
+    with open(path, "rb") as f:
+        magic = f.read(3)
+    if magic[:2] == b"\x1f\x8b":
+        return gzip.open(path, "rt")
+    if magic == b"BZh":
+        return bz2.open(path, "rt")
+    return open(path, "r")
+
+
+def writeOutputFile(path, lines, compress=False):
+    """
+    Writes the list of strings lines to path in one call, to path + ".gz"
+    with gzip if compress is True
+
+    RETURNS: the path of the file written
+    """
+    if compress:
+        path += ".gz"
+        # Level 6, as the gzip command, is much faster than the default 9
+        f = gzip.open(path, "wt", compresslevel=6)
+    else:
+        f = open(path, "w")
+    with f:
+        f.write("".join(lines))
+    return path
+
+
+def augmentForest(optForest, inputObj):
+    """
+    Creates the networkx graph storing the "augmented forest", the result of
+    msgsteiner plus all interactome edges between nodes present in the
+    forest optForest
+
+    RETURNS: a copy of optForest with the interactome edges of inputObj
+             between its nodes added, with fracOptContaining 0
+    """
+    augForest = copy.deepcopy(optForest)
+    for node in augForest.nodes():
+        edges = {}
+        try:
+            edges.update(inputObj.undirEdges[node])
+        except KeyError:
+            pass
+        try:
+            edges.update(inputObj.dirEdges[node])
+        except KeyError:
+            pass
+        for node2 in edges:
+            if node2 in augForest.nodes():
+                if (node, node2) not in optForest.edges():
+                    augForest.add_edge(
+                        node,
+                        node2,
+                        weight=edges[node2],
+                        fracOptContaining=0.0,
                     )
-                    # Check if this edge is in optForest
-                    if data["fracOptContaining"] == 1:
-                        optSif.write(node1 + "\tpd\t" + node2 + "\n")
-                        dumSif.write(node1 + "\tpd\t" + node2 + "\n")
-                except KeyError:
-                    # Don't want to write undirected interactions twice
-                    # (A pp B, B pp A).
-                    try:
-                        undirEdgesAdded[node2][node1] = 2
-                    except KeyError:
-                        augSif.write(node1 + "\tpp\t" + node2 + "\n")
-                        weightEda.write(
-                            node1
-                            + " (pp) "
-                            + node2
-                            + " = "
-                            + data["weight"]
-                            + "\n"
-                        )
-                        fracEda.write(
-                            node1
-                            + " (pp) "
-                            + node2
-                            + " = "
-                            + str(data["fracOptContaining"])
-                            + "\n"
-                        )
-                        if data["fracOptContaining"] == 1:
-                            optSif.write(node1 + "\tpp\t" + node2 + "\n")
-                            dumSif.write(node1 + "\tpp\t" + node2 + "\n")
-                        if node1 in undirEdgesAdded:
-                            undirEdgesAdded[node1][node2] = 1
-                        else:
-                            undirEdgesAdded[node1] = {node2: 1}
-
-            # iterate through nodes to record node attributes
-            nodesSorted = self.augForest.nodes(data=True)
-            nodesSorted.sort(key=itemgetter(0, 1))
-            for (node, data) in nodesSorted:
-                bcNoa.write(node + " = " + str(data["betweenness"]) + "\n")
-                prizeNoa.write(node + " = " + str(data["prize"]) + "\n")
-                fracNoa.write(
-                    node + " = " + str(data["fracOptContaining"]) + "\n"
-                )
-                ttypeNoa.write(node + " = " + str(data["TerminalType"]) + "\n")
-
-            dumSorted = self.dumForest.edges()
-            dumSorted.sort(key=itemgetter(0, 1))
-            # Record dummy edges
-            for (node1, node2) in dumSorted:
-                if node1 == "DUMMY":
-                    dumSif.write(node1 + "\tpd\t" + node2 + "\n")
-
-            optSif.close()
-            augSif.close()
-            bcNoa.close()
-            prizeNoa.close()
-            fracNoa.close()
-            weightEda.close()
-            fracEda.close()
-            print(
-                "Wrote output files for Cytoscape, in directory %s, with names"
-                " starting with "
-                '"%s".\n' % (outputpath, outputlabel)
-            )
+    return augForest
 
 
 def mergeOutputs(PCSFOutputObj1, PCSFOutputObj2, betweenness, n1=1, n2=1):
@@ -1311,7 +2250,11 @@ def mergeOutputs(PCSFOutputObj1, PCSFOutputObj2, betweenness, n1=1, n2=1):
             "Merging outputs to give summary over %i algorithm runs..."
             % (n1 + n2)
     )
-    mergedObj = copy.deepcopy(PCSFOutputObj1)
+    # The merged object shares the input object (and its interactome) with
+    # PCSFOutputObj1 rather than copying it
+    mergedObj = copy.deepcopy(
+        PCSFOutputObj1, {id(PCSFOutputObj1.inputObj): PCSFOutputObj1.inputObj}
+    )
     # Update fracOptContaining for all edges in outputObj1
     for (node1, node2, data) in PCSFOutputObj1.optForest.edges(data=True):
         numRuns1 = data["fracOptContaining"] * n1
@@ -1412,6 +2355,253 @@ def mergeOutputs(PCSFOutputObj1, PCSFOutputObj2, betweenness, n1=1, n2=1):
     return mergedObj
 
 
+class EnsembleMerger(object):
+    def __init__(self, inputObj):
+        """ Merges the outputs of many msgsteiner runs one at a time, keeping
+        only the number of runs containing each node and edge. Gives the same
+        graphs as chaining mergeOutputs over all runs, without copying the
+        merged graphs for every run.
+
+        INPUT: inputObj - the PCSFInput object of the original (unchanged)
+                          input, used for prizes, terminal types and edge
+                          weights
+        """
+        self.inputObj = inputObj
+        self.numRuns = 0
+        # Dictionaries keep the order in which nodes and edges were first seen
+        self.nodeCounts = {}
+        self.edgeCounts = {}
+        self.roots = {}
+
+    def add(self, summary):
+        """Adds one run, given as the summary of its PCSFOutput object"""
+        self.numRuns += 1
+        nodeCounts = self.nodeCounts
+        for node in summary["nodes"]:
+            nodeCounts[node] = nodeCounts.get(node, 0) + 1
+        edgeCounts = self.edgeCounts
+        for (node1, node2) in summary["edges"]:
+            edge = (node1, node2)
+            edgeCounts[edge] = edgeCounts.get(edge, 0) + 1
+        for node in summary["roots"]:
+            self.roots[node] = True
+
+    def addOutput(self, outputObj):
+        """Adds one run, given as a PCSFOutput object"""
+        self.add(outputObj.summary())
+
+    def merged(self, betweenness=True):
+        """
+        RETURNS: A new PCSFOutput object with all edges found in any run,
+                 with fracOptContaining values over all runs added so far
+                 and, if betweenness is True, betweenness values.
+        """
+        inputObj = self.inputObj
+        numRuns = float(self.numRuns)
+        optForest = nx.DiGraph()
+        for node, count in self.nodeCounts.items():
+            optForest.add_node(
+                node,
+                prize=inputObj.totalPrizes.get(node, 0),
+                TerminalType=inputObj.terminalTypes.get(node, ""),
+                fracOptContaining=count / numRuns,
+            )
+        for (node1, node2), count in self.edgeCounts.items():
+            try:
+                weight = inputObj.dirEdges[node1][node2]
+            except KeyError:
+                weight = inputObj.undirEdges[node1][node2]
+            optForest.add_edge(
+                node1, node2, weight=weight, fracOptContaining=count / numRuns
+            )
+        dumForest = nx.DiGraph()
+        for node in self.roots:
+            dumForest.add_edge("DUMMY", node)
+
+        # Create augForest based on optForest
+        augForest = copy.deepcopy(optForest)
+        for node in augForest.nodes():
+            edges = {}
+            edges.update(inputObj.undirEdges.get(node, {}))
+            edges.update(inputObj.dirEdges.get(node, {}))
+            for node2 in edges:
+                if node2 in augForest and not optForest.has_edge(node, node2):
+                    augForest.add_edge(
+                        node, node2, weight=edges[node2], fracOptContaining=0.0
+                    )
+        # Calculate betweenness centrality for all nodes in augmented forest
+        if betweenness:
+            betweenness = nx.betweenness_centrality(augForest)
+            nx.set_node_attributes(augForest, betweenness, "betweenness")
+        else:
+            nx.set_node_attributes(augForest, 0, "betweenness")
+
+        mergedObj = PCSFOutput.__new__(PCSFOutput)
+        mergedObj.optForest = optForest
+        mergedObj.augForest = augForest
+        mergedObj.dumForest = dumForest
+        mergedObj.inputObj = inputObj
+        return mergedObj
+
+
+class RunManifest(object):
+    def __init__(self, path, header):
+        """ A checkpoint of the completed runs of an ensemble. Every run is
+        appended as one line of JSON, with its number, seed and the summary
+        of its output, as soon as it completes. A restarted or extended
+        ensemble loads the manifest and only runs the missing runs.
+
+        INPUT: path - path of the manifest file
+               header - dictionary describing the inputs and parameters of
+                        the ensemble. Runs are only reused from a manifest
+                        with the same header.
+        """
+        self.path = path
+        self.header = header
+        self.handle = None
+
+    @staticmethod
+    def read(path):
+        """
+        Reads the manifest at path, whatever its header.
+
+        RETURNS: (header, list of the records of the completed runs). The
+                 header is None if the manifest is empty.
+        """
+        with open(path, "r") as f:
+            lines = f.read().split("\n")
+        # The last line is incomplete if the job died while writing it
+        if lines[-1] != "":
+            print("WARNING: Ignoring incomplete last line of %s\n" % path)
+        lines = lines[:-1]
+        if not lines:
+            return (None, [])
+        return (json.loads(lines[0]), [json.loads(line) for line in lines[1:]])
+
+    def load(self, numRuns):
+        """
+        RETURNS: dictionary of the records of the completed runs numbered
+                 below numRuns, {run: record}. Empty if there is no manifest.
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        (header, runs) = RunManifest.read(self.path)
+        if header != self.header:
+            raise InputError(
+                "ERROR: The run manifest %s was written for different inputs"
+                " or parameters. Remove it, or change the output label, to"
+                " start a new ensemble." % self.path
+            )
+        for record in runs:
+            if record["run"] < numRuns:
+                records[record["run"]] = record
+        return records
+
+    def open(self, records):
+        """
+        Starts a new manifest file with the header and the given records,
+        dropping any incomplete line left by an earlier job
+        """
+        self.close()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(json.dumps(self.header) + "\n")
+            for run in sorted(records):
+                f.write(json.dumps(records[run]) + "\n")
+        os.rename(tmp, self.path)
+        self.handle = open(self.path, "a")
+
+    def append(self, record):
+        """Records one completed run and flushes it to disk"""
+        self.handle.write(json.dumps(record) + "\n")
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def ensembleManifest(run_type, seed, inputObj, outputpath, outputlabel,
+                     excludeT):
+    """
+    Returns the RunManifest of an ensemble, stored in
+    <outputpath>/<outputlabel>_<run_type>_runs.jsonl. Its header identifies
+    the prizes, the size of the interactome and all parameters that change
+    the results of the runs.
+    """
+    prizes = hashlib.sha1(
+        json.dumps(sorted(inputObj.origPrizes.items())).encode("utf-8")
+    ).hexdigest()
+    header = {
+        "run_type": run_type,
+        "seed": seed,
+        "excludeT": bool(excludeT),
+        "musquared": bool(inputObj.musquared),
+        "params": dict(
+            (name, getattr(inputObj, name))
+            for name in ("w", "b", "D", "mu", "g", "r", "gb", "noise")
+        ),
+        "prizes": prizes,
+        "interactome": [len(inputObj.dirEdges), len(inputObj.undirEdges)],
+    }
+    path = os.path.join(
+        outputpath, "%s_%s_runs.jsonl" % (outputlabel, run_type)
+    )
+    return RunManifest(path, header)
+
+
+class EnsembleProgress(object):
+    def __init__(self, run_type, numRuns, interval=1.0):
+        """ Prints the progress of an ensemble as its runs complete: runs
+        completed and failed, runs per minute and the estimated time left.
+        Lines are printed at most every interval seconds, and for the last
+        run.
+        """
+        self.run_type = run_type
+        self.numRuns = numRuns
+        self.interval = interval
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.start = time.time()
+        self.lastReport = 0.0
+
+    def update(self, error=None, cancelled=False):
+        """
+        Records one finished run, error is its error message if it failed
+        and cancelled is True if it was stopped by the time budget
+        """
+        if cancelled:
+            self.cancelled += 1
+        elif error is None:
+            self.completed += 1
+        else:
+            self.failed += 1
+            print("WARNING: a %s run failed: %s\n" % (self.run_type, error))
+        now = time.time()
+        done = self.completed + self.failed + self.cancelled
+        if done < self.numRuns and now - self.lastReport < self.interval:
+            return
+        self.lastReport = now
+        elapsed = now - self.start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        if rate > 0:
+            eta = "%.0fs" % ((self.numRuns - done) / rate)
+        else:
+            eta = "unknown"
+        cancelled = ""
+        if self.cancelled > 0:
+            cancelled = ", %i cancelled" % self.cancelled
+        print(
+            "%s: %i/%i runs completed, %i failed%s, %.2f runs/min, ETA %s"
+            % (self.run_type, self.completed, self.numRuns, self.failed,
+               cancelled, rate * 60, eta)
+        )
+
+
 def shufflePrizes(PCSFInputObj, seed, excludeT):
     """
     Shuffles the prizes over all the nodes in PCSFInputObj.
@@ -1433,13 +2623,8 @@ def shufflePrizes(PCSFInputObj, seed, excludeT):
     shuffledValues = dict(
         list(zip(newNodes, list(PCSFInputObj.origPrizes.values())))
     )
-    # Make a new PCSFInput object that contains all the same values as
-    # the original
-    newPCSFInputObj = copy.deepcopy(PCSFInputObj)
-    # Change the prizes to be the new dictionary
-    newPCSFInputObj.origPrizes = shuffledValues
-    newPCSFInputObj.assignNegPrizes(newPCSFInputObj.musquared, excludeT)
-    return newPCSFInputObj
+    # Share the interactome with the original object, only the prizes change
+    return PCSFInputOverlay(PCSFInputObj, shuffledValues, excludeT=excludeT)
 
 
 def noiseEdges(PCSFInputObj, seed, excludeT):
@@ -1451,23 +2636,28 @@ def noiseEdges(PCSFInputObj, seed, excludeT):
            number generator RETURNS: a new PCSFInput object with with
            added gaussian noise to edge values
     """
-    # Make a new PCSFInput object that contains all the same values as the
-    # original
-    newPCSFInputObj = copy.deepcopy(PCSFInputObj)
+    # Make a new PCSFInput object that shares all the values of the original
+    # but the edge dictionaries, which are rebuilt with the noise added. For
+    # an overlay the new edges replace those of the shared base object.
+    newPCSFInputObj = copy.copy(PCSFInputObj)
     # Generate gaussian noise values, mean=0, stdev default=0.333 (edge
     # values range between 0 and 1)
     random.seed(seed)
     dev = PCSFInputObj.noise
-    for node1 in newPCSFInputObj.dirEdges:
-        for node2 in newPCSFInputObj.dirEdges[node1]:
-            newPCSFInputObj.dirEdges[node1][node2] = float(
-                PCSFInputObj.dirEdges[node1][node2]
-            ) + random.gauss(0, dev)
-    for node1 in newPCSFInputObj.undirEdges:
-        for node2 in newPCSFInputObj.undirEdges[node1]:
-            newPCSFInputObj.undirEdges[node1][node2] = float(
-                PCSFInputObj.undirEdges[node1][node2]
-            ) + random.gauss(0, dev)
+    newPCSFInputObj.dirEdges = dirEdges = {}
+    for node1 in PCSFInputObj.dirEdges:
+        edges = PCSFInputObj.dirEdges[node1]
+        dirEdges[node1] = dict(
+            (node2, float(edges[node2]) + random.gauss(0, dev))
+            for node2 in edges
+        )
+    newPCSFInputObj.undirEdges = undirEdges = {}
+    for node1 in PCSFInputObj.undirEdges:
+        edges = PCSFInputObj.undirEdges[node1]
+        undirEdges[node1] = dict(
+            (node2, float(edges[node2]) + random.gauss(0, dev))
+            for node2 in edges
+        )
     print("Noise has been added to all edge values.\n")
     return newPCSFInputObj
 
@@ -1483,93 +2673,229 @@ def randomTerminals(PCSFInputObj, seed, excludeT):
     """
     # Only can do this if the interactome is big enough
     if len(PCSFInputObj.undirEdges) + len(PCSFInputObj.dirEdges) < 50:
-        sys.exit("Cannot use --randomTerminals with such a small interactome.")
-    # Make a new PCSFInput object that contains all the same values as the
-    # original but empty prizes
-    newPCSFInputObj = copy.deepcopy(PCSFInputObj)
-    newPCSFInputObj.origPrizes = {"": 0}
-    # degrees is a sorted list that will hold outdegree of every node in
-    # interactome
-    degrees = []
-    if len(PCSFInputObj.undirEdges) > 0 and len(PCSFInputObj.dirEdges) > 0:
-        for node in PCSFInputObj.undirEdges:
-            try:
-                degrees.append(
-                    (
-                        node,
-                        len(PCSFInputObj.undirEdges[node])
-                        + len(PCSFInputObj.dirEdges[node]),
-                    )
-                )
-            except KeyError:
-                degrees.append((node, len(PCSFInputObj.undirEdges[node])))
-        for node in PCSFInputObj.dirEdges:
-            if node not in PCSFInputObj.undirEdges:
-                degrees.append((node, len(PCSFInputObj.dirEdges[node])))
-    else:
-        for node in PCSFInputObj.undirEdges:
-            degrees.append((node, len(PCSFInputObj.undirEdges[node])))
-        for node in PCSFInputObj.dirEdges:
-            degrees.append((node, len(PCSFInputObj.dirEdges[node])))
-    degrees.sort(key=itemgetter(1))
-    # Find index of current terminal in degrees list
-    for k, terminal in enumerate(PCSFInputObj.origPrizes):
-        for i, value in enumerate(degrees):
-            if terminal == value[0]:
-                index = i
-                break
-        # Choose an index offset to select new terminal (distance from orig
-        # terminal in degrees list) Make sure newly chosen terminal is not
-        # already chosen on a previous round
-        newTerm = ""
-        i = -1
-        while newTerm in newPCSFInputObj.origPrizes and i <= 10000:
-            i += 1
-            if seed is not None:
-                random.seed(seed + k + i)
-            offset = int(random.gauss(0.0, 100.0))
-            newIndex = index + offset
-            # if offset causes the index to wraparound to the other side of
-            # the list, try again
-            if newIndex < 0:
-                continue
-            try:
-                newNode = degrees[newIndex]
-            except IndexError:
-                # if offset points outside list, try loop again
-                continue
-            # To make truly random, need to choose randomly between all nodes
-            # with the same degree Otherwise, ordering of dict iteration
-            # matters
-            nodesWithSameDegree = []
-            for node in degrees[newIndex:]:
-                if node[1] == newNode[1]:
-                    nodesWithSameDegree.append(node)
-                else:
-                    break
-            for node in degrees[newIndex - 1::-1]:
-                if node[1] == newNode[1]:
-                    nodesWithSameDegree.append(node)
-                else:
-                    break
-            newTerm = random.choice(nodesWithSameDegree)[0]
-        # if we've tried 10000 times, throw error to avoid infinite loop
-        if newTerm in newPCSFInputObj.origPrizes:
-            sys.exit("There was a problem with --randomTerminals. Aborting.")
-        # Assign prize to newly chosen terminal
-        newPCSFInputObj.origPrizes[newTerm] = PCSFInputObj.origPrizes[terminal]
-    del newPCSFInputObj.origPrizes[""]
-    newPCSFInputObj.assignNegPrizes(newPCSFInputObj.musquared, excludeT)
+        raise InputError(
+            "Cannot use --randomTerminals with such a small interactome."
+        )
+    (nodes, degrees, bucketStart, bucketEnd, rank) = \
+        PCSFInputObj.degreeIndex()
+    terminals = list(PCSFInputObj.origPrizes.keys())
+    # Position of every terminal in the sorted degrees array. Terminals
+    # without outgoing edges are not in the array, treat them as the lowest
+    # degree nodes.
+    index = np.array([rank.get(t, 0) for t in terminals], dtype=np.int64)
+    numNodes = len(nodes)
+
+    rng = np.random.RandomState(seed)
+    chosen = np.full(len(terminals), -1, dtype=np.int64)
+    taken = np.zeros(numNodes, dtype=bool)
+    pending = np.arange(len(terminals))
+    attempts = 0
+    # Draw a candidate for every terminal still waiting for one at once.
+    # Candidates are rejected if the offset (distance from the original
+    # terminal in the degrees array) points outside the array or the node was
+    # already chosen, including by an earlier terminal in the same draw.
+    while pending.size > 0 and attempts <= 10000:
+        attempts += 1
+        offsets = (rng.standard_normal(pending.size) * 100.0).astype(np.int64)
+        newIndex = index[pending] + offsets
+        valid = (newIndex >= 0) & (newIndex < numNodes)
+        # To make truly random, choose uniformly between all nodes with the
+        # same degree as the node at newIndex
+        candidates = np.full(pending.size, -1, dtype=np.int64)
+        validIndex = newIndex[valid]
+        start = bucketStart[validIndex]
+        size = bucketEnd[validIndex] - start
+        draws = rng.random_sample(validIndex.size)
+        candidates[valid] = start + (draws * size).astype(np.int64)
+        valid[valid] = ~taken[candidates[valid]]
+        validPos = np.flatnonzero(valid)
+        firstPos = np.unique(candidates[validPos], return_index=True)[1]
+        accepted = validPos[firstPos]
+        chosen[pending[accepted]] = candidates[accepted]
+        taken[candidates[accepted]] = True
+        pending = np.delete(pending, accepted)
+    # if we've tried 10000 times, throw error to avoid infinite loop
+    if pending.size > 0:
+        raise ForestError(
+            "There was a problem with --randomTerminals. Aborting."
+        )
+    # Assign prizes to newly chosen terminals
+    newPrizes = {}
+    for k, terminal in enumerate(terminals):
+        newPrizes[nodes[chosen[k]]] = PCSFInputObj.origPrizes[terminal]
+    # Share the interactome with the original object, only the prizes change
+    newPCSFInputObj = PCSFInputOverlay(
+        PCSFInputObj, newPrizes, excludeT=excludeT
+    )
     print("New degree-matched terminals have been chosen.\n")
     return newPCSFInputObj
 
 
+class BackgroundWriter(object):
+    def __init__(self, maxPending=2):
+        """ Writes output files on a background thread, so that writing the
+        files of one run overlaps with computing the next. At most
+        maxPending writes wait in the queue, submit() blocks when it is full,
+        which bounds the memory held by output objects waiting to be
+        written. The lists of paths returned by the writes are collected in
+        self.written.
+        """
+        self.queue = Queue(maxPending)
+        self.errors = []
+        self.written = []
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, func, *args):
+        """Calls func(*args) on the writer thread"""
+        self.queue.put((func, args))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            (func, args) = item
+            try:
+                written = func(*args)
+                if written is not None:
+                    self.written.extend(written)
+            except Exception as e:
+                print("WARNING: Writing output files failed: %s\n" % e)
+                self.errors.append(e)
+
+    def close(self):
+        """
+        Waits for all submitted writes
+
+        RETURNS: the list of exceptions raised by failed writes
+        """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        return self.errors
+
+
+class InlineWriter(object):
+    """Writes output files at once, with the interface of BackgroundWriter"""
+
+    def submit(self, func, *args):
+        """Calls func(*args) and returns its result"""
+        return func(*args)
+
+    def close(self):
+        return []
+
+
+# The base PCSFInput object of a shared pool, installed once in every worker
+# by initWorker so that tasks do not pickle the whole interactome
+_workerInput = None
+
+# The BackgroundWriter of a pool worker, see workerWriter
+_workerWriter = None
+
+# Base PCSFInput objects shared by name, see PCSFInputOverlay.share
+_sharedInputs = {}
+
+
+def initWorker(inputObj, scheduler=None):
+    """
+    Pool initializer that shares inputObj with all tasks of a worker, and
+    installs the ThreadScheduler of the pool
+    """
+    global _workerInput, _threadScheduler
+    _workerInput = inputObj
+    _threadScheduler = scheduler
+
+
+def shareInputs(inputs):
+    """
+    Shares the PCSFInput objects of inputs, {name: inputObj}, in this process
+    so that overlays shared under their names can be unpickled
+    """
+    _sharedInputs.update(inputs)
+
+
+def initSharedWorker(inputs, scheduler=None):
+    """
+    Pool initializer for a pool running the tasks of many input objects,
+    such as the jobs of a Forest server. Tasks carry overlays of the objects
+    in inputs, sent by name (see PCSFInputOverlay.share). Output files are
+    written before each task returns, so the files of a job are complete
+    once all of its tasks are. scheduler is the ThreadScheduler of the
+    pool.
+    """
+    global _workerWriter, _threadScheduler
+    shareInputs(inputs)
+    _threadScheduler = scheduler
+    _workerWriter = InlineWriter()
+
+
+def workerInput(inputObj):
+    """
+    Returns inputObj, or the input object installed by initWorker if
+    inputObj is None
+    """
+    return _workerInput if inputObj is None else inputObj
+
+
+def workerWriter():
+    """
+    Returns the BackgroundWriter of this process, started on first use. Its
+    pending writes are finished when the process exits normally, e.g. when
+    a pool worker is shut down by Pool.close() and Pool.join(). With
+    telemetry enabled, files are written before each task returns so that
+    the writes are recorded with the run.
+    """
+    global _workerWriter
+    if _workerWriter is None:
+        if telemetryEnabled():
+            _workerWriter = InlineWriter()
+            return _workerWriter
+        _workerWriter = BackgroundWriter()
+        mp.util.Finalize(_workerWriter, _workerWriter.close, exitpriority=10)
+    return _workerWriter
+
+
+@profiledTask
+@scheduledTask
+def runMainForest(inputObj, seed, outputpath, outputlabel, cyto30,
+                  formats=("cytoscape",), compress=False):
+    """
+    Runs msgsteiner on the unchanged input and writes the output files in
+    the given formats, as a task that can be scheduled on a pool next to the
+    ensemble runs
+
+    RETURNS: (the telemetry records of the run, list of the paths of the
+             files written). Files written by a BackgroundWriter after the
+             task returns are not listed.
+    """
+    start = telemetryMark()
+    inputObj = workerInput(inputObj)
+    (edgeList, info) = inputObj.runPCSF(seed)
+    outputObj = PCSFOutput(inputObj, edgeList, info, outputpath, outputlabel,
+                           1)
+    written = workerWriter().submit(outputObj.writeFiles, outputpath,
+                                    outputlabel, cyto30, formats, compress)
+    return (telemetryRecords(start, "main"),
+            [outputObj.infoFile] + (written or []))
+
+
 def PCSF_parr(func, excludeT, inputObj, run_type,
-              outputpath, outputlabel, seed, i):
-    """Wrapper function for runPCSF when using multiprocessing"""
+              outputpath, outputlabel, seed, i, deadline=None):
+    """
+    Wrapper function for runPCSF when using multiprocessing. If outputpath
+    is None, no files are written for the run, otherwise they are written by
+    the background writer of the worker while it goes on with the next run.
+    The paths of the files written before it returns are kept in the files
+    attribute of the returned output object.
+    """
+    inputObj = workerInput(inputObj)
     seed = seed + i if seed is not None else None
-    changedInputObj = func(inputObj, seed, excludeT)
-    (Edge, Info) = changedInputObj.runPCSF(seed)
+    with stage("perturb"):
+        changedInputObj = func(inputObj, seed, excludeT)
+    (Edge, Info) = changedInputObj.runPCSF(seed, deadline)
     # By creating the output object with inputObj instead of
     # changedInputObj, the prizes stored in the networkx graphs
     # will be the ORIGINAL CORRECT prizes, not the changed prizes
@@ -1581,12 +2907,398 @@ def PCSF_parr(func, excludeT, inputObj, run_type,
         outputlabel + "_%s_%i" % (run_type, i),
         0,
     )
-    label = "%s_%i" % (run_type, i)
-    out = os.path.join(outputpath, label)
-    if not os.path.exists(out):
-        os.makedirs(out)
-        changedOutputObj.writeCytoFiles(out, label, True)
-    return changedOutputObj
+    files = []
+    if outputpath is not None:
+        label = "%s_%i" % (run_type, i)
+        out = os.path.join(outputpath, label)
+        # Files left by an interrupted earlier attempt of this run are
+        # rewritten
+        if not os.path.exists(out):
+            os.makedirs(out)
+        written = workerWriter().submit(changedOutputObj.writeCytoFiles, out,
+                                        label, True)
+        files = [changedOutputObj.infoFile] + (written or [])
+    # The parent already has the input object, don't send the interactome
+    # back through the pool. The copy keeps it for the pending write.
+    result = copy.copy(changedOutputObj)
+    result.inputObj = None
+    result.solverUsage = changedInputObj.solverUsage
+    result.files = files
+    return result
+
+
+def ensembleFunction(run_type):
+    """Returns the function that changes the input for a type of run"""
+    if run_type == 'shufflePrizes':
+        return shufflePrizes
+    elif run_type == 'noisyEdges':
+        return noiseEdges
+    elif run_type == 'randomTerminals':
+        return randomTerminals
+    else:
+        raise(ValueError)
+
+
+@profiledTask
+@scheduledTask
+def ensembleTask(args):
+    """
+    Runs PCSF_parr on a tuple of its arguments, for Pool.imap_unordered.
+    Failures are returned instead of raised so that the other runs of the
+    ensemble still complete.
+
+    RETURNS: (run number, summary of the output with the "run" number,
+             "seed", "elapsed" seconds and msgsteiner resource usage
+             ("solver", see solverUsage) added, its "telemetry" records
+             if telemetry is enabled and the paths of the "files" it wrote,
+             if any, or None, error message or None). Both
+             are None if the run was cancelled because the deadline, the
+             last argument, had passed.
+    """
+    seed, i, deadline = args[-3:]
+    start = time.time()
+    if deadline is not None and start >= deadline:
+        return (i, None, None)
+    try:
+        recordsStart = telemetryMark()
+        output = PCSF_parr(*args)
+        summary = output.summary()
+        summary["run"] = i
+        summary["seed"] = seed + i if seed is not None else None
+        summary["elapsed"] = time.time() - start
+        summary["solver"] = output.solverUsage
+        if output.files:
+            summary["files"] = output.files
+        if telemetryEnabled():
+            summary["telemetry"] = telemetryRecords(
+                recordsStart, "%s_%i" % (args[3], i)
+            )
+        return (i, summary, None)
+    except BudgetExceeded:
+        return (i, None, None)
+    except Exception as e:
+        return (i, None, str(e))
+
+
+class AdaptiveStopping(object):
+    def __init__(self, ciWidth=0.05, minFrequency=0.1, batchSize=10, z=1.96):
+        """ Stopping rule for ensembles that run until the node frequencies
+        (fracOptContaining) are estimated precisely enough, rather than for a
+        fixed number of runs. Runs are launched in batches, and after each
+        batch the normal approximation confidence interval of the frequency
+        of every node found in at least minFrequency of the runs is
+        computed. The ensemble stops when the widest of these intervals has a
+        half-width of at most ciWidth.
+
+        INPUT: ciWidth - target half-width of the confidence intervals
+               minFrequency - only nodes with at least this frequency are
+                              considered
+               batchSize - number of runs launched between two checks. The
+                           number of runs is always a multiple of batchSize,
+                           so it does not depend on the order runs complete.
+               z - normal quantile of the confidence level (1.96 for 95%)
+        """
+        if batchSize < 1:
+            raise ValueError("The adaptive batch size must be at least 1.")
+        self.ciWidth = ciWidth
+        self.minFrequency = minFrequency
+        self.batchSize = batchSize
+        self.z = z
+        self.halfWidth = None
+
+    def converged(self, merger):
+        """
+        Returns True if the node frequencies of the runs merged so far are
+        precise enough. The widest half-width is kept in self.halfWidth.
+        """
+        numRuns = merger.numRuns
+        if numRuns == 0:
+            return False
+        freqs = np.fromiter(merger.nodeCounts.values(), dtype=float,
+                            count=len(merger.nodeCounts)) / numRuns
+        freqs = freqs[freqs >= self.minFrequency]
+        if freqs.size == 0:
+            self.halfWidth = 0.0
+        else:
+            self.halfWidth = float(
+                self.z * np.sqrt(freqs * (1 - freqs) / numRuns).max()
+            )
+        return self.halfWidth <= self.ciWidth
+
+    def describe(self):
+        """Text describing the rule and the last check, for the report"""
+        return (
+            "Adaptive stopping: max confidence interval half-width %s, target"
+            " %f, for nodes with frequency >= %f (z = %f, batches of %i)"
+            % ("n/a" if self.halfWidth is None else "%f" % self.halfWidth,
+               self.ciWidth, self.minFrequency, self.z, self.batchSize)
+        )
+
+
+class TimeBudget(object):
+    def __init__(self, seconds):
+        """ A wall-clock budget shared by the ensembles of a job. The clock
+        starts when the first ensemble starts. Ensembles launch new runs only
+        while the runs are expected to finish before the deadline, and runs
+        still going at the deadline are cancelled.
+
+        INPUT: seconds - length of the budget
+        """
+        if seconds <= 0:
+            raise ValueError("The time budget must be positive.")
+        self.seconds = seconds
+        self.deadline = None
+
+    def start(self):
+        """Starts the clock, if it is not running yet"""
+        if self.deadline is None:
+            self.deadline = time.time() + self.seconds
+
+    def remaining(self):
+        """Seconds left before the deadline"""
+        return self.deadline - time.time()
+
+    def allows(self, runCost, numRuns, processes):
+        """
+        Returns True if numRuns runs taking runCost seconds each, run
+        processes at a time, are expected to finish before the deadline.
+        If runCost is None (no run finished yet), only checks that the
+        deadline has not passed.
+        """
+        if runCost is None:
+            return self.remaining() > 0
+        waves = -(-numRuns // max(1, processes))
+        return waves * runCost <= self.remaining()
+
+
+class EnsembleRun(object):
+    def __init__(self, run_type, seed, inputObj, numRuns, outputpath,
+                 outputlabel, excludeT, merge=False, resume=False,
+                 adaptive=None, budget=None, store=None):
+        """ The runs of one noisyEdges, shufflePrizes or randomTerminals
+        ensemble. start() schedules them on a pool and finish() consumes the
+        results as runs complete, merging each one into the summary so far,
+        recording it in the run manifest and printing the progress.
+
+        INPUT: run_type - 'noisyEdges', 'shufflePrizes' or 'randomTerminals'
+               numRuns - the number of runs, or the maximum number of runs
+                         with adaptive stopping
+               resume - reuse the runs recorded in the run manifest of an
+                        earlier job with the same inputs
+               adaptive - an AdaptiveStopping object to launch runs in
+                          batches until the node frequencies are precise
+                          enough, or None to run numRuns runs
+               budget - a TimeBudget object to launch runs in batches of
+                        one run per process while they are expected to
+                        fit in the budget, or None for no time limit
+               store - a RunStore object to write the runs to instead of
+                       a directory and an info file per run, or None
+               The other arguments are the same as
+               changeValuesAndMergeResults
+        """
+        self.run_type = run_type
+        self.func = ensembleFunction(run_type)
+        self.seed = seed
+        self.inputObj = inputObj
+        self.numRuns = numRuns
+        self.outputpath = outputpath
+        self.outputlabel = outputlabel
+        self.excludeT = excludeT
+        self.merge = merge
+        self.adaptive = adaptive
+        self.budget = budget
+        self.store = store
+        # Number of runs going at the same time, as for mp.Pool
+        self.processes = inputObj.processes or mp.cpu_count()
+        if run_type == 'randomTerminals':
+            # Build the degree index once so every run shares it
+            inputObj.degreeIndex()
+        self.manifest = ensembleManifest(run_type, seed, inputObj,
+                                         outputpath, outputlabel, excludeT)
+        self.previous = self.manifest.load(numRuns) if resume else {}
+        self.merger = EnsembleMerger(inputObj)
+        for run in sorted(self.previous):
+            self.merger.add(self.previous[run])
+        self.nextRun = 0
+        self.failed = 0
+        self.cancelled = 0
+        # Seconds taken by the runs completed by this job, to estimate the
+        # cost of a run for the time budget
+        self.elapsed = []
+        self.stopReason = None
+        # Telemetry records and msgsteiner resource usage of the runs
+        # completed by this job
+        self.telemetry = []
+        self.solverUsage = []
+        # Paths of the files written by the ensemble and its runs
+        self.files = []
+
+    def start(self, pool, shared=False):
+        """
+        Schedules the first batch of runs (all runs without adaptive
+        stopping) on pool, unless the runs reused from an earlier job are
+        enough for adaptive stopping. If shared is True, the pool must have
+        been created with initWorker and inputObj as initializer, and
+        inputObj is not sent with every task.
+        """
+        self.pool = pool
+        self.taskInput = None if shared else self.inputObj
+        if self.budget is not None:
+            self.budget.start()
+        self.manifest.open(self.previous)
+        if self.store is not None:
+            self.store.startEnsemble(
+                self.run_type, self.manifest.header,
+                [self.previous[run] for run in sorted(self.previous)]
+            )
+        self.progress = EnsembleProgress(
+            self.run_type, self.numRuns - len(self.previous)
+        )
+        # With adaptive stopping, runs reused from an earlier job may
+        # already be enough
+        if self.adaptive is not None and self.stop():
+            self.results = None
+        else:
+            self.results = self.launch()
+
+    def launch(self):
+        """
+        Schedules the next batch of runs not completed by an earlier job.
+
+        RETURNS: an iterator over the results of ensembleTask, in the order
+                 the runs complete, or None if there are no runs left
+        """
+        if self.adaptive is not None:
+            batchSize = self.adaptive.batchSize
+        elif self.budget is not None:
+            batchSize = self.processes
+        else:
+            batchSize = self.numRuns
+        batch = []
+        while len(batch) < batchSize and self.nextRun < self.numRuns:
+            if self.nextRun not in self.previous:
+                batch.append(self.nextRun)
+            self.nextRun += 1
+        if not batch:
+            return None
+        # For each run, create process, change prize/edge values and run
+        # msgsteiner. Note that each run will create a info file
+        deadline = None if self.budget is None else self.budget.deadline
+        # Runs written to the store get no files of their own
+        outputpath = self.outputpath if self.store is None else None
+        tasks = [(self.func, self.excludeT, self.taskInput, self.run_type,
+                  outputpath, self.outputlabel, self.seed, i, deadline)
+                 for i in batch]
+        scheduleTasks(len(tasks))
+        return self.pool.imap_unordered(ensembleTask, tasks)
+
+    def stop(self):
+        """Returns True if no more batches should be launched"""
+        if self.nextRun >= self.numRuns:
+            self.stopReason = "all %i requested runs done" % self.numRuns
+            return True
+        if self.adaptive is not None and self.adaptive.converged(self.merger):
+            self.stopReason = "node frequencies converged"
+            return True
+        if self.budget is not None:
+            if self.adaptive is not None:
+                batchSize = self.adaptive.batchSize
+            else:
+                batchSize = self.processes
+            batchSize = min(batchSize, self.numRuns - self.nextRun)
+            if not self.budget.allows(self.runCost(), batchSize,
+                                      self.processes):
+                self.stopReason = "time budget used up"
+                return True
+        return False
+
+    def runCost(self):
+        """
+        Returns the mean number of seconds taken by the runs completed so
+        far, or None if no run has completed
+        """
+        if not self.elapsed:
+            return None
+        return sum(self.elapsed) / len(self.elapsed)
+
+    def finish(self):
+        """
+        Waits for all runs, writes the <outputlabel>_<run_type>_ensemble.txt
+        report and returns the merged PCSFOutput object, or None if merge is
+        False or all runs failed
+        """
+        try:
+            while self.results is not None:
+                for (i, summary, error) in self.results:
+                    if summary is not None:
+                        self.telemetry.extend(summary.pop("telemetry", []))
+                        self.files.extend(summary.pop("files", []))
+                        self.merger.add(summary)
+                        self.manifest.append(summary)
+                        if self.store is not None:
+                            self.store.addRun(self.run_type, summary)
+                        self.elapsed.append(summary["elapsed"])
+                        self.solverUsage.append(summary["solver"])
+                    elif error is not None:
+                        self.failed += 1
+                    else:
+                        self.cancelled += 1
+                    self.progress.update(error, summary is None
+                                         and error is None)
+                if self.store is not None:
+                    self.store.commit()
+                self.results = None if self.stop() else self.launch()
+        finally:
+            self.manifest.close()
+        self.files.append(self.manifest.path)
+        self.files.append(self.writeReport())
+        if not self.merge or self.merger.numRuns == 0:
+            return None
+        print(
+            "Merging outputs to give summary over %i algorithm runs..."
+            % self.merger.numRuns
+        )
+        with stage("merge"):
+            merged = self.merger.merged()
+        print("Outputs were successfully merged.\n")
+        return merged
+
+    def writeReport(self):
+        """
+        Prints and writes how many runs were done, reused and failed
+
+        RETURNS: the path of the report
+        """
+        lines = [
+            "Runs requested: %i" % self.numRuns,
+            "Runs completed: %i" % self.merger.numRuns,
+            "Runs reused from the run manifest: %i" % len(self.previous),
+            "Runs failed: %i" % self.failed,
+            "Stopped because: %s" % self.stopReason,
+        ]
+        if self.adaptive is not None:
+            lines.append(self.adaptive.describe())
+        if self.solverUsage:
+            lines.append(summarizeSolverUsage(self.solverUsage))
+        if self.budget is not None:
+            runCost = self.runCost()
+            lines.append(
+                "Time budget: %.0f seconds, runs cancelled at the deadline:"
+                " %i, mean seconds per run: %s"
+                % (self.budget.seconds, self.cancelled,
+                   "n/a" if runCost is None else "%.1f" % runCost)
+            )
+        if self.failed > 0:
+            print(
+                "WARNING: %i %s runs failed and were not merged.\n"
+                % (self.failed, self.run_type)
+            )
+        print("%s ensemble: %s\n" % (self.run_type, ", ".join(lines)))
+        path = "%s/%s_%s_ensemble.txt" % (self.outputpath, self.outputlabel,
+                                           self.run_type)
+        with open(path, "w") as report:
+            report.write("\n".join(lines) + "\n")
+        return path
 
 
 def changeValuesAndMergeResults(
@@ -1598,6 +3310,11 @@ def changeValuesAndMergeResults(
     outputlabel,
     excludeT,
     merge=False,
+    pool=None,
+    resume=False,
+    adaptive=None,
+    budget=None,
+    store=None,
 ):
     """
     Changes the prizes/edges in the PCSFInput object according to func
@@ -1614,10 +3331,26 @@ def changeValuesAndMergeResults(
                   outputpath - path to the directory where output
                   files should be stored outputlabel - a label with
                   which to name all of the output files for this run
+                  pool - multiprocessing Pool to run on. If None, a
+                  pool of inputObj.processes processes is created and
+                  closed when the runs are done. resume - reuse the
+                  runs recorded in the run manifest of an earlier job
+                  with the same inputs, and only run the missing runs
+                  adaptive - an AdaptiveStopping object to stop before
+                  numRuns runs once node frequencies are precise enough
+                  budget - a TimeBudget object to stop launching runs
+                  when they would not finish in time store - a RunStore
+                  object to write the runs to instead of a directory
+                  and an info file per run
 
     OUTPUT: <outputlabel>_changed_#_info.txt - a text file FOR EACH
                       RUN containing the contents of stderr for all
-                      msgsteiner runs RETURNS: merged - the PCSFOutput
+                      msgsteiner runs
+                      <outputlabel>_<run_type>_runs.jsonl - the run
+                      manifest, with a summary of every completed run
+                      <outputlabel>_<run_type>_ensemble.txt - the number
+                      of runs done, reused and failed
+                      RETURNS: merged - the PCSFOutput
                       object that is a result of all the merges
 
     """
@@ -1625,51 +3358,224 @@ def changeValuesAndMergeResults(
         "Preparing to change values %i times and get merged results of"
         " running the algorithm on new values.\n" % numRuns
     )
-    if run_type == 'shufflePrizes':
-        func = shufflePrizes
-    elif run_type == 'noisyEdges':
-        func = noiseEdges
-    elif run_type == 'randomTerminals':
-        func = randomTerminals
-    else:
-        raise(ValueError)
+    ensemble = EnsembleRun(run_type, seed, inputObj, numRuns, outputpath,
+                           outputlabel, excludeT, merge, resume, adaptive,
+                           budget, store)
+    ownPool = pool is None
+    if ownPool:
+        pool = createPool(inputObj)
+    try:
+        ensemble.start(pool, shared=ownPool)
+        return ensemble.finish()
+    finally:
+        if ownPool:
+            pool.close()
+            pool.join()
+
+
+@profiledTask
+@scheduledTask
+def crossValidationFold(PCSFInputObj, prizes, hold_out, seed, rep, i,
+                        outputpath, outputlabel):
+    """
+    Runs msgsteiner for one cross validation fold, with the held-out prizes
+    removed, and records which of them were recovered as steiner nodes.
+
+    INPUT: PCSFInputObj - a PCSF object with all prize nodes
+           prizes - list of all prize nodes
+           hold_out - list of the prize nodes left out of this fold
+           seed - number to give to the random number generator
+           rep, i - the repetition and fold numbers, used in file names
+           outputpath - path to the directory where output files should be
+                        stored
+           outputlabel - a label with which to name all of the output files
+                         for this run
+
+    OUTPUT: File <outputlabel>_cvIntermediate_rep<rep>k<i>.txt showing
+            steiners and terminals for this fold
+    RETURNS: (number of held-out terminals, number of recovered held-out
+             terminals, total number of Steiner nodes, path of the file
+             written)
+    """
+    PCSFInputObj = workerInput(PCSFInputObj)
+    # Only the prize dictionaries of the fold are copied, the interactome
+    # is shared with PCSFInputObj
+    origPrizes = dict(PCSFInputObj.origPrizes)
+    totalPrizes = dict(PCSFInputObj.totalPrizes)
+    for p in hold_out:
+        # Remove held out original prize and update total prize to reflect
+        # only negPrize
+        del origPrizes[p]
+        totalPrizes[p] = PCSFInputObj.negPrizes[p]
+    newPCSFInputObj = PCSFInputOverlay(
+        PCSFInputObj, origPrizes, PCSFInputObj.negPrizes, totalPrizes
+    )
+    (newEdgeList, newInfo) = newPCSFInputObj.runPCSF(seed)
+    # Sets for the membership tests, lists to report nodes in the order they
+    # were found
+    holdOutSet = set(hold_out)
+    prizeSet = set(prizes)
+    seen = set()
+    # keep track of these prizes which are returned in optimal network
+    recovered = []
+    # keep track of steiner nodes
+    steiners = []
+    # keep track of chosen terminals
+    terminals = []
+    # See if held out proteins appear in newEdgeList
+    for edge in newEdgeList.split("\n"):
+        words = edge.split()
+        if len(words) > 0:
+            for node in (words[0], words[1]):
+                if node in seen or node == "DUMMY":
+                    continue
+                seen.add(node)
+                if node in holdOutSet:
+                    recovered.append(node)
+                    steiners.append(node)
+                elif node not in prizeSet:
+                    steiners.append(node)
+                else:
+                    terminals.append(node)
+    # Write out lists for this fold's results
+    path = "%s/%s_cvIntermediate_rep%ik%i.txt" % (outputpath, outputlabel,
+                                                   rep, i)
+    with open(path, "w") as outputs:
+        outputs.write("Recovered Terminals\n")
+        outputs.write(str(recovered))
+        outputs.write("\nAll Steiner Nodes\n")
+        outputs.write(str(steiners))
+        outputs.write("\nTerminals\n")
+        outputs.write(str(terminals))
+    return (len(hold_out), len(recovered), len(steiners), path)
 
-    # Create multiprocessing Pool
-    if inputObj.processes is None:
-        pool = mp.Pool()
-    else:
-        pool = mp.Pool(inputObj.processes)
-    # For each run, create process, change prize/edge values and run msgsteiner
-    # Note that each run will create a info file
-    results = [pool.apply_async(PCSF_parr,
-                                args=(func, excludeT, inputObj, run_type,
-                                      outputpath, outputlabel, seed, i))
-               for i in range(numRuns)]
-    output = [p.get() for p in results]
-    i = 0
-    if not merge:
-        return None
-    # Merge output of new msgsteiner runs together
-    for i in range(numRuns):
-        changedOutputObj = output[i]
-        #
-        if i == 0:
-            # first run
-            merged = changedOutputObj
-        elif i == numRuns - 1:
-            # last run, merge results and calculate betweenness
-            merged = mergeOutputs(merged, changedOutputObj, 1, i, 1)
-        else:
-            # Merge results of runs with the merged object containing all
-            # results so far
-            merged = mergeOutputs(merged, changedOutputObj, 0, i, 1)
-        i += 1
-    # return merged outputobj
-    return merged
+
+def submitCrossValidation(pool, k, reps, PCSFInputObj, seed, outputpath,
+                          outputlabel, firstRep=1, shared=False):
+    """
+    Schedules every (repetition, fold) pair of crossValidationReps on pool
+    without waiting for them. If shared is True, the pool must have been
+    created with initWorker and PCSFInputObj as initializer.
+
+    RETURNS: list of (rep, fold, AsyncResult)
+    """
+    prizes = list(PCSFInputObj.origPrizes.keys())
+    taskInput = None if shared else PCSFInputObj
+    results = []
+    for rep in range(firstRep, firstRep + reps):
+        print(("Running %i-fold cross validation (rep %i).\n" % (k, rep)))
+        # Shuffle the prizes in the parent so the folds only depend on
+        # the seed, not on which worker runs them. The generator is the
+        # rep's own, the global one may be reseeded by other jobs of the
+        # server or belong to the caller of the API.
+        repPrizes = list(prizes)
+        rng = random.Random(seed + rep if seed is not None else None)
+        rng.shuffle(repPrizes)
+        for i in range(0, k):
+            # select random prizes to hold out of this round
+            hold_out = repPrizes[i:len(repPrizes):k]
+            scheduleTasks(1)
+            results.append((rep, i, pool.apply_async(
+                crossValidationFold,
+                args=(taskInput, repPrizes, hold_out, seed, rep, i,
+                      outputpath, outputlabel))))
+    return results
+
+
+def writeCrossValidation(results, outputpath, outputlabel):
+    """
+    Waits for the folds scheduled by submitCrossValidation and writes the
+    <outputlabel>_cvResults_<rep>.txt and <outputlabel>_cvSummary.txt files
+
+    RETURNS: list of the paths of the files written by the folds and by
+             this function
+    """
+    summary = []
+    iterations = {}
+    written = []
+    for (rep, i, result) in results:
+        (numHeldOut, numRecovered, numSteiners, path) = result.get()
+        written.append(path)
+        iterations.setdefault(rep, []).append(
+            "%i\t%i\t%i\t%i\n"
+            % (i + 1, numHeldOut, numRecovered, numSteiners)
+        )
+        summary.append((rep, i, numHeldOut, numRecovered, numSteiners))
+
+    for rep in sorted(iterations):
+        path = "%s/%s_cvResults_%i.txt" % (outputpath, outputlabel, rep)
+        written.append(path)
+        with open(path, "w") as cvResults:
+            cvResults.write(
+                "Iteration\tNum of held-out terminals\tNum of recovered"
+                " terminals\tTotal num of Steiner nodes\n"
+            )
+            cvResults.write("".join(iterations[rep]))
+    path = "%s/%s_cvSummary.txt" % (outputpath, outputlabel)
+    written.append(path)
+    with open(path, "w") as cvSummary:
+        cvSummary.write(
+            "Rep\tNum of held-out terminals\tNum of recovered terminals\t"
+            "Fraction recovered\tMean num of Steiner nodes\n"
+        )
+        for rep in sorted(iterations):
+            folds = [row for row in summary if row[0] == rep]
+            heldOut = sum(row[2] for row in folds)
+            recovered = sum(row[3] for row in folds)
+            cvSummary.write(
+                "%i\t%i\t%i\t%f\t%f\n"
+                % (
+                    rep,
+                    heldOut,
+                    recovered,
+                    recovered / float(heldOut) if heldOut else 0.0,
+                    sum(row[4] for row in folds) / float(len(folds)),
+                )
+            )
+    return written
+
+
+def crossValidationReps(k, reps, PCSFInputObj, seed, outputpath,
+                        outputlabel, pool=None, firstRep=1):
+    """
+    Runs several repetitions of k-fold cross validation, scheduling every
+    (repetition, fold) pair on a multiprocessing pool.
+
+    INPUT: k - the number of "folds" to seperate the prize nodes into.
+           reps - the number of repetitions of k-fold cross validation
+           PCSFInputObj - a PCSF object with all prize nodes
+           seed - number to give to the random number generator
+           outputpath - path to the directory where output files should be
+                        stored
+           outputlabel - a label with which to name all of the output files
+                         for this run
+           pool - multiprocessing Pool to run the folds on. If None, a pool
+                  of PCSFInputObj.processes processes is created and closed
+                  when all folds are done.
+           firstRep - number of the first repetition, used in file names
+
+    OUTPUTS: File <outputlabel>_cvResults_<rep>.txt for every repetition
+             containing stats from the cv run, and
+             <outputlabel>_cvSummary.txt combining all repetitions. Files
+             showing steiners and terminals for each of the intermediate
+             solutions
+    """
+    ownPool = pool is None
+    if ownPool:
+        pool = createPool(PCSFInputObj)
+    try:
+        results = submitCrossValidation(pool, k, reps, PCSFInputObj, seed,
+                                        outputpath, outputlabel, firstRep,
+                                        shared=ownPool)
+        writeCrossValidation(results, outputpath, outputlabel)
+    finally:
+        if ownPool:
+            pool.close()
+            pool.join()
 
 
 def crossValidation(k, rep, PCSFInputObj, seed, outputpath,
-                    outputlabel):
+                    outputlabel, pool=None):
     """
     Seperates prizes into k "folds" and leaves those out of
     analysis. Reports what fraction of held-out prize nodes were
@@ -1682,85 +3588,10 @@ def crossValidation(k, rep, PCSFInputObj, seed, outputpath,
            path to msgsteiner code outputpath - path to the directory
            where output files should be stored outputlabel - a label
            with which to name all of the output files for this run
+           pool - multiprocessing Pool to run the folds on
 
     OUTPUTS: File <outputlabel>_cvResults_<rep>.txt containing stats
              from the cv run Files showing steiners and terminals for
              each of the intermediate solutions """
-    print(("Running %i-fold cross validation (rep %i).\n" % (k, rep)))
-    prizes = list(PCSFInputObj.origPrizes.keys())
-    if seed is not None:
-        random.seed(seed + rep)
-    else:
-        random.seed(None)
-    random.shuffle(prizes)
-    iterations = ""
-    # Do k iterations
-    for i in range(0, k):
-        # File to store steiner and terminal nodes in results
-        outputs = open(
-            "%s/%s_cvIntermediate_rep%ik%i.txt"
-            % (outputpath, outputlabel, rep, i),
-            "w",
-        )
-        # select random prizes to hold out of this round
-        hold_out = prizes[i:len(prizes):k]
-        # keep track of these prizes which are returned in optimal network
-        recovered = []
-        # keep track of steiner nodes
-        steiners = []
-        # keep track of chosen terminals
-        terminals = []
-        newPCSFInputObj = copy.deepcopy(PCSFInputObj)
-        for p in hold_out:
-            # Remove held out original prize and update total prize to reflect
-            # only negPrize
-            del newPCSFInputObj.origPrizes[p]
-            newPCSFInputObj.totalPrizes[p] = newPCSFInputObj.negPrizes[p]
-        (newEdgeList, newInfo) = newPCSFInputObj.runPCSF(seed)
-        # See if held out proteins appear in newEdgeList
-        edges = newEdgeList.split("\n")
-        for edge in edges:
-            words = edge.split()
-            if len(words) > 0:
-                for node in (words[0], words[1]):
-                    if node in hold_out:
-                        if node not in recovered:
-                            recovered.append(node)
-                            steiners.append(node)
-                    elif node not in prizes:
-                        if node != "DUMMY" and node not in steiners:
-                            steiners.append(node)
-                    else:
-                        if node not in terminals:
-                            terminals.append(node)
-        # Write out lists for this fold's results
-        outputs.write("Recovered Terminals\n")
-        outputs.write(str(recovered))
-        outputs.write("\nAll Steiner Nodes\n")
-        outputs.write(str(steiners))
-        outputs.write("\nTerminals\n")
-        outputs.write(str(terminals))
-        outputs.close
-        # Return num of held-out terminals, num of recovered hold-outs, total
-        # num of Steiner nodes
-        numRecovered = len(recovered)
-        numSteiners = len(steiners)
-        iterations = iterations + (
-            str(i + 1)
-            + "\t"
-            + str(len(hold_out))
-            + "\t"
-            + str(numRecovered)
-            + "\t"
-            + str(numSteiners)
-            + "\n"
-        )
-    results = open(
-        "%s/%s_cvResults_%i.txt" % (outputpath, outputlabel, rep), "w"
-    )
-    results.write(
-        "Iteration\tNum of held-out terminals\tNum of recovered terminals\t"
-        "Total num of Steiner nodes\n"
-    )
-    results.write(iterations)
-    results.close
+    crossValidationReps(k, 1, PCSFInputObj, seed, outputpath, outputlabel,
+                        pool, firstRep=rep)
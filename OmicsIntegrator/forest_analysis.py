@@ -0,0 +1,212 @@
+"""
+Sparse run x node and run x edge matrices of a Forest ensemble, and the
+analyses of ensembles built on them: node and edge frequencies, similarity
+and clustering of runs, co-occurrence of nodes and empirical p-values against
+shuffled prizes or random terminals.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.spatial.distance import squareform
+from scipy.stats import binom
+
+from OmicsIntegrator.forest import RunManifest
+from OmicsIntegrator.forest_store import RunStore
+
+
+def membershipMatrix(rows):
+    """
+    Builds a sparse 0/1 matrix from a list of rows, each a list of the
+    names of the columns set in that row.
+
+    RETURNS: (list of the column names in column order, CSR matrix of
+             shape (len(rows), number of names))
+    """
+    index = {}
+    indptr = [0]
+    indices = []
+    for row in rows:
+        for name in row:
+            indices.append(index.setdefault(name, len(index)))
+        indptr.append(len(indices))
+    names = sorted(index, key=index.get)
+    matrix = sp.csr_matrix(
+        (np.ones(len(indices), dtype=np.int8), np.array(indices, dtype=int),
+         np.array(indptr, dtype=int)),
+        shape=(len(rows), len(index)),
+    )
+    # A row listing the same name twice has a duplicate entry, set it to 1
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return (names, matrix)
+
+
+class EnsembleMatrix(object):
+    def __init__(self, runs, nodes, nodeMatrix, edges, edgeMatrix):
+        """ The runs of an ensemble as sparse membership matrices. Row r of
+        nodeMatrix has a 1 in the column of every node in the optimal forest
+        of runs[r], and row r of edgeMatrix a 1 in the column of every edge.
+
+        INPUT: runs - list of the run numbers, one per row
+               nodes - list of the node names, one per column of nodeMatrix
+               nodeMatrix - scipy.sparse CSR matrix, runs x nodes
+               edges - list of the (node1, node2) edges, one per column of
+                       edgeMatrix
+               edgeMatrix - scipy.sparse CSR matrix, runs x edges
+        """
+        self.runs = runs
+        self.nodes = nodes
+        self.nodeMatrix = nodeMatrix
+        self.edges = edges
+        self.edgeMatrix = edgeMatrix
+
+    @classmethod
+    def fromSummaries(cls, summaries):
+        """
+        Builds the matrices from run summaries, as returned by
+        PCSFOutput.summary() with a "run" number, or stored in run manifests
+        """
+        summaries = sorted(summaries, key=lambda summary: summary["run"])
+        (nodes, nodeMatrix) = membershipMatrix(
+            [summary["nodes"] for summary in summaries]
+        )
+        (edges, edgeMatrix) = membershipMatrix(
+            [[tuple(edge) for edge in summary["edges"]]
+             for summary in summaries]
+        )
+        return cls([summary["run"] for summary in summaries], nodes,
+                   nodeMatrix, edges, edgeMatrix)
+
+    @classmethod
+    def fromManifest(cls, path):
+        """
+        Builds the matrices from the run manifest of an ensemble,
+        <outputlabel>_<run_type>_runs.jsonl
+        """
+        (header, records) = RunManifest.read(path)
+        return cls.fromSummaries(records)
+
+    @classmethod
+    def fromStore(cls, path, run_type):
+        """
+        Builds the matrices from the runs of type run_type in the run
+        store written with --runStore, <outputlabel>_runs.sqlite
+        """
+        store = RunStore(path)
+        try:
+            (runs, nodeLists, edgeLists) = store.memberships(run_type)
+        finally:
+            store.close()
+        (nodes, nodeMatrix) = membershipMatrix(nodeLists)
+        (edges, edgeMatrix) = membershipMatrix(edgeLists)
+        return cls(runs, nodes, nodeMatrix, edges, edgeMatrix)
+
+    @property
+    def numRuns(self):
+        return len(self.runs)
+
+    def nodeFrequencies(self):
+        """
+        RETURNS: array of the fraction of runs containing each node, in the
+                 order of self.nodes (fracOptContaining of merged outputs)
+        """
+        return self.columnCounts(self.nodeMatrix) / float(max(1, self.numRuns))
+
+    def edgeFrequencies(self):
+        """
+        RETURNS: array of the fraction of runs containing each edge, in the
+                 order of self.edges
+        """
+        return self.columnCounts(self.edgeMatrix) / float(max(1, self.numRuns))
+
+    @staticmethod
+    def columnCounts(matrix):
+        return np.asarray(matrix.sum(axis=0), dtype=float).ravel()
+
+    def nodeColumns(self, nodes):
+        """
+        RETURNS: runs x len(nodes) CSR matrix with the columns of nodeMatrix
+                 for the given node names. Nodes in no run are all zero.
+        """
+        index = dict((node, col) for (col, node) in enumerate(self.nodes))
+        pairs = [(index[node], col) for (col, node) in enumerate(nodes)
+                 if node in index]
+        select = sp.csr_matrix(
+            (np.ones(len(pairs), dtype=np.int8),
+             ([row for (row, col) in pairs], [col for (row, col) in pairs])),
+            shape=(len(self.nodes), len(nodes)),
+        )
+        return sp.csr_matrix(self.nodeMatrix.dot(select))
+
+    def jaccard(self, edges=False):
+        """
+        Computes the Jaccard similarity of the node sets (or edge sets if
+        edges is True) of every pair of runs.
+
+        RETURNS: numRuns x numRuns array. Two empty runs have similarity 1.
+        """
+        matrix = self.edgeMatrix if edges else self.nodeMatrix
+        matrix = matrix.astype(float)
+        shared = matrix.dot(matrix.T).toarray()
+        sizes = np.diag(shared)
+        union = sizes[:, None] + sizes[None, :] - shared
+        similarity = np.ones_like(shared)
+        np.divide(shared, union, out=similarity, where=union > 0)
+        return similarity
+
+    def clusterRuns(self, numClusters=None, maxDistance=None,
+                    method="average", edges=False):
+        """
+        Clusters the runs hierarchically on the Jaccard distance of their
+        node (or edge) sets. Give either numClusters or maxDistance, the
+        largest distance within a cluster.
+
+        RETURNS: array of the cluster number (from 1) of each run
+        """
+        if (numClusters is None) == (maxDistance is None):
+            raise ValueError("Give one of numClusters and maxDistance.")
+        if self.numRuns < 2:
+            return np.ones(self.numRuns, dtype=int)
+        distance = 1 - self.jaccard(edges)
+        np.fill_diagonal(distance, 0)
+        tree = linkage(squareform(distance, checks=False), method=method)
+        if numClusters is not None:
+            return fcluster(tree, numClusters, criterion="maxclust")
+        return fcluster(tree, maxDistance, criterion="distance")
+
+    def coOccurrence(self, nodes=None):
+        """
+        Counts in how many runs each pair of nodes is found together, for
+        the given node names (e.g. the terminals) or all nodes.
+
+        RETURNS: (list of the node names, CSR matrix of the counts, with
+                 the number of runs containing each node on the diagonal)
+        """
+        if nodes is None:
+            nodes = self.nodes
+            matrix = self.nodeMatrix
+        else:
+            nodes = list(nodes)
+            matrix = self.nodeColumns(nodes)
+        matrix = matrix.astype(np.int32)
+        return (nodes, sp.csr_matrix(matrix.T.dot(matrix)))
+
+    def empiricalPValues(self, null):
+        """
+        Tests for every node of this ensemble whether it is found in more
+        runs than on randomized input, such as the shufflePrizes or
+        randomTerminals ensemble null. The rate of the node in null is
+        estimated as (1 + number of null runs containing it) / (1 + null
+        runs), and the p-value is the one-sided binomial probability of
+        finding the node in at least as many of the runs of this ensemble at
+        that rate. Nodes with small p-values are specific to the real
+        prizes, a node as frequent in both ensembles has a large p-value.
+
+        RETURNS: array of p-values in the order of self.nodes
+        """
+        realCounts = self.columnCounts(self.nodeMatrix)
+        nullCounts = self.columnCounts(null.nodeColumns(self.nodes))
+        nullRates = (1 + nullCounts) / (1.0 + null.numRuns)
+        # P(X >= realCount) = P(X > realCount - 1)
+        return binom.sf(realCounts - 1, self.numRuns, nullRates)
@@ -0,0 +1,232 @@
+"""
+A programmatic interface to Forest for running many jobs in one long-lived
+process, e.g. parameter sweeps. The interactome is read once and shared by
+all jobs, and errors are raised as ForestError exceptions, or recorded in
+the result of the failed job, instead of ending the program.
+
+    forest = Forest("interactome.txt", "conf.txt")
+    result = forest.run("prizes.txt", seed=1, parameters={"w": 4})
+    jobs = [dict(prizeFile="prizes.txt", parameters={"w": w}) for w in ws]
+    for result in forest.sweep(jobs):
+        if result.error is None:
+            print(result.objective["total"])
+    forest.close()
+"""
+
+import time
+import itertools
+import multiprocessing as mp
+
+from OmicsIntegrator.forest import PCSFInput, PCSFOutput, ForestError, \
+    RuntimeModel, shareInputs, initSharedWorker, startThreadScheduler, \
+    scheduledTask
+
+
+# Names under which the interactomes of Forest objects are shared with the
+# workers of their pools
+_forestNames = itertools.count()
+
+
+class ForestResult(object):
+    def __init__(self, job, output=None, error=None, elapsed=None,
+                 solverUsage=None):
+        """ The result of one Forest job.
+
+        INPUT: job - dictionary of the keyword arguments of Forest.run for
+                     the job
+               output - the PCSFOutput object of the optimal forest, or None
+                        if the job failed
+               error - the ForestError raised by the job, or None
+               elapsed - seconds spent running msgsteiner and building the
+                         output
+               solverUsage - the resources used by msgsteiner and the size
+                             of its input, see forest.solverUsage
+        """
+        self.job = job
+        self.output = output
+        self.error = error
+        self.elapsed = elapsed
+        self.solverUsage = solverUsage
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def objective(self):
+        """The objective function terms, see PCSFOutput.objective"""
+        return None if self.output is None else self.output.objective
+
+    def summary(self):
+        """Returns the PCSFOutput summary of the optimal forest"""
+        return self.output.summary()
+
+
+class Forest(object):
+    def __init__(self, edgeFile, confFile, knockout=(), processes=None,
+                 history=()):
+        """ Reads an interactome once for all jobs run with this object.
+
+        INPUT: edgeFile, confFile, knockout - as for PCSFInput. The
+                                              parameters of confFile are
+                                              used by jobs that do not give
+                                              their own.
+               processes - number of worker processes for sweep(), all
+                           CPUs if None
+               history - output directories of earlier jobs, whose run
+                         manifests and run stores train the model of the
+                         time of the runs of sweep()
+
+        Raises InputError if the files cannot be read.
+        """
+        self.interactome = PCSFInput.interactome(edgeFile, confFile, knockout)
+        self.name = "forest%i" % next(_forestNames)
+        self.processes = processes
+        self.pool = None
+        # The ThreadScheduler of the pool, see forest.ThreadScheduler
+        self.scheduler = None
+        # Predicts the time of the jobs of sweep(), trained on the jobs run
+        # so far
+        self.runtimes = RuntimeModel()
+        for path in history:
+            self.runtimes.addDirectory(path)
+
+    def inputs(self, prizeFile, dummyMode="terminals", garnet=None,
+               confFile=None, parameters=None, musquared=False,
+               excludeT=False):
+        """
+        Returns the PCSFInputOverlay object of prizeFile on the interactome,
+        see PCSFInput.withPrizes
+        """
+        return self.interactome.withPrizes(
+            prizeFile, dummyMode, garnet, confFile, parameters, musquared,
+            excludeT
+        )
+
+    def run(self, prizeFile, seed=None, outputpath=None, outputlabel="result",
+            cyto30=True, formats=("cytoscape",), compress=False,
+            **inputArgs):
+        """
+        Runs msgsteiner once on the prizes of prizeFile.
+
+        INPUT: seed - number to give to msgsteiner
+               outputpath - directory to write the output files and the info
+                            file to, or None to write no files
+               outputlabel, cyto30, formats, compress - as for
+                                                        PCSFOutput.writeFiles
+               inputArgs - the other keyword arguments of inputs()
+
+        RETURNS: a ForestResult object. Raises a ForestError if the job
+                 fails.
+        """
+        job = dict(inputArgs, prizeFile=prizeFile, seed=seed,
+                   outputpath=outputpath, outputlabel=outputlabel,
+                   cyto30=cyto30, formats=formats, compress=compress)
+        inputObj = self.inputs(prizeFile, **inputArgs)
+        result = runJob(job, inputObj)
+        self.runtimes.add(result.solverUsage, inputObj.D)
+        return result
+
+    def sweep(self, jobs):
+        """
+        Runs many jobs on a pool of workers sharing the interactome. The pool
+        is started on the first call and kept for later sweeps until
+        close(). Jobs are started longest first, as predicted by
+        self.runtimes from the jobs run before, so that no long job starts
+        when the others are almost done.
+
+        INPUT: jobs - list of dictionaries of the keyword arguments of run()
+
+        RETURNS: an iterator over the ForestResult objects of the jobs, in
+                 the order of jobs. A job that fails has the ForestError in
+                 its error attribute, the other jobs go on.
+        """
+        if self.pool is None:
+            inputs = {self.name: self.interactome}
+            shareInputs(inputs)
+            self.scheduler = startThreadScheduler(self.processes)
+            self.pool = mp.Pool(self.processes, initSharedWorker,
+                                (inputs, self.scheduler))
+        prepared = []
+        tasks = []
+        for job in jobs:
+            job = dict(job)
+            inputArgs = dict(job)
+            for name in ("seed", "outputpath", "outputlabel", "cyto30",
+                         "formats", "compress"):
+                inputArgs.pop(name, None)
+            prizeFile = inputArgs.pop("prizeFile")
+            try:
+                inputObj = self.inputs(prizeFile, **inputArgs)
+            except ForestError as e:
+                prepared.append((job, None, e))
+                continue
+            prepared.append((job, inputObj, None))
+            tasks.append((job, inputObj))
+        order = self.runtimes.longestFirst(
+            [inputObj.runtimeFeatures() for (job, inputObj) in tasks]
+        )
+        self.scheduler.submitted(len(tasks))
+        # Tasks send the name of the interactome instead of the interactome
+        results = self.pool.imap(
+            sweepTask,
+            [(tasks[i][0], tasks[i][1].share(self.name)) for i in order]
+        )
+        # Results in the order of order, until the job of the next task
+        done = {}
+        started = iter(order)
+        task = 0
+        for (job, inputObj, error) in prepared:
+            if error is not None:
+                yield ForestResult(job, error=error)
+                continue
+            while task not in done:
+                done[next(started)] = next(results)
+            result = done.pop(task)
+            task += 1
+            if result.output is not None:
+                result.output.inputObj = inputObj
+                self.runtimes.add(result.solverUsage, inputObj.D)
+            yield result
+
+    def close(self):
+        """Shuts down the pool of sweep()"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+def runJob(job, inputObj):
+    """
+    Runs msgsteiner for one job of Forest.run on inputObj and writes the
+    output files if job["outputpath"] is not None
+
+    RETURNS: a ForestResult object
+    """
+    start = time.time()
+    (edgeList, info) = inputObj.runPCSF(job.get("seed"))
+    outputpath = job.get("outputpath")
+    outputlabel = job.get("outputlabel", "result")
+    output = PCSFOutput(inputObj, edgeList, info, outputpath, outputlabel, 1)
+    if outputpath is not None:
+        output.writeFiles(outputpath, outputlabel, job.get("cyto30", True),
+                          job.get("formats", ("cytoscape",)),
+                          job.get("compress", False))
+    return ForestResult(job, output, None, time.time() - start,
+                        inputObj.solverUsage)
+
+
+@scheduledTask
+def sweepTask(args):
+    """
+    Runs one job of Forest.sweep in a worker. The output is returned
+    without its input object, which the parent already has.
+    """
+    (job, inputObj) = args
+    try:
+        result = runJob(job, inputObj)
+    except ForestError as e:
+        return ForestResult(job, error=e)
+    result.output.inputObj = None
+    return result
@@ -0,0 +1,172 @@
+"""
+Reads the interactions of PSI-MITAB files (MITAB 2.5 and later, e.g. the
+exports of IntAct, iRefIndex or BioGRID) as interactome edges, so that
+PCSFInput.readEdges can read them without converting them to the three
+column edge format first.
+
+Every interaction is an undirected edge between interactors A and B, with
+one of its confidence scores as the edge weight. The node names and the
+score are chosen with the mitabNames and mitabScore parameters of the
+configuration file, see MitabReader.
+"""
+
+# Interactor identifiers, alternative identifiers and aliases of A and B,
+# in the order node names are searched in
+NAME_COLUMNS = ((0, 1), (2, 3), (4, 5))
+CONFIDENCE_COLUMN = 14
+# MITAB 2.5 has 15 columns, later versions add columns after them
+MITAB_COLUMNS = 15
+
+
+def isMitab(line):
+    """
+    RETURNS: True if line, the first line of an edge file, is the header or
+             an interaction of a PSI-MITAB file
+    """
+    return len(line.rstrip("\r\n").split("\t")) >= MITAB_COLUMNS
+
+
+def parseEntry(entry):
+    """
+    Splits a MITAB field entry database:value(description), where value may
+    be quoted.
+
+    RETURNS: (database, value, description), description is None if the
+             entry has none
+    """
+    (database, sep, rest) = entry.partition(":")
+    description = None
+    if rest.endswith(")") and "(" in rest:
+        start = rest.rindex("(")
+        # Parentheses inside a quoted value are part of it
+        if rest.count('"', 0, start) % 2 == 0:
+            description = rest[start + 1:-1]
+            rest = rest[:start]
+    if len(rest) > 1 and rest.startswith('"') and rest.endswith('"'):
+        rest = rest[1:-1]
+    return (database, rest, description)
+
+
+def parseNames(names):
+    """
+    Parses the mitabNames parameter, a database optionally followed by an
+    alias type in parentheses, e.g. "uniprotkb(gene name)"
+
+    RETURNS: (database, description), description is None if names has
+             none
+    """
+    if names.endswith(")") and "(" in names:
+        start = names.index("(")
+        return (names[:start].strip(), names[start + 1:-1].strip())
+    return (names.strip(), None)
+
+
+class MitabReader(object):
+    def __init__(self, lines, score=None, names=None):
+        """ Iterates over the edges of the lines of a PSI-MITAB file, skipping
+        header lines starting with #.
+
+        INPUT: lines - iterable of the lines of the file
+               score - type of the confidence score used as the edge weight,
+                       e.g. "intact-miscore", or None to use the first
+                       confidence score that is a number
+               names - the identifiers used as node names, a database such
+                       as "hgnc", optionally with an alias type, e.g.
+                       "uniprotkb(gene name)". They are searched in the
+                       identifiers, alternative identifiers and aliases of
+                       the interactors, in that order. None uses the
+                       interactor identifiers, without their database.
+
+        Interactions without a name for both interactors or without a score
+        are left out and counted in self.missingNames and
+        self.missingScores.
+        """
+        self.lines = lines
+        self.score = score
+        self.names = None if names is None else parseNames(names)
+        self.missingNames = 0
+        self.missingScores = 0
+        # Node name found in every distinct identifier field, fields repeat
+        # over the interactions of an interactor
+        self.fieldNames = {}
+
+    def __iter__(self):
+        """
+        RETURNS: iterator of (line, [nodeA, nodeB, weight]) for every edge,
+                 the weight is the text of the score, as in the three column
+                 edge files
+        """
+        for line in self.lines:
+            if line.startswith("#"):
+                continue
+            columns = line.rstrip("\r\n").split("\t")
+            if len(columns) < MITAB_COLUMNS:
+                # Blank lines, and lines with too few columns to tell
+                # interactors and scores apart
+                self.missingNames += 1
+                continue
+            nodeA = self.nodeName(columns, 0)
+            nodeB = self.nodeName(columns, 1)
+            if nodeA is None or nodeB is None:
+                self.missingNames += 1
+                continue
+            weight = self.weight(columns[CONFIDENCE_COLUMN])
+            if weight is None:
+                self.missingScores += 1
+                continue
+            yield (line, [nodeA, nodeB, weight])
+
+    def nodeName(self, columns, interactor):
+        """
+        RETURNS: the name of interactor 0 (A) or 1 (B) of an interaction, or
+                 None if it has none
+        """
+        if self.names is None:
+            return self.fieldName(columns[interactor])
+        for pair in NAME_COLUMNS:
+            name = self.fieldName(columns[pair[interactor]])
+            if name is not None:
+                return name
+        return None
+
+    def fieldName(self, field):
+        """
+        RETURNS: the node name in the identifier field of an interactor, or
+                 None if it has none
+        """
+        if field in self.fieldNames:
+            return self.fieldNames[field]
+        name = None
+        if field == "-":
+            pass
+        elif self.names is None:
+            name = parseEntry(field.split("|")[0])[1] or None
+        elif self.names[0] + ":" in field:
+            (database, description) = self.names
+            for entry in field.split("|"):
+                (entryDatabase, value, entryDescription) = parseEntry(entry)
+                if entryDatabase == database and value and (
+                    description is None or entryDescription == description
+                ):
+                    name = value
+                    break
+        self.fieldNames[field] = name
+        return name
+
+    def weight(self, field):
+        """
+        RETURNS: the text of the chosen score in the confidence field, or
+                 None if it has none
+        """
+        if field == "-":
+            return None
+        for entry in field.split("|"):
+            (scoreType, value, description) = parseEntry(entry)
+            if self.score is not None and scoreType != self.score:
+                continue
+            try:
+                float(value)
+            except ValueError:
+                continue
+            return value
+        return None
@@ -0,0 +1,182 @@
+"""
+Python profiles of a Forest job, of the parent process and of the tasks run
+by the pool workers. While profiling is disabled, the default, the tasks
+decorated with profiledTask only check one global.
+
+startProfiling() profiles the main thread of the parent. Every worker
+forked afterwards profiles the tasks it runs and writes its profile to the
+output directory when it exits. writeProfiles() then writes the parent
+profile and the merged profiles of the workers as pstats files, and
+optionally as collapsed stacks for flame graph tools.
+"""
+
+import os
+import glob
+import pstats
+import cProfile
+import functools
+import multiprocessing as mp
+import multiprocessing.util
+
+
+# (output directory, output label) while profiling
+_profileOutput = None
+_parentPid = None
+_parentProfiler = None
+_workerProfiler = None
+
+
+def startProfiling(outputpath, outputlabel):
+    """
+    Starts profiling the calling thread of this process, and the tasks of
+    the workers forked afterwards
+
+    INPUT: outputpath, outputlabel - where the profiles are written, see
+                                     writeProfiles
+    """
+    global _profileOutput, _parentPid, _parentProfiler
+    _profileOutput = (outputpath, outputlabel)
+    _parentPid = os.getpid()
+    _parentProfiler = cProfile.Profile()
+    _parentProfiler.enable()
+
+
+def workerProfile(pid):
+    """Returns the path of the profile written by worker pid"""
+    (outputpath, outputlabel) = _profileOutput
+    return os.path.join(outputpath,
+                        "%s_profile_worker%i.pstats" % (outputlabel, pid))
+
+
+def dumpWorkerProfile():
+    _workerProfiler.dump_stats(workerProfile(os.getpid()))
+
+
+def workerProfiler():
+    """
+    Returns the profiler of the tasks of this worker, created on first use.
+    Its profile is written when the process exits normally, e.g. when a
+    pool worker is shut down by Pool.close() and Pool.join().
+    """
+    global _workerProfiler
+    if _workerProfiler is None:
+        # A worker forked while the parent profiler was running starts with
+        # a copy of it enabled
+        _parentProfiler.disable()
+        _workerProfiler = cProfile.Profile()
+        mp.util.Finalize(_workerProfiler, dumpWorkerProfile, exitpriority=10)
+    return _workerProfiler
+
+
+def profiledTask(func):
+    """
+    Decorates a function run as a pool task so that workers profile it
+    while profiling is on
+    """
+    @functools.wraps(func)
+    def task(*args, **kwargs):
+        if _profileOutput is None or os.getpid() == _parentPid:
+            return func(*args, **kwargs)
+        profiler = workerProfiler()
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+    return task
+
+
+def frameLabel(func):
+    """Returns the name of a pstats function key for collapsed stacks"""
+    (filename, line, name) = func
+    if filename == "~":
+        # Built-in functions
+        label = name
+    else:
+        label = "%s (%s:%i)" % (name, os.path.basename(filename), line)
+    return label.replace(";", ",")
+
+
+def collapsedStacks(stats):
+    """
+    Approximates the call stacks of a profile, which only records callers
+    and callees, by splitting the time of every function between its
+    callers in proportion to the time spent in it from each of them.
+
+    INPUT: stats - a pstats.Stats object
+
+    RETURNS: list of "frame;frame;... microseconds" lines, the collapsed
+             stack format of flame graph tools
+    """
+    entries = stats.stats
+    callees = {}
+    for (func, (cc, nc, tt, ct, callers)) in entries.items():
+        for (caller, timing) in callers.items():
+            # timing is (cc, nc, tt, ct) of the calls from caller
+            callees.setdefault(caller, []).append((func, timing[3]))
+    roots = [func for (func, entry) in entries.items() if not entry[4]]
+    lines = {}
+    # Depth first over (function, path to it, share of its time)
+    pending = [(func, (frameLabel(func),), 1.0) for func in roots]
+    while pending:
+        (func, path, share) = pending.pop()
+        (cc, nc, tt, ct, callers) = entries[func]
+        microseconds = int(round(tt * share * 1e6))
+        if microseconds > 0:
+            stack = ";".join(path)
+            lines[stack] = lines.get(stack, 0) + microseconds
+        # Paths below a microsecond are dropped, the number of paths can
+        # grow exponentially with the depth of the call graph
+        if ct * share < 1e-6:
+            continue
+        for (callee, calleeTime) in callees.get(func, []):
+            label = frameLabel(callee)
+            # Recursion is folded into the first call
+            if label in path:
+                continue
+            # The path gets its share of the calls from func
+            total = entries[callee][3]
+            if total > 0 and calleeTime > 0:
+                pending.append((callee, path + (label,),
+                                share * calleeTime / total))
+    return ["%s %i" % (stack, count) for (stack, count)
+            in sorted(lines.items())]
+
+
+def writeProfiles(stacks=False):
+    """
+    Stops profiling and writes <outputlabel>_profile_parent.pstats with the
+    profile of the parent, and <outputlabel>_profile_workers.pstats with the
+    profiles of all worker tasks merged, replacing the profiles written by
+    the workers. Call it after the pools of the job are joined.
+
+    INPUT: stacks - also write the profiles as collapsed stacks,
+                    <outputlabel>_profile_parent.collapsed and
+                    <outputlabel>_profile_workers.collapsed
+    """
+    global _profileOutput
+    if _profileOutput is None:
+        return
+    _parentProfiler.disable()
+    (outputpath, outputlabel) = _profileOutput
+    _profileOutput = None
+    prefix = os.path.join(outputpath, outputlabel + "_profile_")
+    profiles = [("parent", pstats.Stats(_parentProfiler))]
+    workerFiles = sorted(glob.glob(prefix + "worker*.pstats"))
+    if workerFiles:
+        workers = pstats.Stats(workerFiles[0])
+        for path in workerFiles[1:]:
+            workers.add(path)
+        profiles.append(("workers", workers))
+    for (name, stats) in profiles:
+        stats.dump_stats(prefix + name + ".pstats")
+        if stacks:
+            with open(prefix + name + ".collapsed", "w") as f:
+                f.write("".join(line + "\n"
+                                for line in collapsedStacks(stats)))
+    for path in workerFiles:
+        os.remove(path)
+    print(
+        'Wrote the profiles in directory %s, with names starting with'
+        ' "%s_profile_".\n' % (outputpath, outputlabel)
+    )
@@ -0,0 +1,430 @@
+"""
+A work queue in a shared directory, e.g. on NFS, for running the jobs of a
+parameter sweep or the runs of an ensemble on many machines without a batch
+scheduler.
+
+submitSpec() expands a spec into one task file per job or run in
+<queue>/todo. Any number of workers, on any machine that sees the
+directory, claim tasks by renaming them into <queue>/claimed, which only one
+of them can do, and write the summary of each result to <queue>/done (or the
+error to <queue>/failed). A claimed task whose worker stops touching it is
+put back in todo by the other workers. reduceQueue() then merges the results
+in one place.
+
+A spec is a dictionary, e.g. read from JSON:
+
+    {"edgeFile": "iref.txt", "confFile": "conf.txt", "prizeFile": "p.txt",
+     "seed": 1, "sweep": {"w": [1, 2, 4], "D": [5, 10]}}
+
+with "sweep", a grid of parameter values (and of "prizeFile", "dummyMode"
+or "seed"), or "ensemble": {"runType": "noisyEdges", "runs": 100}. The
+other optional keys are "knockout", "dummyMode", "garnet", "musquared" and
+"excludeT", as for PCSFInput.
+"""
+
+import os
+import json
+import time
+import socket
+import itertools
+import threading
+
+from OmicsIntegrator.forest import PARAMETER_TYPES, InputError, \
+    PCSFInput, EnsembleMerger, ensembleFunction, ensembleTask, \
+    ensembleManifest
+from OmicsIntegrator.forest_api import runJob
+
+
+QUEUE_DIRS = ("todo", "claimed", "done", "failed")
+
+# Keys of a sweep that are options of the job rather than parameters
+SWEEP_OPTIONS = ("prizeFile", "dummyMode", "seed")
+
+SPEC_DEFAULTS = {
+    "knockout": [],
+    "prizeFile": None,
+    "dummyMode": "terminals",
+    "garnet": None,
+    "musquared": False,
+    "excludeT": False,
+    "seed": None,
+}
+
+
+def expandTasks(spec):
+    """
+    RETURNS: the list of the tasks of spec, dictionaries with the task "id"
+             and either the "job" options of a sweep or the "run" number of
+             an ensemble
+    """
+    if ("sweep" in spec) == ("ensemble" in spec):
+        raise InputError(
+            'ERROR: A queue spec needs one of "sweep" and "ensemble".'
+        )
+    tasks = []
+    if "sweep" in spec:
+        names = sorted(spec["sweep"])
+        for name in names:
+            if name not in PARAMETER_TYPES and name not in SWEEP_OPTIONS:
+                raise InputError(
+                    "ERROR: Unknown sweep key %s, choose parameters from %s"
+                    " or %s." % (name, ", ".join(sorted(PARAMETER_TYPES)),
+                                 ", ".join(SWEEP_OPTIONS))
+                )
+        grid = itertools.product(*[spec["sweep"][name] for name in names])
+        for values in grid:
+            job = {"parameters": {}}
+            for (name, value) in zip(names, values):
+                if name in SWEEP_OPTIONS:
+                    job[name] = value
+                else:
+                    job["parameters"][name] = PARAMETER_TYPES[name](value)
+            tasks.append({"job": job})
+    else:
+        # Fails early on unknown run types
+        ensembleFunction(spec["ensemble"]["runType"])
+        tasks = [{"run": i} for i in range(spec["ensemble"]["runs"])]
+    for (i, task) in enumerate(tasks):
+        task["id"] = "task%06i" % i
+    return tasks
+
+
+def submitSpec(queueDir, spec):
+    """
+    Creates the queue queueDir with the tasks of spec. Relative file names
+    of spec are made absolute, so workers may run in another directory.
+
+    RETURNS: the number of tasks
+    """
+    spec = dict(SPEC_DEFAULTS, **spec)
+    for name in ("edgeFile", "confFile", "prizeFile", "garnet"):
+        if spec[name] is not None:
+            spec[name] = os.path.abspath(spec[name])
+    if "prizeFile" in spec.get("sweep", {}):
+        spec["sweep"] = dict(spec["sweep"], prizeFile=[
+            os.path.abspath(path) for path in spec["sweep"]["prizeFile"]
+        ])
+    tasks = expandTasks(spec)
+    if os.path.exists(os.path.join(queueDir, "spec.json")):
+        raise InputError(
+            "ERROR: %s already holds a queue. Remove it, or choose another"
+            " directory." % queueDir
+        )
+    for name in QUEUE_DIRS:
+        os.makedirs(os.path.join(queueDir, name), exist_ok=True)
+    for task in tasks:
+        writeJson(os.path.join(queueDir, "todo", task["id"] + ".json"), task)
+    # Written last, so that a queue with a spec has all of its tasks
+    writeJson(os.path.join(queueDir, "spec.json"), spec)
+    return len(tasks)
+
+
+def writeJson(path, value):
+    """Writes value to path so that readers never see a partial file"""
+    tmp = os.path.join(os.path.dirname(path),
+                       ".%s.%i.tmp" % (os.path.basename(path), os.getpid()))
+    with open(tmp, "w") as f:
+        json.dump(value, f)
+        f.write("\n")
+    os.rename(tmp, path)
+
+
+def readJson(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def taskId(name):
+    """Returns the task id of a file of todo, claimed, done or failed"""
+    return name.split("@")[0].split(".")[0]
+
+
+def queueStatus(queueDir):
+    """RETURNS: dictionary of the number of tasks in each state"""
+    return dict(
+        (name, len([entry for entry
+                    in os.listdir(os.path.join(queueDir, name))
+                    if not entry.startswith(".")]))
+        for name in QUEUE_DIRS
+    )
+
+
+class Heartbeat(object):
+    def __init__(self, path, interval):
+        """ Touches path every interval seconds until stop(), so that other
+        workers know that the task claimed in path is still running
+        """
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                os.utime(self.path)
+            except OSError:
+                # Requeued by another worker, the result is still written
+                pass
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+class QueueWorker(object):
+    def __init__(self, queueDir, heartbeat=60.0, staleAfter=600.0):
+        """ Runs the tasks of the queue in queueDir. The interactome of the
+        spec is read once, so workers forked afterwards share it.
+
+        INPUT: heartbeat - seconds between touches of the claimed task
+               staleAfter - seconds after which a claimed task that was not
+                            touched is put back in todo. Make it several
+                            times heartbeat, to allow for the clocks of the
+                            machines sharing the directory.
+        """
+        self.queueDir = queueDir
+        self.heartbeat = heartbeat
+        self.staleAfter = staleAfter
+        self.spec = readJson(os.path.join(queueDir, "spec.json"))
+        spec = self.spec
+        self.interactome = PCSFInput.interactome(
+            spec["edgeFile"], spec["confFile"], spec["knockout"]
+        )
+        # Shared by the negative prizes of all tasks
+        self.interactome.nodeDegrees()
+        # The input of an ensemble, shared by its runs
+        self.ensembleInput = None
+        if "ensemble" in spec:
+            self.ensembleInput = self.inputs({})
+            if spec["ensemble"]["runType"] == "randomTerminals":
+                self.ensembleInput.degreeIndex()
+
+    def inputs(self, job):
+        """Returns the input object of the options job of a sweep"""
+        spec = self.spec
+        return self.interactome.withPrizes(
+            job.get("prizeFile", spec["prizeFile"]),
+            job.get("dummyMode", spec["dummyMode"]),
+            spec["garnet"],
+            None,
+            job.get("parameters"),
+            spec["musquared"],
+            spec["excludeT"],
+        )
+
+    def path(self, state, name):
+        return os.path.join(self.queueDir, state, name)
+
+    def claim(self):
+        """
+        Moves the first task left in todo to claimed.
+
+        RETURNS: (task, path of the claimed task file), or None if todo is
+                 empty
+        """
+        worker = "%s-%i" % (socket.gethostname(), os.getpid())
+        for name in sorted(os.listdir(os.path.join(self.queueDir, "todo"))):
+            if name.startswith("."):
+                continue
+            todo = self.path("todo", name)
+            claimed = self.path("claimed", "%s@%s.json" % (taskId(name),
+                                                           worker))
+            try:
+                # The modification time of a claim is its heartbeat. The
+                # task is touched before it is renamed, which keeps its
+                # modification time, so that other workers never see the
+                # new claim as stale.
+                os.utime(todo)
+                os.rename(todo, claimed)
+            except FileNotFoundError:
+                # Claimed by another worker first
+                continue
+            try:
+                return (readJson(claimed), claimed)
+            except FileNotFoundError:
+                # Put back in todo by another worker after all, e.g. with
+                # a clock far behind, the claim is lost
+                continue
+        return None
+
+    def requeueStale(self):
+        """
+        Moves the claimed tasks not touched for staleAfter seconds back to
+        todo, or removes their claims if they are done already.
+
+        RETURNS: the number of tasks put back in todo
+        """
+        requeued = 0
+        now = time.time()
+        for name in os.listdir(os.path.join(self.queueDir, "claimed")):
+            claimed = self.path("claimed", name)
+            try:
+                if now - os.stat(claimed).st_mtime < self.staleAfter:
+                    continue
+                task = taskId(name)
+                if os.path.exists(self.path("done", task + ".json")):
+                    os.remove(claimed)
+                    continue
+                os.rename(claimed, self.path("todo", task + ".json"))
+                requeued += 1
+            except FileNotFoundError:
+                # Finished or requeued meanwhile
+                continue
+        if requeued:
+            print("Put %i stale tasks back in the queue.\n" % requeued)
+        return requeued
+
+    def run(self, task):
+        """
+        Runs one task.
+
+        RETURNS: the result written to done, with the task, the summary of
+                 the output and the resources used by msgsteiner
+        """
+        spec = self.spec
+        if "run" in task:
+            runType = spec["ensemble"]["runType"]
+            (i, summary, error) = ensembleTask(
+                (ensembleFunction(runType), spec["excludeT"],
+                 self.ensembleInput, runType, None, "result", spec["seed"],
+                 task["run"], None)
+            )
+            if error is not None:
+                raise RuntimeError(error)
+            return dict(task, summary=summary)
+        job = dict(task["job"])
+        job.setdefault("seed", spec["seed"])
+        result = runJob(job, self.inputs(job))
+        return dict(task, summary=result.summary(), elapsed=result.elapsed,
+                    solver=result.solverUsage)
+
+    def work(self, maxTasks=None):
+        """
+        Claims and runs tasks until the queue is empty, or maxTasks tasks
+        are done. A failed task is moved to failed with its error.
+
+        RETURNS: the number of tasks run
+        """
+        count = 0
+        while maxTasks is None or count < maxTasks:
+            claimed = self.claim()
+            if claimed is None and self.requeueStale():
+                continue
+            if claimed is None:
+                break
+            (task, path) = claimed
+            heartbeat = Heartbeat(path, self.heartbeat)
+            try:
+                result = self.run(task)
+                state = "done"
+            except Exception as e:
+                result = dict(task, error=str(e))
+                state = "failed"
+            finally:
+                heartbeat.stop()
+            writeJson(self.path(state, task["id"] + ".json"), result)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count += 1
+        return count
+
+
+def queueResults(queueDir, state="done"):
+    """RETURNS: the results of the tasks in state, ordered by task id"""
+    names = sorted(name for name
+                   in os.listdir(os.path.join(queueDir, state))
+                   if not name.startswith("."))
+    return [readJson(os.path.join(queueDir, state, name)) for name in names]
+
+
+def reduceQueue(queueDir, outputpath, outputlabel, cyto30=True,
+                formats=("cytoscape",)):
+    """
+    Merges the results of the finished tasks of the queue in queueDir.
+
+    For a sweep, writes <outputlabel>_sweep.txt, a table of the options,
+    parameters and objective function of every job, and
+    <outputlabel>_sweep.jsonl with the summary of every job.
+
+    For an ensemble, writes the merged output files
+    <outputlabel>_<runType>_merged* and the run manifest of the runs,
+    <outputlabel>_<runType>_runs.jsonl, which forest.py --resume can
+    extend.
+
+    RETURNS: dictionary of the number of tasks in each state
+    """
+    spec = readJson(os.path.join(queueDir, "spec.json"))
+    status = queueStatus(queueDir)
+    results = queueResults(queueDir)
+    failed = queueResults(queueDir, "failed")
+    for result in failed:
+        print("WARNING: Task %s failed: %s" % (result["id"], result["error"]))
+    if status["todo"] or status["claimed"]:
+        print(
+            "WARNING: %i tasks are not finished, the results are partial.\n"
+            % (status["todo"] + status["claimed"])
+        )
+    if "sweep" in spec:
+        writeSweep(spec, results, outputpath, outputlabel)
+    else:
+        writeEnsemble(spec, results, outputpath, outputlabel, cyto30,
+                      formats)
+    return status
+
+
+def writeSweep(spec, results, outputpath, outputlabel):
+    """Writes the files of the results of a sweep, see reduceQueue"""
+    names = sorted(spec["sweep"])
+    prefix = os.path.join(outputpath, outputlabel)
+    with open(prefix + "_sweep.txt", "w") as table:
+        table.write("\t".join(
+            ["task"] + names + ["objective", "nodes", "edges", "roots",
+                                "seconds"]) + "\n")
+        for result in results:
+            job = result["job"]
+            summary = result["summary"]
+            values = [job[name] if name in SWEEP_OPTIONS
+                      else job["parameters"][name] for name in names]
+            table.write("\t".join(
+                [result["id"]] + [str(value) for value in values]
+                + [str(summary["objective"]["total"]),
+                   str(len(summary["nodes"])), str(len(summary["edges"])),
+                   str(len(summary["roots"])), "%.2f" % result["elapsed"]]
+            ) + "\n")
+    with open(prefix + "_sweep.jsonl", "w") as jobs:
+        for result in results:
+            jobs.write(json.dumps(result) + "\n")
+    print("Wrote the results of %i jobs to %s_sweep.txt.\n"
+          % (len(results), prefix))
+
+
+def writeEnsemble(spec, results, outputpath, outputlabel, cyto30, formats):
+    """Writes the files of the results of an ensemble, see reduceQueue"""
+    runType = spec["ensemble"]["runType"]
+    interactome = PCSFInput.interactome(spec["edgeFile"], spec["confFile"],
+                                        spec["knockout"])
+    inputObj = interactome.withPrizes(
+        spec["prizeFile"], spec["dummyMode"], spec["garnet"], None, None,
+        spec["musquared"], spec["excludeT"]
+    )
+    manifest = ensembleManifest(runType, spec["seed"], inputObj, outputpath,
+                                outputlabel, spec["excludeT"])
+    summaries = dict((result["run"], result["summary"])
+                     for result in results)
+    manifest.open(summaries)
+    manifest.close()
+    if not summaries:
+        print("No %s runs are done, nothing to merge.\n" % runType)
+        return
+    merger = EnsembleMerger(inputObj)
+    for run in sorted(summaries):
+        merger.add(summaries[run])
+    merged = merger.merged()
+    label = "%s_%s_merged" % (outputlabel, runType)
+    merged.writeFiles(outputpath, label, cyto30, formats)
+    print("Merged %i %s runs into the files of %s.\n"
+          % (merger.numRuns, runType, os.path.join(outputpath, label)))
@@ -0,0 +1,258 @@
+"""
+Plans all of the msgsteiner runs requested for one Forest job and executes
+them on a single persistent multiprocessing pool.
+"""
+
+import os
+
+from OmicsIntegrator.forest import createPool, scheduleTasks, \
+    runMainForest, EnsembleRun, BackgroundWriter, submitCrossValidation, \
+    writeCrossValidation, AdaptiveStopping, TimeBudget, OutputError
+from OmicsIntegrator.forest_telemetry import telemetryEnabled, \
+    telemetryRecords, writeTelemetry
+
+
+class RunPlanner(object):
+    def __init__(self, inputObj, seed, outputpath, outputlabel, excludeT,
+                 cyto30=True, store=None, formats=("cytoscape",),
+                 compress=False):
+        """ Collects the runs requested for one input object: the optimal
+        forest, the noisy edges, shuffled prizes and random terminals
+        ensembles and cross validation. execute() schedules all of them on
+        one pool before waiting for any, so the main solve overlaps with the
+        ensemble runs.
+
+        INPUT: inputObj - the PCSFInput object shared by all runs
+               seed - number to give to the random number generators
+               outputpath - path to the directory where output files should
+                            be stored
+               outputlabel - a label with which to name all of the output
+                             files
+               excludeT - passed on to the functions changing the prizes
+               cyto30 - write Cytoscape 3.0 files rather than 2.8
+               store - a RunStore object to write the ensemble runs to,
+                       instead of a directory and an info file per run
+               formats - formats of the main and merged output files, see
+                         PCSFOutput.writeFiles
+               compress - gzip the main and merged output files
+        """
+        self.inputObj = inputObj
+        self.seed = seed
+        self.outputpath = outputpath
+        self.outputlabel = outputlabel
+        self.excludeT = excludeT
+        self.cyto30 = cyto30
+        self.store = store
+        self.formats = formats
+        self.compress = compress
+        # Writes the merged outputs while the next ensemble is merged, set
+        # by execute()
+        self.writer = None
+        # Whether the workers of the pool have inputObj installed by
+        # initWorker, so tasks are sent without it. Set by execute().
+        self.shared = True
+        # Telemetry records sent back by the runs of the workers
+        self.telemetry = []
+        # Paths of the files written by the steps
+        self.files = []
+        # Each step is a (submit, finish) pair. submit(pool) schedules the
+        # tasks of the step and returns a handle passed to finish(handle),
+        # which waits for the tasks and writes the results.
+        self.steps = []
+
+    def addMainRun(self):
+        """Schedules the run on the unchanged input"""
+        def submit(pool):
+            scheduleTasks(1)
+            return pool.apply_async(
+                runMainForest,
+                args=(None if self.shared else self.inputObj, self.seed,
+                      self.outputpath, self.outputlabel, self.cyto30,
+                      self.formats, self.compress))
+
+        def finish(result):
+            (records, files) = result.get()
+            self.telemetry.extend(records)
+            self.files.extend(files)
+        self.steps.append((submit, finish))
+
+    def addEnsemble(self, run_type, numRuns, mergedLabel=None, resume=False,
+                    adaptive=None, budget=None):
+        """
+        Schedules numRuns runs of type run_type ('noisyEdges',
+        'shufflePrizes' or 'randomTerminals'). If mergedLabel is given, the
+        runs are merged and written with that label. If resume is True, the
+        runs recorded in the run manifest of an earlier job are reused.
+        adaptive is an optional AdaptiveStopping object and budget an
+        optional TimeBudget object, in which case numRuns is the maximum
+        number of runs. Ensembles sharing a budget use it in the order they
+        are added.
+        """
+        # Created now so that the degree index for random terminals is
+        # built before the pool starts and all workers inherit it
+        ensemble = EnsembleRun(run_type, self.seed, self.inputObj, numRuns,
+                               self.outputpath, self.outputlabel,
+                               self.excludeT, mergedLabel is not None, resume,
+                               adaptive, budget, self.store)
+
+        def submit(pool):
+            ensemble.start(pool, shared=self.shared)
+            return ensemble
+
+        def finish(ensemble):
+            merged = ensemble.finish()
+            self.telemetry.extend(ensemble.telemetry)
+            self.files.extend(ensemble.files)
+            if merged is not None:
+                self.writer.submit(merged.writeFiles, self.outputpath,
+                                   mergedLabel, self.cyto30, self.formats,
+                                   self.compress)
+        self.steps.append((submit, finish))
+
+    def addCrossValidation(self, k, reps):
+        """Schedules reps repetitions of k-fold cross validation"""
+        def submit(pool):
+            return submitCrossValidation(pool, k, reps, self.inputObj,
+                                         self.seed, self.outputpath,
+                                         self.outputlabel,
+                                         shared=self.shared)
+
+        def finish(results):
+            self.files.extend(writeCrossValidation(results, self.outputpath,
+                                                   self.outputlabel))
+        self.steps.append((submit, finish))
+
+    def execute(self, pool=None):
+        """
+        Runs all planned steps on one pool of inputObj.processes workers and
+        shuts the pool down when they are done, or terminates it if a step
+        fails. Output files are written in the background, and execute()
+        returns once all of them are written. With telemetry enabled, the
+        stages of this process and of the runs are then added to the info
+        file of the main run, see forest_telemetry.writeTelemetry.
+
+        INPUT: pool - a running pool to use instead, which is left running.
+                      Its workers must write their output files before their
+                      tasks return, see initSharedWorker.
+
+        RETURNS: sorted list of the absolute paths of the files written by
+                 the job. With a pool of its own, whose workers write the
+                 files of the runs in the background after their tasks
+                 return, only the info files of the runs are listed.
+        """
+        ownPool = pool is None
+        if ownPool:
+            pool = createPool(self.inputObj)
+        self.shared = ownPool
+        # Started after the pool so that no worker is forked with the
+        # writer thread running
+        self.writer = BackgroundWriter()
+        try:
+            handles = [submit(pool) for (submit, finish) in self.steps]
+            for (submit, finish), handle in zip(self.steps, handles):
+                finish(handle)
+            if ownPool:
+                pool.close()
+        except BaseException:
+            if ownPool:
+                pool.terminate()
+            raise
+        finally:
+            # Joining the pool waits for the writes of the workers
+            if ownPool:
+                pool.join()
+            errors = self.writer.close()
+        if errors:
+            raise OutputError("ERROR: Writing %i sets of output files failed."
+                              % len(errors))
+        files = self.files + self.writer.written
+        if self.store is not None:
+            files.append(self.store.path)
+        if telemetryEnabled():
+            files += writeTelemetry(
+                self.outputpath, self.outputlabel,
+                telemetryRecords(0, "parent") + self.telemetry
+            )
+        return sorted(set(os.path.abspath(path) for path in files))
+
+
+def planRuns(inputObj, options, formats, store=None):
+    """
+    Plans the main run, the ensembles and cross validation requested by the
+    command line options of Forest (see scripts/forest.py).
+
+    INPUT: inputObj - the PCSFInput object of the job
+           options - the parsed options
+           formats - the list of output formats
+           store - a RunStore object for the ensemble runs, or None
+
+    RETURNS: the RunPlanner object, ready to execute
+    """
+    planner = RunPlanner(
+        inputObj,
+        options.seed,
+        options.outputpath,
+        options.outputlabel,
+        options.excludeT,
+        options.cyto30,
+        store,
+        formats,
+        options.gzip,
+    )
+    planner.addMainRun()
+
+    def adaptive():
+        # Each ensemble checks its own convergence
+        if not options.adaptive:
+            return None
+        return AdaptiveStopping(
+            options.ciWidth, options.minFrequency, options.batchSize
+        )
+
+    # One budget for all ensembles, the clock starts with the first one
+    budget = None
+    if options.timeBudget is not None:
+        budget = TimeBudget(options.timeBudget * 60)
+
+    # Get merged results of adding noise to edge values
+    if options.noiseNum > 0:
+        planner.addEnsemble(
+            'noisyEdges',
+            options.noiseNum,
+            options.outputlabel + "_noisy" if options.merge else None,
+            options.resume,
+            adaptive(),
+            budget,
+        )
+
+    # Get merged results of shuffling prizes
+    if options.shuffleNum > 0:
+        planner.addEnsemble(
+            'shufflePrizes',
+            options.shuffleNum,
+            options.outputlabel + "_shuffled" if options.merge else None,
+            options.resume,
+            adaptive(),
+            budget,
+        )
+
+    # Get merged results of randomizing terminals
+    if options.termNum > 0:
+        planner.addEnsemble(
+            'randomTerminals',
+            options.termNum,
+            options.outputlabel + "_randomTerminals" if options.merge
+            else None,
+            options.resume,
+            adaptive(),
+            budget,
+        )
+
+    # If k is supplied, run k-fold cross validation. All folds of all
+    # repetitions are run in parallel.
+    if options.cv is not None:
+        planner.addCrossValidation(
+            options.cv,
+            1 if options.cv_reps is None else options.cv_reps,
+        )
+    return planner
@@ -0,0 +1,265 @@
+"""
+A long-running Forest server. It reads one or more interactomes once, keeps
+them in the workers of one pool, and runs the jobs sent to it on that pool,
+so a job only costs about the time of its msgsteiner runs instead of also
+importing Forest and reading the interactome.
+
+Jobs are sent over a UNIX socket or a localhost TCP port as one line of
+JSON: {"args": [command line options of scripts/forest.py], "interactome":
+name}. The server answers with one line of JSON per change of the status of
+the job, "queued", "running" and then "done" with the output files written
+by the job, or "failed" with the error message. Jobs with the same output
+directory run one at a time, as their files may have the same names.
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+import socketserver
+import multiprocessing as mp
+
+from OmicsIntegrator.forest import shareInputs, initSharedWorker, \
+    startThreadScheduler
+from OmicsIntegrator.forest_runner import planRuns
+from OmicsIntegrator.forest_store import RunStore
+
+
+class ForestServer(object):
+    def __init__(self, interactomes, parseOptions, processes=None,
+                 maxJobs=2):
+        """ Starts the pool of the server. Create the server before starting
+        any threads, so that the workers are not forked while other threads
+        hold locks.
+
+        INPUT: interactomes - dictionary of the PCSFInput objects read with
+                              PCSFInput.interactome, by name
+               parseOptions - function parsing the command line options of
+                              a job, returning (options, list of output
+                              formats) or calling sys.exit on errors
+               processes - number of workers, all CPUs if None
+               maxJobs - number of jobs run at the same time. Their runs
+                         share the workers. Jobs waiting for a job with the
+                         same output directory do not take one of these
+                         slots.
+        """
+        self.interactomes = interactomes
+        self.parseOptions = parseOptions
+        for inputObj in interactomes.values():
+            # Built now so that every worker inherits the index for random
+            # terminals and the degrees for negative prizes
+            inputObj.degreeIndex()
+            inputObj.nodeDegrees()
+        shareInputs(interactomes)
+        self.processes = processes or mp.cpu_count()
+        # Shared by the runs of all jobs with the threads parameter auto
+        scheduler = startThreadScheduler(processes)
+        self.pool = mp.Pool(processes, initSharedWorker,
+                            (interactomes, scheduler))
+        self.slots = threading.BoundedSemaphore(maxJobs)
+        self.lock = threading.Lock()
+        self.numJobs = 0
+        self.outputLocks = OutputLocks()
+        self.server = None
+
+    def serve(self, address):
+        """
+        Serves jobs until shutdown() is called or the process is
+        interrupted.
+
+        INPUT: address - path of a UNIX socket, or (host, port) of a TCP
+                         socket
+        """
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            server = socketserver.ThreadingUnixStreamServer(
+                address, JobHandler
+            )
+        else:
+            server = socketserver.ThreadingTCPServer(address, JobHandler)
+        server.daemon_threads = True
+        server.forest = self
+        self.server = server
+        print("Forest server listening on %s with %i workers.\n"
+              % (address, self.processes))
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if isinstance(address, str) and os.path.exists(address):
+                os.remove(address)
+
+    def shutdown(self):
+        """Stops serve() and the pool"""
+        if self.server is not None:
+            self.server.shutdown()
+        self.pool.close()
+        self.pool.join()
+
+    def runJob(self, job, reply):
+        """
+        Runs one job and reports its status with reply(dictionary)
+
+        INPUT: job - dictionary with the "args" of the job, a list of
+                     command line options of scripts/forest.py, and the name
+                     of the "interactome", which may be left out if the
+                     server has only one
+        """
+        with self.lock:
+            self.numJobs += 1
+            jobId = self.numJobs
+        reply({"job": jobId, "status": "queued"})
+        try:
+            (options, inputObj) = self.prepare(job)
+            outputpath = self.outputLocks.acquire(options.outputpath)
+            try:
+                with self.slots:
+                    reply({"job": jobId, "status": "running"})
+                    start = time.time()
+                    files = self.execute(options, inputObj)
+            finally:
+                self.outputLocks.release(outputpath)
+        # parseOptions exits on invalid options, as on the command line
+        except (Exception, SystemExit) as e:
+            reply({"job": jobId, "status": "failed", "error": str(e)})
+            return
+        reply({
+            "job": jobId,
+            "status": "done",
+            "seconds": time.time() - start,
+            "outputpath": os.path.abspath(options.outputpath),
+            "files": files,
+        })
+
+    def execute(self, options, inputObj):
+        """
+        Runs the runs of a job on the pool
+
+        RETURNS: sorted list of the absolute paths of the files written by
+                 the job
+        """
+        store = None
+        if options.runStore:
+            store = RunStore(
+                os.path.join(options.outputpath,
+                             options.outputlabel + "_runs.sqlite")
+            )
+        try:
+            return planRuns(inputObj, options, options.formats,
+                            store).execute(self.pool)
+        finally:
+            if store is not None:
+                store.close()
+
+    def prepare(self, job):
+        """
+        Parses the options of job and reads its prizes on top of the
+        interactome
+
+        RETURNS: (options, PCSFInputOverlay object of the job)
+        """
+        name = job.get("interactome")
+        if name is None and len(self.interactomes) == 1:
+            name = list(self.interactomes)[0]
+        if name not in self.interactomes:
+            raise ValueError(
+                "Unknown interactome %s, the server has %s"
+                % (name, ", ".join(sorted(self.interactomes)))
+            )
+        (options, formats) = self.parseOptions(job["args"])
+        options.formats = formats
+        if options.prizeFile is None:
+            raise ValueError("A job needs a prize file, give --prize")
+        if options.telemetry or options.profile:
+            raise ValueError(
+                "--telemetry and --profile are not supported by the server,"
+                " its workers are started before the jobs"
+            )
+        if options.edgeFile is not None or options.knockout:
+            raise ValueError(
+                "The interactome of a job is chosen by name, --edge and"
+                " --knockout are set when starting the server"
+            )
+        inputObj = self.interactomes[name].withPrizes(
+            options.prizeFile, options.dummyMode, options.garnet,
+            options.confFile, None, options.musquared, options.excludeT
+        )
+        # Ensembles launch batches of runs for the workers of the server
+        inputObj.processes = self.processes
+        # Tasks send the name of the interactome instead of the interactome
+        return (options, inputObj.share(name))
+
+
+class OutputLocks(object):
+    def __init__(self):
+        """ Locks of the output directories of the running and waiting jobs,
+        so that jobs with the same directory run one at a time. The lock of a
+        directory is dropped once no job holds it or waits for it, so the
+        server does not keep one for every directory it has ever written to.
+        """
+        self.lock = threading.Lock()
+        # [lock, number of jobs holding or waiting for it], by absolute path
+        self.locks = {}
+
+    def acquire(self, outputpath):
+        """
+        Waits for the lock of the directory outputpath
+
+        RETURNS: the absolute path of the directory, to give to release()
+        """
+        path = os.path.abspath(outputpath)
+        with self.lock:
+            entry = self.locks.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        return path
+
+    def release(self, path):
+        """Releases the lock of the directory path taken with acquire()"""
+        with self.lock:
+            entry = self.locks[path]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.locks[path]
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def reply(message):
+            self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+            self.wfile.flush()
+        try:
+            job = json.loads(self.rfile.readline().decode("utf-8"))
+        except ValueError as e:
+            reply({"status": "failed", "error": "Invalid job: %s" % e})
+            return
+        self.server.forest.runJob(job, reply)
+
+
+def submitJob(address, args, interactome=None):
+    """
+    Sends a job to a Forest server and yields the status messages of the
+    job as they arrive, the last one with status "done" or "failed".
+
+    INPUT: address - path of the UNIX socket, or (host, port), of the server
+           args - list of command line options of scripts/forest.py, except
+                  --edge and --knockout
+           interactome - name of the interactome to use, may be None if the
+                         server has only one
+    """
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.connect(address)
+    try:
+        job = {"args": list(args), "interactome": interactome}
+        sock.sendall((json.dumps(job) + "\n").encode("utf-8"))
+        with sock.makefile("r") as replies:
+            for line in replies:
+                yield json.loads(line)
+    finally:
+        sock.close()
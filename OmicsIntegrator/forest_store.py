@@ -0,0 +1,236 @@
+"""
+Stores the runs of the Forest ensembles in one SQLite database instead of a
+directory of Cytoscape files and an info file per run.
+"""
+
+import json
+import sqlite3
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ensembles (
+    run_type TEXT PRIMARY KEY,
+    header TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_type TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    seed INTEGER,
+    elapsed REAL,
+    objective REAL,
+    excluded_prizes REAL,
+    edge_costs REAL,
+    trees REAL,
+    UNIQUE (run_type, run)
+);
+CREATE TABLE IF NOT EXISTS run_solver (
+    run_id INTEGER PRIMARY KEY,
+    wall_seconds REAL,
+    user_seconds REAL,
+    system_seconds REAL,
+    max_rss_kb INTEGER,
+    threads INTEGER,
+    nodes INTEGER,
+    edges INTEGER,
+    prizes INTEGER,
+    dummy_edges INTEGER
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS edges (
+    edge_id INTEGER PRIMARY KEY,
+    node1 INTEGER NOT NULL,
+    node2 INTEGER NOT NULL,
+    UNIQUE (node1, node2)
+);
+CREATE TABLE IF NOT EXISTS run_nodes (
+    run_id INTEGER NOT NULL,
+    node_id INTEGER NOT NULL,
+    forest INTEGER NOT NULL,
+    root INTEGER NOT NULL,
+    PRIMARY KEY (run_id, node_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS run_edges (
+    run_id INTEGER NOT NULL,
+    edge_id INTEGER NOT NULL,
+    PRIMARY KEY (run_id, edge_id)
+) WITHOUT ROWID;
+"""
+
+
+class RunStore(object):
+    def __init__(self, path):
+        """ An SQLite database holding the runs of all ensembles of a job.
+        Every run is one row of runs, with its seed, time and objective
+        function terms. Node and edge names are stored once, and the
+        run_nodes and run_edges tables hold which nodes and edges are in each
+        run, i.e. sparse run x node and run x edge membership matrices. The
+        forest flag of run_nodes is 0 for roots connected to the dummy node
+        only. The resources used by msgsteiner in each run are kept in
+        run_solver, and the header of the run manifest of each ensemble in
+        ensembles.
+
+        INPUT: path - path of the database file, created if missing
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        # Runs are also checkpointed in the run manifests, so the store does
+        # not need to sync every transaction to disk
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.nodeIds = dict(
+            self.conn.execute("SELECT name, node_id FROM nodes")
+        )
+        self.edgeIds = dict(
+            ((node1, node2), edge_id) for (edge_id, node1, node2)
+            in self.conn.execute("SELECT edge_id, node1, node2 FROM edges")
+        )
+
+    def startEnsemble(self, run_type, header, records=()):
+        """
+        Replaces the runs of type run_type with records, the runs reused from
+        the run manifest, and records header as the header of the ensemble
+        """
+        conn = self.conn
+        runIds = "SELECT run_id FROM runs WHERE run_type = ?"
+        conn.execute(
+            "DELETE FROM run_nodes WHERE run_id IN (%s)" % runIds, (run_type,)
+        )
+        conn.execute(
+            "DELETE FROM run_edges WHERE run_id IN (%s)" % runIds, (run_type,)
+        )
+        conn.execute(
+            "DELETE FROM run_solver WHERE run_id IN (%s)" % runIds,
+            (run_type,)
+        )
+        conn.execute("DELETE FROM runs WHERE run_type = ?", (run_type,))
+        conn.execute(
+            "INSERT OR REPLACE INTO ensembles VALUES (?, ?)",
+            (run_type, json.dumps(header, sort_keys=True)),
+        )
+        for record in records:
+            self.addRun(run_type, record)
+        self.commit()
+
+    def nodeId(self, name):
+        """Returns the id of node name, adding it to nodes if it is new"""
+        try:
+            return self.nodeIds[name]
+        except KeyError:
+            cursor = self.conn.execute(
+                "INSERT INTO nodes (name) VALUES (?)", (name,)
+            )
+            self.nodeIds[name] = cursor.lastrowid
+            return cursor.lastrowid
+
+    def edgeId(self, node1, node2):
+        """Returns the id of edge node1 -> node2, adding it if it is new"""
+        key = (self.nodeId(node1), self.nodeId(node2))
+        try:
+            return self.edgeIds[key]
+        except KeyError:
+            cursor = self.conn.execute(
+                "INSERT INTO edges (node1, node2) VALUES (?, ?)", key
+            )
+            self.edgeIds[key] = cursor.lastrowid
+            return cursor.lastrowid
+
+    def addRun(self, run_type, summary):
+        """
+        Adds one run, summary is its PCSFOutput summary with the "run",
+        "seed" and optional "elapsed" and "solver" entries added by
+        ensembleTask
+        """
+        objective = summary["objective"]
+        cursor = self.conn.execute(
+            "INSERT INTO runs (run_type, run, seed, elapsed, objective,"
+            " excluded_prizes, edge_costs, trees) VALUES (?, ?, ?, ?, ?, ?,"
+            " ?, ?)",
+            (run_type, summary["run"], summary["seed"],
+             summary.get("elapsed"), objective["total"],
+             objective["excludedPrizes"], objective["edgeCosts"],
+             objective["trees"]),
+        )
+        runId = cursor.lastrowid
+        usage = summary.get("solver")
+        if usage is not None:
+            self.conn.execute(
+                "INSERT INTO run_solver VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (runId, usage["wallSeconds"], usage["userSeconds"],
+                 usage["systemSeconds"], usage["maxRssKb"], usage["threads"],
+                 usage["nodes"], usage["edges"], usage["prizes"],
+                 usage["dummyEdges"]),
+            )
+        # Roots without edges are connected to the dummy node only, and are
+        # not part of the optimal forest
+        forest = set(summary["nodes"])
+        roots = set(summary["roots"])
+        self.conn.executemany(
+            "INSERT INTO run_nodes VALUES (?, ?, ?, ?)",
+            [(runId, self.nodeId(node), int(node in forest),
+              int(node in roots))
+             for node in summary["nodes"] + [node for node in summary["roots"]
+                                             if node not in forest]],
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO run_edges VALUES (?, ?)",
+            [(runId, self.edgeId(node1, node2))
+             for (node1, node2) in summary["edges"]],
+        )
+
+    def memberships(self, run_type):
+        """
+        Reads back the run x node and run x edge memberships of the runs of
+        type run_type. Roots connected to the dummy node only are left out.
+
+        RETURNS: runs - list of the run numbers in increasing order
+                 nodeLists - list of the node names in each run
+                 edgeLists - list of the (node1, node2) edges of each run
+        """
+        runs = [run for (run,) in self.conn.execute(
+            "SELECT run FROM runs WHERE run_type = ? ORDER BY run",
+            (run_type,))]
+        rowOf = dict((run, row) for (row, run) in enumerate(runs))
+        nodeLists = [[] for run in runs]
+        for (run, name) in self.conn.execute(
+                "SELECT run, name FROM run_nodes JOIN runs USING (run_id)"
+                " JOIN nodes USING (node_id)"
+                " WHERE run_type = ? AND forest = 1", (run_type,)):
+            nodeLists[rowOf[run]].append(name)
+        edgeLists = [[] for run in runs]
+        for (run, node1, node2) in self.conn.execute(
+                "SELECT run, n1.name, n2.name FROM run_edges"
+                " JOIN runs USING (run_id) JOIN edges USING (edge_id)"
+                " JOIN nodes AS n1 ON n1.node_id = edges.node1"
+                " JOIN nodes AS n2 ON n2.node_id = edges.node2"
+                " WHERE run_type = ?", (run_type,)):
+            edgeLists[rowOf[run]].append((node1, node2))
+        return (runs, nodeLists, edgeLists)
+
+    def solverRuns(self):
+        """
+        RETURNS: list of (msgsteiner resource usage, see forest.solverUsage,
+                 depth D of the ensemble) of the runs recording it
+        """
+        rows = self.conn.execute(
+            "SELECT s.wall_seconds, s.user_seconds, s.system_seconds,"
+            " s.max_rss_kb, s.threads, s.nodes, s.edges, s.prizes,"
+            " s.dummy_edges, e.header FROM run_solver s JOIN runs r"
+            " ON r.run_id = s.run_id JOIN ensembles e"
+            " ON e.run_type = r.run_type ORDER BY s.run_id"
+        )
+        names = ("wallSeconds", "userSeconds", "systemSeconds", "maxRssKb",
+                 "threads", "nodes", "edges", "prizes", "dummyEdges")
+        return [(dict(zip(names, row[:-1])),
+                 json.loads(row[-1])["params"]["D"]) for row in rows]
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
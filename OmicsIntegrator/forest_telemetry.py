@@ -0,0 +1,229 @@
+"""
+Per-stage timing and memory telemetry of Forest runs. Stages of the hot
+path (reading the input, negative prizes, writing the msgsteiner input,
+msgsteiner, parsing its output, the augmented forest, betweenness, merging
+and writing files) are wrapped in stage(name). While telemetry is disabled,
+the default, stage() returns one shared object that does nothing.
+
+Once enabled with enableTelemetry(), every stage records its wall and CPU
+time, the peak resident set size of the process and, with memory tracing,
+the bytes allocated and the peak of the allocations during the stage, as
+seen by tracemalloc. Each process keeps its own records. Workers forked
+after enableTelemetry() record their stages too, and send them back with
+the results of their tasks (see telemetryRecords()).
+"""
+
+import os
+import json
+import time
+import threading
+import tracemalloc
+import multiprocessing as mp
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+_recorder = None
+
+
+class NullStage(object):
+    """The stage of disabled telemetry, does nothing"""
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage(object):
+    def __init__(self, recorder, name):
+        """ One timed stage. Use it as a context manager, or call start() and
+        stop() around code that is not a block.
+        """
+        self.recorder = recorder
+        self.name = name
+
+    def start(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        if self.recorder.memory:
+            self.traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        return self
+
+    def stop(self):
+        record = {
+            "stage": self.name,
+            "process": mp.current_process().name,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "wallSeconds": time.perf_counter() - self.wall,
+            "cpuSeconds": time.process_time() - self.cpu,
+            "maxRssKb": None,
+            "allocatedBytes": None,
+            "peakBytes": None,
+        }
+        if resource is not None:
+            record["maxRssKb"] = \
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if self.recorder.memory:
+            (current, peak) = tracemalloc.get_traced_memory()
+            record["allocatedBytes"] = current - self.traced
+            record["peakBytes"] = peak - self.traced
+        # list.append is atomic, the background writer records its stages
+        # from its own thread
+        self.recorder.records.append(record)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+        return False
+
+
+class Recorder(object):
+    def __init__(self, memory=False):
+        """ The records of the stages run in this process.
+
+        INPUT: memory - also trace allocations with tracemalloc, which makes
+                        Python code several times slower. Peaks of stages
+                        running at the same time in different threads are
+                        not told apart.
+        """
+        self.memory = memory
+        self.records = []
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def enableTelemetry(memory=False):
+    """Starts recording stages in this process and in workers forked later"""
+    global _recorder
+    _recorder = Recorder(memory)
+
+
+def disableTelemetry():
+    global _recorder
+    if _recorder is not None and _recorder.memory:
+        tracemalloc.stop()
+    _recorder = None
+
+
+def telemetryEnabled():
+    return _recorder is not None
+
+
+def stage(name):
+    """
+    RETURNS: a context manager timing the stage name, or doing nothing if
+             telemetry is disabled
+    """
+    if _recorder is None:
+        return NULL_STAGE
+    return Stage(_recorder, name)
+
+
+def telemetryMark():
+    """
+    RETURNS: a mark of the records so far in this process, for
+             telemetryRecords()
+    """
+    if _recorder is None:
+        return 0
+    return len(_recorder.records)
+
+
+def telemetryRecords(since=0, run=None):
+    """
+    RETURNS: list of the records of this process after the mark since, with
+             "run" set to run if it is not None, or an empty list if
+             telemetry is disabled
+    """
+    if _recorder is None:
+        return []
+    found = [dict(record) for record in _recorder.records[since:]]
+    if run is not None:
+        for record in found:
+            record["run"] = run
+    return found
+
+
+def runKind(run):
+    """Returns the kind of run label run, e.g. noisyEdges for noisyEdges_3"""
+    (kind, sep, number) = run.rpartition("_")
+    return kind if sep and number.isdigit() else run
+
+
+def summarize(stageRecords):
+    """
+    Sums the records of each stage over the runs of each kind.
+
+    RETURNS: list of dictionaries with the "runs" kind, "stage", "count" of
+             records, total "wallSeconds", "cpuSeconds" and "allocatedBytes"
+             and largest "maxRssKb" and "peakBytes", in the order the stages
+             were first seen
+    """
+    totals = {}
+    for record in stageRecords:
+        kind = runKind(record.get("run") or "parent")
+        key = (kind, record["stage"])
+        if key not in totals:
+            totals[key] = {
+                "runs": kind,
+                "stage": record["stage"],
+                "count": 0,
+                "wallSeconds": 0.0,
+                "cpuSeconds": 0.0,
+                "maxRssKb": None,
+                "allocatedBytes": None,
+                "peakBytes": None,
+            }
+        total = totals[key]
+        total["count"] += 1
+        total["wallSeconds"] += record["wallSeconds"]
+        total["cpuSeconds"] += record["cpuSeconds"]
+        for (name, combine) in [("maxRssKb", max), ("peakBytes", max),
+                                ("allocatedBytes", sum)]:
+            value = record.get(name)
+            if value is not None:
+                if total[name] is None:
+                    total[name] = value
+                else:
+                    total[name] = combine([total[name], value])
+    return list(totals.values())
+
+
+def writeTelemetry(outputpath, outputlabel, stageRecords):
+    """
+    Appends the per-stage totals of stageRecords to
+    <outputlabel>_info.txt, one JSON object per line after a "Telemetry:"
+    line, and writes the totals and all records to
+    <outputlabel>_telemetry.json
+
+    RETURNS: list of the paths of the two files
+    """
+    totals = summarize(stageRecords)
+    prefix = os.path.join(outputpath, outputlabel)
+    with open(prefix + "_info.txt", "a") as info:
+        info.write("\nTelemetry:\n")
+        for total in totals:
+            info.write(json.dumps(total, sort_keys=True) + "\n")
+    with open(prefix + "_telemetry.json", "w") as sidecar:
+        json.dump({"totals": totals, "records": stageRecords}, sidecar,
+                  indent=1, sort_keys=True)
+        sidecar.write("\n")
+    return [prefix + "_info.txt", prefix + "_telemetry.json"]
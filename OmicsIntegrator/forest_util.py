@@ -0,0 +1,323 @@
+"""
+Loads the output files written by Forest back into networkx graphs,
+PCSFOutput objects or ensemble matrices, from one or many output
+directories.
+"""
+
+import os
+import glob
+import gzip
+import multiprocessing as mp
+
+import networkx as nx
+
+from OmicsIntegrator.forest import PCSFOutput
+from OmicsIntegrator.forest_analysis import EnsembleMatrix
+
+
+def openOutputFile(path):
+    """Opens path for reading, or path + ".gz" if only that exists"""
+    if not os.path.exists(path) and os.path.exists(path + ".gz"):
+        return gzip.open(path + ".gz", "rt")
+    return open(path, "r")
+
+
+def readSif(sifFile):
+    """
+    Reads the edges of a Simple Interaction Format file written by Forest.
+
+    RETURNS: list of (node1, interaction, node2) tuples, interaction is "pp"
+             for undirected and "pd" for directed edges
+    """
+    with openOutputFile(sifFile) as f:
+        lines = f.read().splitlines()
+    rows = []
+    for line in lines:
+        parts = line.split("\t")
+        if len(parts) != 3:
+            raise ValueError(
+                "Expected 3 tab separated columns in %s: %s" % (sifFile, line)
+            )
+        if parts[1] != "pp" and parts[1] != "pd":
+            raise ValueError(
+                "Unknown interaction type %s in %s, expected pp or pd"
+                % (parts[1], sifFile)
+            )
+        rows.append(tuple(parts))
+    return rows
+
+
+def addSifEdges(graph, rows, edgeData=None):
+    """
+    Adds the edges of readSif rows to graph, undirected edges in both
+    directions, with the attributes of edgeData {(node1, node2): dict}
+    """
+    for (node1, interaction, node2) in rows:
+        data = {} if edgeData is None else edgeData.get((node1, node2), {})
+        graph.add_edge(node1, node2, **data)
+        if interaction == "pp":
+            graph.add_edge(node2, node1, **data)
+
+
+def loadGraph(sifFile):
+    """
+    Loads a Simple Interaction Format file written by Forest as a networkx
+    DiGraph. Undirected (pp) edges are added in both directions.
+    """
+    graph = nx.DiGraph()
+    addSifEdges(graph, readSif(sifFile))
+    return graph
+
+
+def outputLabel(directory):
+    """
+    Returns the label of the output files in directory, i.e. the <label> of
+    its <label>_optimalForest.sif file, which must be unique
+    """
+    files = glob.glob(os.path.join(directory, "*_optimalForest.sif")) \
+        + glob.glob(os.path.join(directory, "*_optimalForest.sif.gz"))
+    labels = set(
+        os.path.basename(path).rsplit("_optimalForest.sif", 1)[0]
+        for path in files
+    )
+    if len(labels) != 1:
+        raise ValueError(
+            "Expected the files of one output in %s, found %i. Give the"
+            " label of the output to load." % (directory, len(labels))
+        )
+    return labels.pop()
+
+
+def readNodeAttributes(path):
+    """
+    RETURNS: {node: attribute dictionary} from a <label>_nodeattributes.tsv
+             file
+    """
+    with openOutputFile(path) as f:
+        lines = f.read().splitlines()
+    nodes = {}
+    for line in lines[1:]:
+        (node, prize, betweenness, frac, ttype) = line.split("\t")
+        nodes[node] = {
+            "prize": float(prize),
+            "betweenness": float(betweenness),
+            "fracOptContaining": float(frac),
+            "TerminalType": ttype,
+        }
+    return nodes
+
+
+def readEdgeAttributes(path):
+    """
+    RETURNS: ({(node1, node2): attribute dictionary}, {(node1, node2):
+             interaction}) from a <label>_edgeattributes.tsv file
+    """
+    with openOutputFile(path) as f:
+        lines = f.read().splitlines()
+    edges = {}
+    interactions = {}
+    for line in lines[1:]:
+        (edge, weight, frac) = line.rsplit("\t", 2)
+        (node1, interaction, node2) = edge.split(" ", 2)
+        interaction = interaction.strip("()")
+        edges[(node1, node2)] = {
+            "weight": float(weight),
+            "fracOptContaining": float(frac),
+        }
+        interactions[(node1, node2)] = interaction
+    return (edges, interactions)
+
+
+def readObjective(path):
+    """
+    RETURNS: the objective function terms of PCSFOutput.objective from a
+             <label>_info.txt file, or None if it has none
+    """
+    keys = {
+        "Total objective function": "total",
+        "Excluded prizes term": "excludedPrizes",
+        "Edge costs term": "edgeCosts",
+        "Number of trees term": "trees",
+    }
+    if not os.path.exists(path):
+        return None
+    objective = {}
+    with open(path) as f:
+        for line in f:
+            (name, sep, value) = line.partition(":")
+            if name in keys and sep:
+                objective[keys[name]] = float(value)
+    return objective if len(objective) == len(keys) else None
+
+
+class LoadedInput(object):
+    def __init__(self):
+        """ Stands in for the PCSFInput object of loaded outputs. It holds
+        the part of the interactome found in the augmented forests, and the
+        prizes and terminal types of their nodes, which is what
+        writeCytoFiles, mergeOutputs and EnsembleMerger need. Edges of the
+        interactome between nodes of different outputs are unknown.
+        """
+        self.dirEdges = {}
+        self.undirEdges = {}
+        self.totalPrizes = {}
+        self.terminalTypes = {}
+
+    def addEdges(self, interactions, edgeData):
+        """Adds edges of readEdgeAttributes to the known interactome"""
+        for ((node1, node2), interaction) in interactions.items():
+            weight = edgeData[(node1, node2)]["weight"]
+            if interaction == "pd":
+                self.dirEdges.setdefault(node1, {})[node2] = weight
+            else:
+                self.undirEdges.setdefault(node1, {})[node2] = weight
+                self.undirEdges.setdefault(node2, {})[node1] = weight
+
+    def addNodes(self, nodeData):
+        """Adds nodes of readNodeAttributes"""
+        for (node, data) in nodeData.items():
+            self.totalPrizes[node] = data["prize"]
+            if data["TerminalType"]:
+                self.terminalTypes[node] = data["TerminalType"]
+
+    def update(self, other):
+        """Adds everything known to the LoadedInput other"""
+        for (edges, otherEdges) in [(self.dirEdges, other.dirEdges),
+                                    (self.undirEdges, other.undirEdges)]:
+            for (node, neighbors) in otherEdges.items():
+                edges.setdefault(node, {}).update(neighbors)
+        self.totalPrizes.update(other.totalPrizes)
+        self.terminalTypes.update(other.terminalTypes)
+
+
+def loadOutput(directory, label=None):
+    """
+    Rebuilds the PCSFOutput object of Forest output files written for
+    Cytoscape 3.0, without the original interactome.
+
+    INPUT: directory - the output directory
+           label - the label of the output files, found from the files in
+                   directory if None
+
+    RETURNS: a PCSFOutput object with the optForest, augForest and dumForest
+             graphs and their node and edge attributes, the objective read
+             from the info file (or None) and a LoadedInput object as
+             inputObj
+    """
+    if label is None:
+        label = outputLabel(directory)
+    prefix = os.path.join(directory, label)
+    nodeData = readNodeAttributes(prefix + "_nodeattributes.tsv")
+    (edgeData, interactions) = readEdgeAttributes(
+        prefix + "_edgeattributes.tsv"
+    )
+
+    optForest = nx.DiGraph()
+    augForest = nx.DiGraph()
+    dumForest = nx.DiGraph()
+    addSifEdges(optForest, readSif(prefix + "_optimalForest.sif"), edgeData)
+    addSifEdges(augForest, readSif(prefix + "_augmentedForest.sif"), edgeData)
+    for (node1, interaction, node2) in readSif(prefix + "_dummyForest.sif"):
+        if node1 == "DUMMY":
+            dumForest.add_edge(node1, node2)
+    for node in augForest.nodes():
+        augForest.nodes[node].update(nodeData.get(node, {}))
+    for node in optForest.nodes():
+        data = dict(nodeData.get(node, {}))
+        data.pop("betweenness", None)
+        optForest.nodes[node].update(data)
+
+    inputObj = LoadedInput()
+    inputObj.addEdges(interactions, edgeData)
+    inputObj.addNodes(nodeData)
+
+    outputObj = PCSFOutput.__new__(PCSFOutput)
+    outputObj.inputObj = inputObj
+    outputObj.optForest = optForest
+    outputObj.augForest = augForest
+    outputObj.dumForest = dumForest
+    outputObj.objective = readObjective(prefix + "_info.txt")
+    return outputObj
+
+
+def loadSummary(directory, label=None):
+    """
+    Reads only the optimal forest and roots of Forest output files.
+
+    RETURNS: the PCSFOutput.summary() of the output, with "objective" None
+             if there is no info file
+    """
+    if label is None:
+        label = outputLabel(directory)
+    prefix = os.path.join(directory, label)
+    optForest = nx.DiGraph()
+    addSifEdges(optForest, readSif(prefix + "_optimalForest.sif"))
+    return {
+        "nodes": list(optForest.nodes()),
+        "edges": [list(edge) for edge in optForest.edges()],
+        "roots": [node2 for (node1, interaction, node2)
+                  in readSif(prefix + "_dummyForest.sif")
+                  if node1 == "DUMMY"],
+        "objective": readObjective(prefix + "_info.txt"),
+    }
+
+
+def loadOutputTask(args):
+    return loadOutput(*args)
+
+
+def loadSummaryTask(args):
+    return loadSummary(*args)
+
+
+def mapDirectories(func, directories, label, processes):
+    """Calls func on (directory, label) for every directory in parallel"""
+    tasks = [(directory, label) for directory in directories]
+    if processes == 1 or len(tasks) < 2:
+        return [func(task) for task in tasks]
+    pool = mp.Pool(processes)
+    try:
+        results = pool.map(func, tasks)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
+
+
+def loadOutputs(directories, label=None, processes=None):
+    """
+    Loads the outputs in many directories in parallel with loadOutput. All
+    outputs share one LoadedInput object with everything known about the
+    interactome from all outputs, so they can be merged with mergeOutputs
+    or EnsembleMerger.
+
+    INPUT: directories - list of output directories
+           label - label of the output files, found for each directory if
+                   None
+           processes - number of processes, all CPUs if None
+
+    RETURNS: list of PCSFOutput objects in the order of directories
+    """
+    outputs = mapDirectories(loadOutputTask, directories, label, processes)
+    inputObj = LoadedInput()
+    for outputObj in outputs:
+        inputObj.update(outputObj.inputObj)
+    for outputObj in outputs:
+        outputObj.inputObj = inputObj
+    return outputs
+
+
+def loadEnsemble(directories, label=None, processes=None):
+    """
+    Loads the optimal forests in many directories in parallel as sparse
+    matrices, see forest_analysis.EnsembleMatrix. Row i of the matrices
+    holds the output in directories[i].
+    """
+    summaries = mapDirectories(loadSummaryTask, directories, label,
+                               processes)
+    for (i, summary) in enumerate(summaries):
+        summary["run"] = i
+    return EnsembleMatrix.fromSummaries(summaries)
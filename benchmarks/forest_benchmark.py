@@ -0,0 +1,477 @@
+#!/usr/bin/env python
+"""
+Benchmarks the Python side of Forest on synthetic scale-free interactomes,
+with a fake msgsteiner in place of the real solver.
+
+Every stage of a Forest run is timed on its own: reading the edges,
+assigning negative prizes, writing the msgsteiner input, parsing the
+msgsteiner output, building the augmented forest, betweenness, merging
+N outputs and writing the Cytoscape files. The results are appended to a
+JSON lines file together with the git commit, and compared to the last
+results of another commit on the same synthetic data, so regressions are
+visible across commits.
+
+    python benchmarks/forest_benchmark.py --edges 10000,100000
+"""
+
+import os
+import sys
+import json
+import time
+import stat
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+
+import numpy as np
+import networkx as nx
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFInput, PCSFOutput, EnsembleMerger, \
+    augmentForest, mergeOutputs
+
+
+STAGES = (
+    "parse_edges", "parse_edges_tracked", "read_prizes", "neg_prizes",
+    "solver_input", "run_pcsf", "parse_output", "aug_forest", "betweenness",
+    "write_cyto", "merge", "ensemble_merge",
+)
+
+CONF = "w = 2\nb = 1\nD = 6\nmu = 0.005\n"
+
+
+def scaleFreeEdges(numEdges, edgesPerNode, rng):
+    """
+    Draws the edges of a scale-free graph by preferential attachment, as in
+    the linearized chord diagram model: node i adds edgesPerNode edges, each
+    to the endpoint of an earlier edge chosen uniformly, i.e. to a node with
+    probability proportional to its degree. Self-edges and repeated edges
+    are left out.
+
+    INPUT: numEdges - number of edges to draw
+           edgesPerNode - number of edges added with each node
+           rng - numpy random Generator
+
+    RETURNS: (node1, node2) arrays of node numbers, node1 > node2
+    """
+    edge = np.arange(numEdges, dtype=np.int64)
+    source = edge // edgesPerNode + 1
+    # Endpoint 2k is the source and endpoint 2k + 1 the target of edge k.
+    # The target of edge k is the node of a uniformly chosen earlier
+    # endpoint, -1 for node 0 which the first edge connects to.
+    pointer = (rng.random(numEdges) * (2 * edge)).astype(np.int64)
+    pointer[0] = -1
+    target = pointer.copy()
+    while True:
+        # Targets pointing to the target of another edge follow it
+        unresolved = (target >= 0) & (target % 2 == 1)
+        if not unresolved.any():
+            break
+        target[unresolved] = pointer[(target[unresolved] - 1) // 2]
+    target = np.where(target < 0, 0, source[np.maximum(target, 0) // 2])
+    node1 = np.maximum(source, target)
+    node2 = np.minimum(source, target)
+    keep = node1 != node2
+    pairs = np.unique(node1[keep] * (numEdges + 2) + node2[keep])
+    return (pairs // (numEdges + 2), pairs % (numEdges + 2))
+
+
+def nodeName(number):
+    return "G%07i" % number
+
+
+def writeInteractome(edgeFile, numEdges, directedFraction, seed,
+                     edgesPerNode=3):
+    """
+    Writes a synthetic scale-free interactome in the format of the Forest
+    edge files, with weights between 0.05 and 0.99 and directedFraction of
+    the edges directed
+
+    RETURNS: (number of edges, number of nodes) written
+    """
+    rng = np.random.default_rng(seed)
+    (node1, node2) = scaleFreeEdges(numEdges, edgesPerNode, rng)
+    # Hubs are the oldest nodes, shuffle the names so they are not sorted
+    names = rng.permutation(node1.max() + 1)
+    weights = rng.uniform(0.05, 0.99, len(node1))
+    directed = rng.random(len(node1)) < directedFraction
+    # Directed edges point either way
+    flip = directed & (rng.random(len(node1)) < 0.5)
+    (node1, node2) = (np.where(flip, node2, node1),
+                      np.where(flip, node1, node2))
+    with open(edgeFile, "w") as f:
+        for start in range(0, len(node1), 100000):
+            stop = start + 100000
+            f.write("".join(
+                "%s\t%s\t%.3f\t%s\n" % (nodeName(a), nodeName(b), w,
+                                        "D" if d else "U")
+                for (a, b, w, d) in zip(names[node1[start:stop]],
+                                        names[node2[start:stop]],
+                                        weights[start:stop],
+                                        directed[start:stop])
+            ))
+    return (len(node1), len(np.union1d(node1, node2)))
+
+
+def writePrizes(prizeFile, edgeFile, numPrizes, seed):
+    """
+    Writes prizes between 0 and 1 for numPrizes nodes of edgeFile, chosen
+    uniformly, plus one node missing from the interactome
+    """
+    nodes = set()
+    with open(edgeFile) as f:
+        for line in f:
+            words = line.split("\t", 2)
+            nodes.add(words[0])
+            nodes.add(words[1])
+    rng = random.Random(seed)
+    chosen = rng.sample(sorted(nodes), min(numPrizes, len(nodes)))
+    with open(prizeFile, "w") as f:
+        for node in chosen:
+            f.write("%s\t%.4f\n" % (node, rng.random()))
+        f.write("NOT_IN_INTERACTOME\t1.0\n")
+
+
+class FakeSolver(object):
+    def __init__(self, lines):
+        """ Stands in for msgsteiner. It reads the msgsteiner input lines
+        once and returns forests grown from randomly chosen roots, with the
+        structure of msgsteiner output but none of its optimality.
+
+        INPUT: lines - msgsteiner input lines, as given by
+                       PCSFInput.solverInput
+        """
+        self.children = {}
+        self.prizes = {}
+        children = self.children
+        for line in lines:
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == "D":
+                children.setdefault(words[2], []).append(
+                    (words[1], float(words[3]))
+                )
+            elif words[0] == "E":
+                cost = float(words[3])
+                children.setdefault(words[1], []).append((words[2], cost))
+                children.setdefault(words[2], []).append((words[1], cost))
+            elif words[0] == "W":
+                self.prizes[words[1]] = float(words[2])
+        self.roots = sorted(
+            node for (node, cost) in children.get("DUMMY", [])
+            if self.prizes.get(node, 0) > 0
+        )
+
+    def solve(self, depth, seed):
+        """
+        RETURNS: the "child parent" lines of a forest with trees of at most
+                 depth levels, as msgsteiner writes them
+        """
+        rng = random.Random(seed)
+        prizes = self.prizes
+        children = self.children
+        roots = list(self.roots)
+        rng.shuffle(roots)
+        seen = set(["DUMMY"])
+        edges = []
+        for root in roots[:max(1, len(roots) // 3)]:
+            if root in seen:
+                continue
+            seen.add(root)
+            edges.append((root, "DUMMY"))
+            frontier = [root]
+            for level in range(depth - 1):
+                nextFrontier = []
+                for node in frontier:
+                    for (child, cost) in children.get(node, []):
+                        if child not in seen and \
+                                prizes.get(child, 0) + rng.random() * 0.1 \
+                                > cost:
+                            seen.add(child)
+                            edges.append((child, node))
+                            nextFrontier.append(child)
+                frontier = nextFrontier
+        return "".join("%s %s\n" % edge for edge in edges)
+
+
+def solverMain(args):
+    """Runs the fake solver with the command line options of msgsteiner"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", type=int, default=10)
+    parser.add_argument("-s", type=int, default=0)
+    for option in ("-t", "-r", "-g", "-j", "-z"):
+        parser.add_argument(option)
+    parser.add_argument("-o", action="store_true")
+    options = parser.parse_args(args)
+    solver = FakeSolver(sys.stdin)
+    sys.stdout.write(solver.solve(options.d, options.s))
+    sys.stderr.write("fake msgsteiner\n")
+
+
+def installFakeSolver(bindir):
+    """
+    Writes a msgsteiner executable running the fake solver to bindir and
+    puts bindir first on the PATH
+    """
+    solverPath = os.path.join(bindir, "msgsteiner")
+    with open(solverPath, "w") as f:
+        f.write("#!/bin/sh\nexec %s %s --solver \"$@\"\n"
+                % (sys.executable, os.path.abspath(__file__)))
+    os.chmod(solverPath, stat.S_IRWXU)
+    os.environ["PATH"] = bindir + os.pathsep + os.environ["PATH"]
+
+
+def timeStage(func, repeat):
+    """
+    Calls func repeat times with its printed messages discarded
+
+    RETURNS: (the shortest time in seconds, the result of the last call)
+    """
+    best = None
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            for i in range(repeat):
+                start = time.perf_counter()
+                result = func()
+                seconds = time.perf_counter() - start
+                if best is None or seconds < best:
+                    best = seconds
+    return (best, result)
+
+
+def benchmark(workdir, numEdges, directedFraction, numPrizes, merges,
+              stages, repeat, seed):
+    """
+    Times the stages of Forest on one synthetic interactome
+
+    RETURNS: a dictionary with the size of the interactome and {stage:
+             seconds}, merges are timed as "merge_N" for each N of merges
+    """
+    edgeFile = os.path.join(workdir, "interactome%i.txt" % numEdges)
+    prizeFile = os.path.join(workdir, "prizes%i.txt" % numEdges)
+    confFile = os.path.join(workdir, "conf.txt")
+    with open(confFile, "w") as f:
+        f.write(CONF)
+    start = time.perf_counter()
+    (edgesWritten, nodesWritten) = writeInteractome(
+        edgeFile, numEdges, directedFraction, seed
+    )
+    writePrizes(prizeFile, edgeFile, numPrizes, seed)
+    result = {
+        "edges": numEdges,
+        "directedFraction": directedFraction,
+        "prizes": numPrizes,
+        "seed": seed,
+        "interactomeEdges": edgesWritten,
+        "interactomeNodes": nodesWritten,
+        "generateSeconds": time.perf_counter() - start,
+        "stages": {},
+    }
+    times = result["stages"]
+
+    (seconds, interactome) = timeStage(
+        lambda: PCSFInput.interactome(edgeFile, confFile, (), False), repeat
+    )
+    times["parse_edges"] = seconds
+    if "parse_edges_tracked" in stages:
+        times["parse_edges_tracked"] = timeStage(
+            lambda: PCSFInput.interactome(edgeFile, confFile), repeat
+        )[0]
+    (seconds, inputObj) = timeStage(
+        lambda: interactome.withPrizes(prizeFile), repeat
+    )
+    times["read_prizes"] = seconds
+    if "neg_prizes" in stages:
+        times["neg_prizes"] = timeStage(
+            lambda: inputObj.assignNegPrizes(False, False), repeat
+        )[0]
+    (seconds, lines) = timeStage(inputObj.solverInput, repeat)
+    if "solver_input" in stages:
+        times["solver_input"] = seconds
+    if "run_pcsf" in stages:
+        times["run_pcsf"] = timeStage(lambda: inputObj.runPCSF(seed),
+                                      repeat)[0]
+    solver = FakeSolver(lines)
+    edgeList = solver.solve(inputObj.D, seed)
+    (seconds, output) = timeStage(
+        lambda: PCSFOutput(inputObj, edgeList, "", None, "result", 0), repeat
+    )
+    times["parse_output"] = seconds
+    result["forestNodes"] = output.optForest.number_of_nodes()
+    if "aug_forest" in stages:
+        times["aug_forest"] = timeStage(
+            lambda: augmentForest(output.optForest, inputObj), repeat
+        )[0]
+    if "betweenness" in stages:
+        times["betweenness"] = timeStage(
+            lambda: nx.betweenness_centrality(output.augForest), repeat
+        )[0]
+    if "write_cyto" in stages:
+        outdir = os.path.join(workdir, "output")
+        os.mkdir(outdir)
+        times["write_cyto"] = timeStage(
+            lambda: output.writeCytoFiles(outdir, "result", True), repeat
+        )[0]
+        shutil.rmtree(outdir)
+
+    if merges and ("merge" in stages or "ensemble_merge" in stages):
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(devnull):
+                outputs = [
+                    PCSFOutput(inputObj, solver.solve(inputObj.D, seed + i),
+                               "", None, "result", 0)
+                    for i in range(max(merges))
+                ]
+    for numRuns in merges:
+        if "merge" in stages:
+            def merge():
+                merged = outputs[0]
+                for i in range(1, numRuns):
+                    merged = mergeOutputs(merged, outputs[i], False, i, 1)
+                return merged
+            times["merge_%i" % numRuns] = timeStage(merge, repeat)[0]
+        if "ensemble_merge" in stages:
+            def ensembleMerge():
+                merger = EnsembleMerger(inputObj)
+                for i in range(numRuns):
+                    merger.addOutput(outputs[i])
+                return merger.merged(False)
+            times["ensemble_merge_%i" % numRuns] = timeStage(
+                ensembleMerge, repeat
+            )[0]
+    return result
+
+
+def gitCommit():
+    """RETURNS: the commit checked out in the repository, or None"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def sameData(record, result):
+    return all(record.get(key) == result[key]
+               for key in ("edges", "directedFraction", "prizes", "seed"))
+
+
+def compare(resultsFile, result, threshold):
+    """
+    Prints the times of result next to the last results in resultsFile of
+    another commit on the same synthetic data, marking stages slower by
+    more than the fraction threshold
+    """
+    previous = None
+    if os.path.exists(resultsFile):
+        with open(resultsFile) as f:
+            for line in f:
+                record = json.loads(line)
+                if sameData(record, result) and \
+                        record.get("commit") != result["commit"]:
+                    previous = record
+    print("%i edges, %i nodes, %i nodes in the forest"
+          % (result["interactomeEdges"], result["interactomeNodes"],
+             result["forestNodes"]))
+    if previous is None:
+        for (stage, seconds) in result["stages"].items():
+            print("  %-24s %10.4f s" % (stage, seconds))
+        return
+    print("  %-24s %10s %12s" % ("stage", previous["commit"],
+                                 result["commit"]))
+    for (stage, seconds) in result["stages"].items():
+        before = previous["stages"].get(stage)
+        if before is None:
+            print("  %-24s %10s %10.4f s" % (stage, "", seconds))
+            continue
+        mark = ""
+        if seconds > before * (1 + threshold):
+            mark = "  slower"
+        elif seconds < before * (1 - threshold):
+            mark = "  faster"
+        print("  %-24s %10.4f %10.4f s  x%.2f%s"
+              % (stage, before, seconds, seconds / max(before, 1e-9), mark))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--edges", default="10000,100000",
+        help="Comma separated numbers of interactome edges to benchmark,"
+        " e.g. 10000,100000,1000000,5000000. Default: %(default)s")
+    parser.add_argument(
+        "--directed", type=float, default=0.2,
+        help="Fraction of directed edges. Default: %(default)s")
+    parser.add_argument(
+        "--prizes", type=int, default=1000,
+        help="Number of nodes with prizes. Default: %(default)s")
+    parser.add_argument(
+        "--merges", default="10,100,1000",
+        help="Comma separated numbers of outputs to merge, or an empty"
+        " string to skip merging. Default: %(default)s")
+    parser.add_argument(
+        "--stages", default=",".join(STAGES),
+        help="Comma separated stages to time. Default: all of %(default)s")
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="Number of times each stage is timed, the shortest time is"
+        " kept. Default: %(default)s")
+    parser.add_argument(
+        "--seed", type=int, default=1,
+        help="Seed of the synthetic data. Default: %(default)s")
+    parser.add_argument(
+        "--results",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "results.jsonl"),
+        help="JSON lines file the results are appended to. Default:"
+        " %(default)s")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="Fraction by which a stage must be slower or faster than the"
+        " last results of another commit to be marked. Default:"
+        " %(default)s")
+    options = parser.parse_args()
+    stages = set(options.stages.split(","))
+    unknown = stages - set(STAGES)
+    if unknown:
+        parser.error("Unknown stages %s" % ", ".join(sorted(unknown)))
+    merges = [int(n) for n in options.merges.split(",") if n]
+
+    workdir = tempfile.mkdtemp()
+    try:
+        bindir = os.path.join(workdir, "bin")
+        os.mkdir(bindir)
+        installFakeSolver(bindir)
+        for numEdges in [int(n) for n in options.edges.split(",")]:
+            result = benchmark(workdir, numEdges, options.directed,
+                               options.prizes, merges, stages,
+                               options.repeat, options.seed)
+            result["commit"] = gitCommit()
+            result["date"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            result["python"] = platform.python_version()
+            result["networkx"] = nx.__version__
+            result["host"] = platform.node()
+            compare(options.results, result, options.threshold)
+            with open(options.results, "a") as f:
+                f.write(json.dumps(result) + "\n")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--solver"]:
+        solverMain(sys.argv[2:])
+    else:
+        main()
@@ -1,13 +1,11 @@
 import os
+import sys
 import numpy as np
 
-def conf_prep(mu,beta,D,w):
-    file = open("conf.txt","w")
-    file.writelines("w = %d\nb = %d\nD = %d\nmu = %f" % (w,beta,D,mu))
-    file.close()
+sys.path.insert(1, "../..")
+from OmicsIntegrator.forest_api import Forest
 
-# Update this with the path to msgsteiner
-msgpath = "./msgsteiner"
+# msgsteiner must be on the PATH
 
 # The interval stop value is not included in the range
 mu_range = np.arange(0.002,0.004,0.002)
@@ -28,11 +26,27 @@ if not os.path.exists(wt_path):
 if not os.path.exists(ko_path):
     os.makedirs(ko_path)
 
-for mu in mu_range:
-    for beta in beta_range:
-        for w in w_range:
-            conf_prep(mu,beta,D,w)
-            out_label = "WT_w%f_beta%d_D%d_mu%f" %(w,beta,D,mu)
-            os.system("python ../../scripts/forest.py --prize %s --edge %s --conf conf.txt --msgpath %s --outpath %s --outlabel %s" %(prize_file,edge_file,msgpath,wt_path,out_label))
-            out_label = "KO_w%f_beta%d_D%d_mu%f" %(w,beta,D,mu)
-            os.system("python ../../scripts/forest.py --prize %s --edge %s --conf conf.txt --msgpath %s --knockout EGFR --outpath %s --outlabel %s" %(prize_file,edge_file,msgpath,ko_path,out_label))
+# The parameters of the sweep replace those of the configuration file
+file = open(conf_file,"w")
+file.writelines("w = %d\nb = %d\nD = %d\nmu = %f" % (w_range[0],beta_range[0],D,mu_range[0]))
+file.close()
+
+# Each interactome is read once for all runs
+wt = Forest(edge_file, conf_file)
+ko = Forest(edge_file, conf_file, knockout=["EGFR"])
+
+for (forest, path, label) in [(wt, wt_path, "WT"), (ko, ko_path, "KO")]:
+    jobs = []
+    for mu in mu_range:
+        for beta in beta_range:
+            for w in w_range:
+                out_label = "%s_w%f_beta%d_D%d_mu%f" %(label,w,beta,D,mu)
+                jobs.append(dict(prizeFile=prize_file, outputpath=path,
+                                 outputlabel=out_label,
+                                 parameters={"w": w, "b": beta, "D": D,
+                                             "mu": mu}))
+    # A failed run is reported and the sweep goes on
+    for result in forest.sweep(jobs):
+        if not result.ok:
+            print("%s failed: %s" % (result.job["outputlabel"], result.error))
+    forest.close()
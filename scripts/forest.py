@@ -9,11 +9,15 @@ import sys
 import argparse
 from shutil import which
 
-from OmicsIntegrator.forest import PCSFInput, PCSFOutput, crossValidation, \
-    changeValuesAndMergeResults
+from OmicsIntegrator.forest import PCSFInput, OUTPUT_FORMATS, ForestError
+from OmicsIntegrator.forest_runner import planRuns
+from OmicsIntegrator.forest_store import RunStore
+from OmicsIntegrator.forest_telemetry import enableTelemetry
+from OmicsIntegrator.forest_profile import startProfiling, writeProfiles
 
 
-def main():
+def buildParser():
+    """Returns the parser of the command line options of Forest"""
     # Parsing arguments (run python PCSF.py -h to see all these decriptions)
     parser = argparse.ArgumentParser(
         description="Find multiple pathways within an interactome "
@@ -37,7 +41,8 @@ def main():
         "containing the interactome edges. Should be a tab delimited file with"
         "3 or 4 columns: "
         '"ProteinA\tProteinB\tWeight(between 0 and 1)\tDirectionality(U '
-        "or D, optional)",
+        'or D, optional)", or a PSI-MITAB file. May be compressed with gzip'
+        " or bzip2.",
     )
     # optional arguments
     parser.add_argument(
@@ -123,6 +128,22 @@ def main():
         "you want the output files to be amenable with Cytoscape v2.8, rather"
         " than v3.0.",
     )
+    parser.add_argument(
+        "--outputFormats",
+        dest="outputFormats",
+        help="Comma separated list of the formats of the output files, from"
+        " %s. cytoscape writes the Cytoscape files selected by --cyto30 or"
+        " --cyto28, graphml and json the augmented forest, tsv tables of its"
+        " edges and nodes. Default = cytoscape" % ", ".join(OUTPUT_FORMATS),
+        default="cytoscape",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        dest="gzip",
+        help="Compress the output files with gzip.",
+        default=False,
+    )
     parser.add_argument(
         "--noisyEdges",
         dest="noiseNum",
@@ -196,15 +217,127 @@ def main():
         type=int,
         default=None,
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        dest="resume",
+        help="Reuse the runs recorded in the run manifests"
+        ' ("<outlabel>_<type>_runs.jsonl") of an earlier job with the same'
+        " inputs, outpath and outlabel, and only run the missing noisyEdges,"
+        " shuffledPrizes and randomTerminals runs. Use to continue an"
+        " interrupted job, or to extend an ensemble by asking for more runs.",
+        default=False,
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        dest="adaptive",
+        help="Stop the noisyEdges, shuffledPrizes and randomTerminals"
+        " ensembles once the frequencies of the nodes in their runs are known"
+        " to within --ciWidth. The numbers of runs given for the ensembles"
+        " are then the maximum numbers of runs.",
+        default=False,
+    )
+    parser.add_argument(
+        "--ciWidth",
+        dest="ciWidth",
+        help="With --adaptive, the target half-width of the 95%% confidence"
+        " intervals of the node frequencies. Default = 0.05",
+        type=float,
+        default=0.05,
+    )
+    parser.add_argument(
+        "--minFrequency",
+        dest="minFrequency",
+        help="With --adaptive, only nodes found in at least this fraction of"
+        " the runs must reach --ciWidth. Default = 0.1",
+        type=float,
+        default=0.1,
+    )
+    parser.add_argument(
+        "--batchSize",
+        dest="batchSize",
+        help="With --adaptive, the number of runs launched between two"
+        " convergence checks. Default = 10",
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        "--timeBudget",
+        dest="timeBudget",
+        help="Wall-clock budget in minutes for the noisyEdges, shuffledPrizes"
+        " and randomTerminals runs. New runs are only launched while they are"
+        " expected to finish in time, runs still going at the end of the"
+        " budget are cancelled and the completed runs are merged. The numbers"
+        " of runs given for the ensembles are then the maximum numbers of"
+        " runs. Default = no limit",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--runStore",
+        action="store_true",
+        dest="runStore",
+        help="Write the noisyEdges, shuffledPrizes and randomTerminals runs"
+        ' to one SQLite database ("<outlabel>_runs.sqlite") instead of a'
+        " directory of Cytoscape files and an info file per run. Cytoscape"
+        " files are still written for the merged results.",
+        default=False,
+    )
     parser.add_argument(
         "--merge",
         dest="merge",
         help="Merge results of multirun methods such as noisyEdges",
         default=False,
     )
+    parser.add_argument(
+        "--telemetry",
+        action="store_true",
+        dest="telemetry",
+        help="Record the wall and CPU time and peak memory of every stage"
+        " (reading the input, negative prizes, msgsteiner, building the"
+        " output, betweenness, merging, writing files) in the main process"
+        ' and in every run, and add them to "<outlabel>_info.txt" and'
+        ' "<outlabel>_telemetry.json".',
+        default=False,
+    )
+    parser.add_argument(
+        "--traceMemory",
+        action="store_true",
+        dest="traceMemory",
+        help="With --telemetry, also record the memory allocated by every"
+        " stage with tracemalloc. This makes Forest several times slower.",
+        default=False,
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        dest="profile",
+        help="Profile the main process and every run of the workers with"
+        ' cProfile, and write "<outlabel>_profile_parent.pstats" and the'
+        ' merged profiles of the workers "<outlabel>_profile_workers.pstats"'
+        " to the output directory.",
+        default=False,
+    )
+    parser.add_argument(
+        "--profileStacks",
+        action="store_true",
+        dest="profileStacks",
+        help="With --profile, also write the profiles as approximate"
+        ' collapsed stacks for flame graph tools, "<outlabel>_profile_*'
+        '.collapsed".',
+        default=False,
+    )
+    return parser
 
-    options = parser.parse_args()
 
+def checkOptions(options):
+    """
+    Checks the parsed options for conflicts and that msgsteiner can be
+    found, exiting with an error message if not.
+
+    RETURNS: the list of output formats
+    """
     # Check cv parameters do not conflict
     if options.cv_reps is not None:
         if options.cv is None:
@@ -213,6 +346,19 @@ def main():
                 " a k parameter for k-fold cross validation."
             )
 
+    if options.timeBudget is not None and options.timeBudget <= 0:
+        sys.exit(
+            "The --timeBudget option must be a positive number of minutes."
+        )
+
+    formats = options.outputFormats.split(",")
+    for fmt in formats:
+        if fmt not in OUTPUT_FORMATS:
+            sys.exit(
+                "Unknown output format %s, choose from %s."
+                % (fmt, ", ".join(OUTPUT_FORMATS))
+            )
+
     # Check if outputpath exists
     if not os.path.isdir(options.outputpath):
         sys.exit("Outpath %s is not a directory" % options.outputpath)
@@ -221,6 +367,16 @@ def main():
     # files
     if which('msgsteiner') is None:
         sys.exit("ERROR: The msgsteiner code was not found on your path")
+    return formats
+
+
+def main():
+    options = buildParser().parse_args()
+    formats = checkOptions(options)
+    if options.telemetry:
+        enableTelemetry(options.traceMemory)
+    if options.profile:
+        startProfiling(options.outputpath, options.outputlabel)
     # Process input, run msgsteiner, create output object, and write out
     # results
     inputObj = PCSFInput(
@@ -234,93 +390,27 @@ def main():
         options.musquared,
         options.excludeT,
     )
-    (edgeList, info) = inputObj.runPCSF(options.seed)
-    outputObj = PCSFOutput(
-        inputObj, edgeList, info, options.outputpath, options.outputlabel, 1
-    )
-    outputObj.writeCytoFiles(
-        options.outputpath, options.outputlabel, options.cyto30
-    )
-
-    # Get merged results of adding noise to edge values
-    if options.noiseNum > 0:
-        merged = changeValuesAndMergeResults(
-            'noisyEdges',
-            options.seed,
-            inputObj,
-            options.noiseNum,
-            options.outputpath,
-            options.outputlabel,
-            options.excludeT,
-            merge=options.merge,
-        )
-        if merged is not None:
-            merged.writeCytoFiles(
-                options.outputpath,
-                options.outputlabel + "_noisy",
-                options.cyto30,
-            )
-
-    # Get merged results of shuffling prizes
-    if options.shuffleNum > 0:
-        merged = changeValuesAndMergeResults(
-            'shufflePrizes',
-            options.seed,
-            inputObj,
-            options.shuffleNum,
-            options.outputpath,
-            options.outputlabel,
-            options.excludeT,
-            merge=options.merge,
-        )
-        if merged is not None:
-            merged.writeCytoFiles(
-                options.outputpath,
-                options.outputlabel + "_shuffled",
-                options.cyto30,
+    store = None
+    if options.runStore:
+        store = RunStore(
+            os.path.join(
+                options.outputpath, options.outputlabel + "_runs.sqlite"
             )
-
-    # Get merged results of randomizing terminals
-    if options.termNum > 0:
-        merged = changeValuesAndMergeResults(
-            'randomTerminals',
-            options.seed,
-            inputObj,
-            options.termNum,
-            options.outputpath,
-            options.outputlabel,
-            options.excludeT,
-            merge=options.merge,
         )
-        if merged is not None:
-            merged.writeCytoFiles(
-                options.outputpath,
-                options.outputlabel + "_randomTerminals",
-                options.cyto30,
-            )
-
-    # If k is supplied, run k-fold cross validation
-    if options.cv is not None:
-        if options.cv_reps is None:
-            crossValidation(
-                options.cv,
-                1,
-                inputObj,
-                options.seed,
-                options.outputpath,
-                options.outputlabel,
-            )
-        else:
-            for i in range(0, options.cv_reps):
-                crossValidation(
-                    options.cv,
-                    i + 1,
-                    inputObj,
-                    options.seed,
-                    options.outputpath,
-                    options.outputlabel,
-                )
+    # Plan the main run, the ensembles and cross validation, then run them
+    # all on one pool so that they overlap
+    planner = planRuns(inputObj, options, formats, store)
+    try:
+        planner.execute()
+    finally:
+        if store is not None:
+            store.close()
+        # Workers write their profiles when the pool is joined by execute()
+        writeProfiles(options.profileStacks)
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except ForestError as e:
+        sys.exit(str(e))
@@ -0,0 +1,147 @@
+# Runs the jobs of a sweep or the runs of an ensemble through a work queue in
+# a shared directory, see OmicsIntegrator/forest_queue.py
+
+
+import sys
+import json
+import argparse
+import multiprocessing as mp
+from shutil import which
+
+from OmicsIntegrator.forest import ForestError, OUTPUT_FORMATS
+from OmicsIntegrator.forest_queue import submitSpec, queueStatus, \
+    QueueWorker, reduceQueue
+
+
+def buildParser():
+    """Returns the parser of the command line options of the work queue"""
+    parser = argparse.ArgumentParser(
+        description="Run Forest sweeps and ensembles on any number of"
+        " machines sharing a directory. Submit a spec to create the queue,"
+        " start workers wherever the directory is mounted, then reduce the"
+        " results."
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    submit = commands.add_parser(
+        "submit", help="Create a queue with the tasks of a JSON spec, see"
+        " OmicsIntegrator.forest_queue"
+    )
+    submit.add_argument("queue", help="Directory of the queue")
+    submit.add_argument("spec", help="Path of the JSON spec")
+
+    work = commands.add_parser(
+        "work", help="Run tasks of a queue until it is empty"
+    )
+    work.add_argument("queue", help="Directory of the queue")
+    work.add_argument(
+        "--processes",
+        dest="processes",
+        type=int,
+        help="Number of worker processes on this machine, sharing one copy"
+        " of the interactome. Default = 1",
+        default=1,
+    )
+    work.add_argument(
+        "--maxTasks",
+        dest="maxTasks",
+        type=int,
+        help="Stop each worker process after this many tasks.",
+        default=None,
+    )
+    work.add_argument(
+        "--heartbeat",
+        dest="heartbeat",
+        type=float,
+        help="Seconds between the touches of a claimed task that show the"
+        " worker is alive. Default = 60",
+        default=60.0,
+    )
+    work.add_argument(
+        "--staleAfter",
+        dest="staleAfter",
+        type=float,
+        help="Seconds after which a claimed task that was not touched is"
+        " run again by another worker. Default = 600",
+        default=600.0,
+    )
+
+    status = commands.add_parser(
+        "status", help="Print the number of tasks in each state"
+    )
+    status.add_argument("queue", help="Directory of the queue")
+
+    reduce = commands.add_parser(
+        "reduce", help="Merge the results of the finished tasks"
+    )
+    reduce.add_argument("queue", help="Directory of the queue")
+    reduce.add_argument(
+        "--outpath",
+        dest="outputpath",
+        help="Path to the directory which will hold the output files."
+        " Default = this directory",
+        default=".",
+    )
+    reduce.add_argument(
+        "--outlabel",
+        dest="outputlabel",
+        help="A string to put at the beginning of the names of files output"
+        ' by the reducer. Default = "result"',
+        default="result",
+    )
+    reduce.add_argument(
+        "--outputFormats",
+        dest="outputFormats",
+        help="Comma separated formats of the merged ensemble, from %s."
+        ' Default = "cytoscape"' % ", ".join(OUTPUT_FORMATS),
+        default="cytoscape",
+    )
+    return parser
+
+
+def main():
+    options = buildParser().parse_args()
+    if options.command == "submit":
+        with open(options.spec, "r") as f:
+            spec = json.load(f)
+        count = submitSpec(options.queue, spec)
+        print("Queued %i tasks in %s." % (count, options.queue))
+    elif options.command == "work":
+        if which('msgsteiner') is None:
+            sys.exit("ERROR: The msgsteiner code was not found on your path")
+        worker = QueueWorker(options.queue, options.heartbeat,
+                             options.staleAfter)
+        # Forked after the interactome is read
+        processes = [mp.Process(target=worker.work, args=(options.maxTasks,))
+                     for i in range(options.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        print("Workers done, %s." % formatStatus(queueStatus(options.queue)))
+    elif options.command == "status":
+        print(formatStatus(queueStatus(options.queue)))
+    else:
+        formats = options.outputFormats.split(",")
+        for fmt in formats:
+            if fmt not in OUTPUT_FORMATS:
+                sys.exit(
+                    "Unknown output format %s, choose from %s."
+                    % (fmt, ", ".join(OUTPUT_FORMATS))
+                )
+        status = reduceQueue(options.queue, options.outputpath,
+                             options.outputlabel, True, formats)
+        print("Reduced the queue, %s." % formatStatus(status))
+
+
+def formatStatus(status):
+    return ", ".join("%s %i" % (name, status[name])
+                     for name in ("todo", "claimed", "done", "failed"))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ForestError as e:
+        sys.exit(str(e))
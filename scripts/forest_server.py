@@ -0,0 +1,127 @@
+# Runs a Forest server that keeps interactomes in memory and runs jobs sent
+# to it, see OmicsIntegrator/forest_server.py
+
+
+import os
+import sys
+import argparse
+from shutil import which
+
+from forest import buildParser, checkOptions
+from OmicsIntegrator.forest import PCSFInput, ForestError
+from OmicsIntegrator.forest_server import ForestServer
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Read interactomes once and run the Forest jobs sent to"
+        " a UNIX socket or a localhost port on them. Jobs take the options of"
+        " forest.py, except --edge and --knockout, see"
+        " OmicsIntegrator.forest_server.submitJob."
+    )
+    parser.add_argument(
+        "-e",
+        "--edge",
+        dest="edgeFiles",
+        action="append",
+        metavar="[NAME=]EDGEFILE",
+        help="(Required) Path to a text file containing interactome edges,"
+        " as for forest.py. Jobs choose the interactome by NAME, which"
+        " defaults to the file name without extension. May be repeated.",
+    )
+    parser.add_argument(
+        "-c",
+        "--conf",
+        dest="confFile",
+        help="Path to the text file containing the parameters of jobs that"
+        ' do not give their own. Default = "./conf.txt"',
+        default="conf.txt",
+    )
+    parser.add_argument(
+        "--knockout",
+        dest="knockout",
+        nargs="*",
+        help="Protein(s) to knock out of all interactomes.",
+        default=[],
+    )
+    parser.add_argument(
+        "--socket",
+        dest="socket",
+        help="Path of the UNIX socket to listen on.",
+        default=None,
+    )
+    parser.add_argument(
+        "--port",
+        dest="port",
+        type=int,
+        help="Localhost TCP port to listen on, instead of a UNIX socket.",
+        default=None,
+    )
+    parser.add_argument(
+        "--processes",
+        dest="processes",
+        type=int,
+        help="Number of worker processes running the msgsteiner runs of all"
+        " jobs. Default = number of CPUs",
+        default=None,
+    )
+    parser.add_argument(
+        "--jobs",
+        dest="maxJobs",
+        type=int,
+        help="Number of jobs run at the same time. Default = 2",
+        default=2,
+    )
+    options = parser.parse_args()
+
+    if not options.edgeFiles:
+        sys.exit("Give at least one interactome with --edge.")
+    if (options.socket is None) == (options.port is None):
+        sys.exit("Give one of --socket and --port.")
+    if options.maxJobs < 1:
+        sys.exit("The --jobs option must be at least 1.")
+    if which('msgsteiner') is None:
+        sys.exit("ERROR: The msgsteiner code was not found on your path")
+
+    interactomes = {}
+    for spec in options.edgeFiles:
+        (name, sep, edgeFile) = spec.partition("=")
+        if not sep:
+            edgeFile = spec
+            name = os.path.splitext(os.path.basename(spec))[0]
+        interactomes[name] = PCSFInput.interactome(
+            edgeFile, options.confFile, options.knockout
+        )
+
+    jobParser = buildParser()
+    # Jobs keep the parameters of the server unless they give their own
+    jobParser.set_defaults(confFile=None)
+
+    def error(message):
+        raise ValueError("Invalid job options: %s" % message)
+    jobParser.error = error
+
+    def parseOptions(args):
+        jobOptions = jobParser.parse_args(args)
+        return (jobOptions, checkOptions(jobOptions))
+
+    server = ForestServer(interactomes, parseOptions, options.processes,
+                          options.maxJobs)
+    if options.socket is not None:
+        address = options.socket
+    else:
+        address = ("127.0.0.1", options.port)
+    try:
+        server.serve(address)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.pool.terminate()
+        server.pool.join()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ForestError as e:
+        sys.exit(str(e))
@@ -0,0 +1,7 @@
+# Loads Forest output files, see OmicsIntegrator/forest_util.py
+
+from OmicsIntegrator.forest_util import loadGraph, loadOutput, \
+    loadOutputs, loadSummary, loadEnsemble, LoadedInput
+
+__all__ = ["loadGraph", "loadOutput", "loadOutputs", "loadSummary",
+           "loadEnsemble", "LoadedInput"]
@@ -1,13 +1,98 @@
 # content of conftest.py
 # See examples in https://pytest.org/latest/example/simple.html and
 # https://pytest.org/latest/fixture.html#fixture-function
+import os, sys, stat
 import pytest
 
+# Create the path to OmicsIntegrator relative to the conftest.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFInput
+
 def pytest_addoption(parser):
     # Do not set a default value
-    parser.addoption('--msgpath',dest='msgsteiner',type='string',\
+    parser.addoption('--msgpath',dest='msgsteiner',type=str,\
         help='Full path to the msgsteiner dependency, including the executable name.')
 
 @pytest.fixture
 def msgsteiner(request):
     return request.config.getoption("--msgpath")
+
+# Stand-in for msgsteiner connecting every node with a prize to the dummy
+# node. It sleeps for the seconds in the SLEEP environment variable first,
+# and appends its depth to the file FAKE_MSGSTEINER_LOG if that is set.
+FAKE_MSGSTEINER = '''
+import os, sys, time
+time.sleep(float(os.environ.get('SLEEP', 0)))
+if 'FAKE_MSGSTEINER_LOG' in os.environ:
+    with open(os.environ['FAKE_MSGSTEINER_LOG'], 'a') as log:
+        log.write(sys.argv[sys.argv.index('-d') + 1] + '\\n')
+for line in sys.stdin:
+    parts = line.split()
+    if parts and parts[0] == 'W' and parts[1] != 'DUMMY':
+        sys.stdout.write('%s DUMMY\\n' % parts[1])
+sys.stderr.write('fake msgsteiner\\n')
+'''
+
+@pytest.fixture
+def solver_body():
+    '''The Python code of the fake msgsteiner, tests can replace it with
+    @pytest.mark.parametrize('solver_body', [...])'''
+    return FAKE_MSGSTEINER
+
+@pytest.fixture
+def fake_msgsteiner(tmp_path, monkeypatch, solver_body):
+    '''Installs solver_body as msgsteiner first on the PATH, restored after
+    the test, and returns its path'''
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    path = bindir / 'msgsteiner'
+    path.write_text('#!%s\n%s' % (sys.executable, solver_body))
+    os.chmod(str(path), stat.S_IRWXU)
+    monkeypatch.setenv('PATH', str(bindir) + os.pathsep + os.environ['PATH'])
+    monkeypatch.delenv('FAKE_MSGSTEINER_LOG', raising=False)
+    monkeypatch.delenv('SLEEP', raising=False)
+    return str(path)
+
+class ForestFiles(object):
+    '''Paths of the fake msgsteiner and of a small network, prizes and
+    configuration in a temporary directory'''
+
+    def __init__(self, tmpdir, msgsteiner):
+        self.tmpdir = tmpdir
+        self.msgsteiner = msgsteiner
+        self.edge_file = self.write(
+            'network.txt', 'A\tB\t0.5\tU\nB\tC\t0.6\tU\nA\tD\t0.7\tD\n')
+        self.prize_file = self.write('prizes.txt', 'A\t1\nC\t2\n')
+        self.conf_file = self.write('conf.txt', 'w = 1\nb = 1\nD = 5\n')
+
+    def write(self, name, text):
+        '''Writes text to the file name in the temporary directory, e.g. to
+        replace one of the inputs, and returns its path'''
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def inputs(self):
+        '''The PCSFInput object of the network, prizes and configuration'''
+        return PCSFInput(self.prize_file, self.edge_file, self.conf_file,
+                         'terminals', [], None, 0, False, False)
+
+@pytest.fixture
+def forest_files(tmp_path, fake_msgsteiner):
+    return ForestFiles(str(tmp_path), fake_msgsteiner)
+
+@pytest.fixture
+def output_input(forest_files):
+    '''PCSFInput object for the output file tests: prizes on A, C and D of
+    a network whose edge C D is only in the augmented forest of the forest
+    B A, C B, D A'''
+    forest_files.write('network.txt',
+                       'A\tB\t0.5\tU\nB\tC\t0.6\tU\nA\tD\t0.7\tD\n'
+                       'C\tD\t0.8\tU\n')
+    forest_files.write('prizes.txt', 'A\t1\nC\t2\nD\t3\n')
+    return forest_files.inputs()
@@ -0,0 +1,82 @@
+'''
+Test the adaptive stopping rule for ensembles
+'''
+
+import os, sys, pytest
+import multiprocessing as mp
+
+# Create the path to OmicsIntegrator relative to the test_adaptive_stopping.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import AdaptiveStopping, EnsembleRun, PCSFInput
+
+class Counts(object):
+    '''The part of EnsembleMerger used by AdaptiveStopping'''
+    def __init__(self, numRuns, nodeCounts):
+        self.numRuns = numRuns
+        self.nodeCounts = nodeCounts
+
+class NoPool(object):
+    '''A pool recording the tasks submitted to it without running them'''
+    def __init__(self):
+        self.tasks = []
+
+    def imap_unordered(self, func, tasks):
+        self.tasks.extend(tasks)
+        return iter([])
+
+class TestAdaptiveStopping:
+
+    def test_no_runs(self):
+        assert not AdaptiveStopping().converged(Counts(0, {}))
+
+    def test_half_width(self):
+        rule = AdaptiveStopping(ciWidth=0.1, minFrequency=0.1)
+        # Widest interval is for the node found in half of the runs
+        assert not rule.converged(Counts(50, {'A': 25, 'B': 50, 'C': 1}))
+        assert abs(rule.halfWidth - 1.96 * (0.25 / 50) ** 0.5) < 1e-12
+        assert rule.converged(Counts(400, {'A': 200, 'B': 400, 'C': 1}))
+
+    def test_min_frequency(self):
+        rule = AdaptiveStopping(ciWidth=0.01, minFrequency=0.5)
+        # Rare and always present nodes do not delay stopping
+        assert rule.converged(Counts(10, {'A': 4, 'B': 10}))
+        assert rule.halfWidth == 0.0
+
+    def test_batch_size(self):
+        with pytest.raises(ValueError):
+            AdaptiveStopping(batchSize=0)
+
+    def test_resume_converged(self, forest_files):
+        inputObj = PCSFInput(
+            forest_files.prize_file, forest_files.edge_file,
+            forest_files.conf_file, 'terminals', [], None, 0, False, False)
+        outdir = os.path.join(forest_files.tmpdir, 'out')
+        os.mkdir(outdir)
+
+        def ensemble(resume):
+            return EnsembleRun('noisyEdges', 2, inputObj, 10, outdir, 'ens',
+                               False, resume=resume,
+                               adaptive=AdaptiveStopping(batchSize=2))
+        # The fake msgsteiner always finds the same forest, so the first
+        # batch converges
+        first = ensemble(False)
+        pool = mp.Pool(2)
+        try:
+            first.start(pool)
+            first.finish()
+        finally:
+            pool.close()
+            pool.join()
+        assert first.merger.numRuns == 2
+        # Resuming submits no runs at all
+        second = ensemble(True)
+        pool = NoPool()
+        second.start(pool)
+        second.finish()
+        assert pool.tasks == []
+        assert second.merger.numRuns == 2
+        assert second.stopReason == 'node frequencies converged'
@@ -0,0 +1,57 @@
+'''
+Test the background writer for output files
+'''
+
+import os, sys, time, shutil, tempfile
+import multiprocessing as mp
+
+# Create the path to OmicsIntegrator relative to the test_background_writer.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import BackgroundWriter, workerWriter
+
+def slowWrite(path, text):
+    time.sleep(0.2)
+    with open(path, 'w') as f:
+        f.write(text)
+
+def writeInWorker(path):
+    workerWriter().submit(slowWrite, path, 'run')
+    return os.getpid()
+
+class TestBackgroundWriter:
+
+    def setup_method(self, method):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.tmpdir)
+
+    def test_writes_in_order(self):
+        writer = BackgroundWriter(maxPending=1)
+        written = []
+        for i in range(5):
+            writer.submit(written.append, i)
+        assert writer.close() == []
+        assert written == list(range(5))
+
+    def test_errors(self):
+        writer = BackgroundWriter()
+        writer.submit(slowWrite, os.path.join(self.tmpdir, 'no', 'file'), '')
+        writer.submit(slowWrite, os.path.join(self.tmpdir, 'file'), 'x')
+        errors = writer.close()
+        assert len(errors) == 1
+        assert os.path.exists(os.path.join(self.tmpdir, 'file'))
+
+    def test_pool_worker(self):
+        paths = [os.path.join(self.tmpdir, 'run%d' % i) for i in range(4)]
+        pool = mp.Pool(2)
+        pool.map(writeInWorker, paths)
+        # The tasks return before the files are written, shutting the pool
+        # down waits for the writes
+        pool.close()
+        pool.join()
+        assert all(os.path.exists(path) for path in paths)
@@ -0,0 +1,54 @@
+'''
+Test the synthetic interactomes and the fake solver of the benchmark suite
+'''
+
+import os, sys, shutil, tempfile
+
+# Create the path to OmicsIntegrator relative to the test_benchmark.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import numpy as np
+
+from OmicsIntegrator.forest import PCSFInput, PCSFOutput
+from benchmarks.forest_benchmark import scaleFreeEdges, writeInteractome, \
+    writePrizes, FakeSolver, CONF
+
+class TestBenchmark:
+
+    def setup_method(self, method):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.tmpdir)
+
+    def test_scale_free(self):
+        (node1, node2) = scaleFreeEdges(20000, 3, np.random.default_rng(1))
+        assert (node1 > node2).all()
+        pairs = set(zip(node1.tolist(), node2.tolist()))
+        assert len(pairs) == len(node1)
+        degrees = np.bincount(np.concatenate([node1, node2]))
+        # A few hubs and many nodes of low degree
+        assert degrees.max() > 20 * np.median(degrees)
+
+    def test_fake_solver_output(self):
+        edge_file = os.path.join(self.tmpdir, 'network.txt')
+        prize_file = os.path.join(self.tmpdir, 'prizes.txt')
+        conf_file = os.path.join(self.tmpdir, 'conf.txt')
+        (num_edges, num_nodes) = writeInteractome(edge_file, 2000, 0.3, 2)
+        writePrizes(prize_file, edge_file, 100, 2)
+        with open(conf_file, 'w') as f:
+            f.write(CONF)
+        interactome = PCSFInput.interactome(edge_file, conf_file)
+        assert len(interactome.interactomeNodes) == num_nodes
+        assert interactome.dirEdges and interactome.undirEdges
+        inputObj = interactome.withPrizes(prize_file)
+        lines = inputObj.solverInput()
+        assert lines == sorted(lines[:-2]) + ['W DUMMY 100.0\n', 'R DUMMY\n\n']
+        edge_list = FakeSolver(lines).solve(inputObj.D, 1)
+        # Every edge of the fake forest is in the interactome
+        output = PCSFOutput(inputObj, edge_list, '', None, 'result', 0)
+        assert output.dumForest.number_of_edges() > 0
+        assert output.optForest.number_of_edges() > 0
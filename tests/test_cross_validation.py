@@ -0,0 +1,85 @@
+'''
+Test the cross validation folds and their output files with a stand-in for
+msgsteiner
+'''
+
+import os, sys, random
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_cross_validation.py
+# path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFInput, crossValidationReps
+
+# Connects every node with a positive prize to the dummy node, and always
+# adds the edge B C, so held-out B and C are recovered as Steiner nodes
+CONNECT_POSITIVE = '''
+import sys
+for line in sys.stdin:
+    parts = line.split()
+    if parts and parts[0] == 'W' and parts[1] != 'DUMMY' \\
+            and float(parts[2]) > 0:
+        sys.stdout.write('%s DUMMY\\n' % parts[1])
+sys.stdout.write('B C\\n')
+'''
+
+PRIZES = ['A', 'B', 'C', 'D']
+
+@pytest.mark.parametrize('solver_body', [CONNECT_POSITIVE])
+class TestCrossValidation:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files):
+        with open(forest_files.prize_file, 'w') as f:
+            f.write(''.join('%s\t%i\n' % (node, i + 1)
+                            for (i, node) in enumerate(PRIZES)))
+        self.inputObj = PCSFInput(
+            forest_files.prize_file, forest_files.edge_file,
+            forest_files.conf_file, 'terminals', [], None, 0, False, False)
+        self.outdir = os.path.join(forest_files.tmpdir, 'out')
+        os.mkdir(self.outdir)
+
+    def read(self, name):
+        with open(os.path.join(self.outdir, name)) as f:
+            return f.read().splitlines()
+
+    def test_folds(self):
+        random.seed(0)
+        state = random.getstate()
+        crossValidationReps(2, 2, self.inputObj, 3, self.outdir, 'cv')
+        # The folds do not use or change the global generator
+        assert random.getstate() == state
+        for rep in (1, 2):
+            repPrizes = list(self.inputObj.origPrizes)
+            random.Random(3 + rep).shuffle(repPrizes)
+            for i in (0, 1):
+                hold_out = repPrizes[i::2]
+                recovered = [node for node in hold_out if node in 'BC']
+                lines = self.read('cv_cvIntermediate_rep%ik%i.txt' % (rep, i))
+                assert lines[0] == 'Recovered Terminals'
+                assert sorted(eval(lines[1])) == sorted(recovered)
+                assert sorted(eval(lines[3])) == sorted(recovered)
+                assert sorted(eval(lines[5])) == sorted(
+                    set(PRIZES) - set(hold_out))
+            lines = self.read('cv_cvResults_%i.txt' % rep)
+            assert lines[0].startswith('Iteration\t')
+            rows = [line.split('\t') for line in lines[1:]]
+            assert [row[:2] for row in rows] == [['1', '2'], ['2', '2']]
+            # B and C are each held out once
+            assert sum(int(row[2]) for row in rows) == 2
+        summary = self.read('cv_cvSummary.txt')
+        assert summary[0].startswith('Rep\t')
+        assert summary[1:] == ['1\t4\t2\t0.500000\t1.000000',
+                               '2\t4\t2\t0.500000\t1.000000']
+
+    def test_reproducible(self):
+        crossValidationReps(2, 1, self.inputObj, 3, self.outdir, 'first')
+        random.seed(1234)
+        crossValidationReps(2, 1, self.inputObj, 3, self.outdir, 'second')
+        for i in (0, 1):
+            assert self.read('first_cvIntermediate_rep1k%i.txt' % i) == \
+                self.read('second_cvIntermediate_rep1k%i.txt' % i)
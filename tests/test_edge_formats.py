@@ -0,0 +1,103 @@
+'''
+Test reading compressed and PSI-MITAB interactome edge files
+'''
+
+import os, sys, bz2, gzip
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_edge_formats.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFInput
+from OmicsIntegrator.forest_mitab import MitabReader, parseEntry, isMitab
+
+EDGES = 'A\tB\t0.5\tU\nB\tC\t0.6\tU\nA\tD\t0.7\tD\n'
+
+def mitab_line(idA, idB, altA, altB, aliasA, aliasB, confidence):
+    return '\t'.join([idA, idB, altA, altB, aliasA, aliasB]
+                     + ['-'] * 8 + [confidence] + ['-'] * 27) + '\n'
+
+MITAB = (
+    '#ID(s) interactor A\tID(s) interactor B\t' + '\t'.join(['x'] * 13)
+    + '\n'
+    + mitab_line('uniprotkb:P1', 'uniprotkb:P2', 'hgnc:A', 'hgnc:B',
+                 'uniprotkb:A(gene name)', 'uniprotkb:B(gene name)',
+                 'author score:high|intact-miscore:0.5')
+    + mitab_line('uniprotkb:P2', 'uniprotkb:P3', 'hgnc:B', 'hgnc:C',
+                 'uniprotkb:B(gene name)', 'uniprotkb:C(gene name)',
+                 'intact-miscore:0.6|lpr:3')
+    # No hgnc name for interactor B
+    + mitab_line('uniprotkb:P1', 'uniprotkb:P4', 'hgnc:A', '-',
+                 'uniprotkb:A(gene name)', 'uniprotkb:D(gene name)',
+                 'lpr:2|intact-miscore:0.7')
+    # No intact-miscore
+    + mitab_line('uniprotkb:P3', 'uniprotkb:P4', 'hgnc:C', 'hgnc:D',
+                 '-', '-', 'lpr:1')
+)
+
+class TestEdgeFormats:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files):
+        self.tmpdir = forest_files.tmpdir
+        self.conf_file = forest_files.conf_file
+
+    def write(self, name, text, opener=open):
+        path = os.path.join(self.tmpdir, name)
+        with opener(path, 'wt') as f:
+            f.write(text)
+        return path
+
+    def test_compressed(self):
+        edge_file = self.write('network.txt', EDGES)
+        interactome = PCSFInput.interactome(edge_file, self.conf_file)
+        # Compression is recognized by content, not by file name
+        for (name, opener) in [('network.txt.gz', gzip.open),
+                               ('network.bz2', bz2.open),
+                               ('network.dat', gzip.open)]:
+            other = PCSFInput.interactome(self.write(name, EDGES, opener),
+                                          self.conf_file)
+            assert other.undirEdges == interactome.undirEdges
+            assert other.dirEdges == interactome.dirEdges
+            assert other.interactomeNodes == interactome.interactomeNodes
+
+    def test_parse_entry(self):
+        assert parseEntry('hgnc:A') == ('hgnc', 'A', None)
+        assert parseEntry('uniprotkb:A(gene name)') == \
+            ('uniprotkb', 'A', 'gene name')
+        assert parseEntry('psi-mi:"MI:0018"(two hybrid)') == \
+            ('psi-mi', 'MI:0018', 'two hybrid')
+        assert parseEntry('x:"a(b)"') == ('x', 'a(b)', None)
+        assert isMitab(MITAB.splitlines()[1])
+        assert not isMitab(EDGES.splitlines()[0])
+
+    def test_mitab_reader(self):
+        lines = MITAB.splitlines(True)
+        reader = MitabReader(lines)
+        # Interactor identifiers and the first numerical score
+        assert [words for (line, words) in reader] == [
+            ['P1', 'P2', '0.5'], ['P2', 'P3', '0.6'], ['P1', 'P4', '2'],
+            ['P3', 'P4', '1']]
+        reader = MitabReader(lines, 'intact-miscore', 'hgnc')
+        assert [words for (line, words) in reader] == [
+            ['A', 'B', '0.5'], ['B', 'C', '0.6']]
+        assert (reader.missingNames, reader.missingScores) == (1, 1)
+        # Aliases are searched after the identifiers
+        reader = MitabReader(lines, 'intact-miscore', 'uniprotkb(gene name)')
+        assert [words for (line, words) in reader] == [
+            ['A', 'B', '0.5'], ['B', 'C', '0.6'], ['A', 'D', '0.7']]
+
+    def test_mitab_interactome(self):
+        edge_file = self.write('network.mitab.gz', MITAB, gzip.open)
+        with open(self.conf_file, 'a') as f:
+            f.write('mitabScore = intact-miscore\n'
+                    'mitabNames = uniprotkb(gene name)\n')
+        interactome = PCSFInput.interactome(edge_file, self.conf_file)
+        assert interactome.dirEdges == {}
+        assert interactome.undirEdges == {
+            'A': {'B': '0.5', 'D': '0.7'}, 'B': {'A': '0.5', 'C': '0.6'},
+            'C': {'B': '0.6'}, 'D': {'A': '0.7'}}
+        assert interactome.interactomeNodes == ['A', 'B', 'C', 'D']
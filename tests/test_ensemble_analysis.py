@@ -0,0 +1,118 @@
+'''
+Test the sparse ensemble matrices and the analyses built on them
+'''
+
+import os, sys, shutil, tempfile
+import numpy as np
+
+# Create the path to OmicsIntegrator relative to the test_ensemble_analysis.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest_analysis import EnsembleMatrix
+from OmicsIntegrator.forest_store import RunStore
+
+OBJECTIVE = {'total': 3.0, 'excludedPrizes': 1.0, 'edgeCosts': 1.5,
+             'trees': 0.5}
+
+def record(run, edges, roots):
+    nodes = []
+    for edge in edges:
+        for node in edge:
+            if node not in nodes:
+                nodes.append(node)
+    return {'run': run, 'seed': run, 'nodes': nodes, 'edges': edges,
+            'roots': roots, 'objective': OBJECTIVE}
+
+REAL = [
+    record(0, [['A', 'B'], ['A', 'C']], ['A']),
+    record(1, [['A', 'B'], ['B', 'C']], ['A']),
+    record(2, [['D', 'E']], ['D']),
+    record(3, [['A', 'B'], ['A', 'C']], ['A', 'F']),
+]
+NULL = [
+    record(0, [['A', 'D']], ['A']),
+    record(1, [['D', 'E']], ['D']),
+    record(2, [['C', 'E']], ['C']),
+]
+
+class TestEnsembleMatrix:
+
+    def setup_method(self, method):
+        self.ensemble = EnsembleMatrix.fromSummaries(reversed(REAL))
+
+    def frequencies(self, ensemble):
+        return dict(zip(ensemble.nodes, ensemble.nodeFrequencies()))
+
+    def test_frequencies(self):
+        assert self.ensemble.runs == [0, 1, 2, 3]
+        assert self.frequencies(self.ensemble) == {
+            'A': 0.75, 'B': 0.75, 'C': 0.75, 'D': 0.25, 'E': 0.25}
+        edges = dict(zip(self.ensemble.edges, self.ensemble.edgeFrequencies()))
+        assert edges[('A', 'B')] == 0.75
+        assert edges[('B', 'C')] == 0.25
+
+    def test_store(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'result_runs.sqlite')
+            store = RunStore(path)
+            store.startEnsemble('noisyEdges', {}, REAL)
+            store.startEnsemble('shufflePrizes', {}, NULL)
+            store.close()
+            ensemble = EnsembleMatrix.fromStore(path, 'noisyEdges')
+        finally:
+            shutil.rmtree(tmpdir)
+        assert ensemble.runs == self.ensemble.runs
+        # F is a root without edges and not part of any forest
+        assert self.frequencies(ensemble) == self.frequencies(self.ensemble)
+        assert sorted(ensemble.edges) == sorted(self.ensemble.edges)
+
+    def test_jaccard(self):
+        similarity = self.ensemble.jaccard()
+        assert similarity[0, 3] == 1.0
+        assert similarity[0, 2] == 0.0
+        assert np.allclose(self.ensemble.jaccard(edges=True)[0, 1], 1 / 3.0)
+        assert np.allclose(similarity, similarity.T)
+
+    def test_cluster(self):
+        clusters = self.ensemble.clusterRuns(numClusters=2)
+        assert clusters[0] == clusters[1] == clusters[3] != clusters[2]
+        # Runs 0 and 1 have the same nodes but different edges
+        assert len(set(self.ensemble.clusterRuns(maxDistance=0.0))) == 2
+        clusters = self.ensemble.clusterRuns(maxDistance=0.0, edges=True)
+        assert len(set(clusters)) == 3
+
+    def test_co_occurrence(self):
+        (nodes, counts) = self.ensemble.coOccurrence(['A', 'D', 'Z'])
+        assert nodes == ['A', 'D', 'Z']
+        assert counts.toarray().tolist() == [[3, 0, 0], [0, 1, 0], [0, 0, 0]]
+
+    def test_empirical_p_values(self):
+        null = EnsembleMatrix.fromSummaries(NULL)
+        pValues = dict(zip(self.ensemble.nodes,
+                           self.ensemble.empiricalPValues(null)))
+        # Binomial tails of the real counts out of 4 runs, at null rates
+        # (1 + null count) / 4
+        expected = {'A': 5 / 16.0, 'B': 13 / 256.0, 'C': 5 / 16.0,
+                    'D': 255 / 256.0, 'E': 255 / 256.0}
+        assert sorted(pValues) == sorted(expected)
+        for node in expected:
+            assert np.isclose(pValues[node], expected[node])
+
+    def test_empirical_p_values_compare_ensembles(self):
+        # A in half of the runs of both ensembles, B in every real run but
+        # rarely in the null runs, C in one real run and no null run
+        real = EnsembleMatrix.fromSummaries(
+            [record(0, [['B', 'C']], ['B'])]
+            + [record(i, [['A', 'B']] if i % 2 else [['B', 'F']], ['B'])
+               for i in range(1, 100)])
+        null = EnsembleMatrix.fromSummaries(
+            [record(i, [['A', 'D']] if i % 2 else [['D', 'E']], ['D'])
+             for i in range(100)])
+        pValues = dict(zip(real.nodes, real.empiricalPValues(null)))
+        assert pValues['A'] > 0.3
+        assert pValues['B'] < 1e-100
+        assert pValues['C'] > 0.5
@@ -0,0 +1,77 @@
+'''
+Test that EnsembleMerger gives the same results as chaining mergeOutputs
+'''
+
+import os, sys
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_ensemble_merger.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFInput, PCSFOutput, EnsembleMerger, \
+    mergeOutputs
+
+cur_dir = os.path.dirname(__file__)
+test_dir = os.path.join(cur_dir, 'small_forest_tests')
+
+# msgsteiner output of three runs on the beta/mu test network, one
+# "child parent" edge per line
+RUNS = [
+    'B A\nC A\nA DUMMY\n',
+    'B A\nD A\nA DUMMY\nE DUMMY\n',
+    'C B\nB DUMMY\nD DUMMY\n',
+]
+
+class TestEnsembleMerger:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files):
+        self.tmpdir = forest_files.tmpdir
+        self.inputObj = PCSFInput(
+            os.path.join(test_dir, 'beta_mu_test_prizes.txt'),
+            os.path.join(test_dir, 'beta_mu_test_network.txt'),
+            forest_files.conf_file, 'terminals', [], None, 0, False, False)
+        self.outputs = [PCSFOutput(self.inputObj, edges, '', self.tmpdir,
+                                   'run%d' % i, 0)
+                        for i, edges in enumerate(RUNS)]
+
+    def test_matches_merge_outputs(self):
+        chained = mergeOutputs(self.outputs[0], self.outputs[1], 0, 1, 1)
+        chained = mergeOutputs(chained, self.outputs[2], 1, 2, 1)
+
+        merger = EnsembleMerger(self.inputObj)
+        for output in self.outputs:
+            merger.add(output.summary())
+        merged = merger.merged()
+
+        for graph in ('optForest', 'augForest', 'dumForest'):
+            expected = getattr(chained, graph)
+            actual = getattr(merged, graph)
+            assert sorted(expected.edges()) == sorted(actual.edges())
+        for node1, node2, data in chained.augForest.edges(data=True):
+            actual = merged.augForest[node1][node2]
+            assert actual['weight'] == data['weight']
+            assert abs(actual['fracOptContaining'] - data['fracOptContaining']) < 1e-12
+        for node, data in chained.augForest.nodes(data=True):
+            actual = merged.augForest.nodes[node]
+            assert actual['prize'] == data['prize']
+            assert actual['TerminalType'] == data['TerminalType']
+            assert abs(actual['fracOptContaining'] - data['fracOptContaining']) < 1e-12
+            assert abs(actual['betweenness'] - data['betweenness']) < 1e-12
+
+    def test_merge_outputs_shares_input(self):
+        merged = mergeOutputs(self.outputs[0], self.outputs[1], 0, 1, 1)
+        assert merged.inputObj is self.inputObj
+
+    def test_counts(self):
+        merger = EnsembleMerger(self.inputObj)
+        for output in self.outputs:
+            merger.addOutput(output)
+        assert merger.numRuns == 3
+        merged = merger.merged(betweenness=False)
+        assert merged.optForest.nodes['A']['fracOptContaining'] == 2 / 3.0
+        assert merged.optForest['A']['B']['fracOptContaining'] == 2 / 3.0
+        assert sorted(merged.dumForest.successors('DUMMY')) == ['A', 'B', 'D', 'E']
@@ -0,0 +1,104 @@
+'''
+Test the in-process Forest API with a stand-in for msgsteiner
+'''
+
+import os, sys
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_forest_api.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import ForestError, InputError, SolverError
+from OmicsIntegrator.forest_api import Forest
+
+FAILING_MSGSTEINER = '''
+import sys
+sys.stderr.write('fake msgsteiner failed\\n')
+sys.exit(3)
+'''
+
+def open_fds():
+    return len(os.listdir('/proc/self/fd'))
+
+class TestForestApi:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files, monkeypatch):
+        self.monkeypatch = monkeypatch
+        self.tmpdir = forest_files.tmpdir
+        self.msgsteiner = forest_files.msgsteiner
+        self.edge_file = forest_files.edge_file
+        self.prize_file = forest_files.prize_file
+        self.conf_file = forest_files.conf_file
+        self.forest = Forest(self.edge_file, self.conf_file, processes=1)
+        yield
+        self.forest.close()
+
+    def test_run(self):
+        result = self.forest.run(self.prize_file, seed=1)
+        assert result.ok
+        assert sorted(result.output.dumForest.edges()) == [('DUMMY', 'A'),
+                                                           ('DUMMY', 'C')]
+        assert sorted(result.summary()['roots']) == ['A', 'C']
+
+    def test_run_writes_files(self):
+        outdir = os.path.join(self.tmpdir, 'out')
+        os.mkdir(outdir)
+        self.forest.run(self.prize_file, outputpath=outdir, outputlabel='x')
+        assert os.path.exists(os.path.join(outdir, 'x_info.txt'))
+        assert os.path.exists(os.path.join(outdir, 'x_optimalForest.sif'))
+
+    def test_errors_raise(self):
+        with pytest.raises(InputError):
+            self.forest.run(os.path.join(self.tmpdir, 'missing.txt'))
+        with pytest.raises(InputError):
+            Forest(os.path.join(self.tmpdir, 'missing.txt'), self.conf_file)
+        os.remove(self.msgsteiner)
+        with pytest.raises(SolverError):
+            self.forest.run(self.prize_file)
+        assert issubclass(SolverError, ForestError)
+
+    @pytest.mark.skipif(not os.path.isdir('/proc/self/fd'),
+                        reason='Needs /proc to count open files')
+    @pytest.mark.parametrize('solver_body', [FAILING_MSGSTEINER])
+    def test_failed_runs_close_files(self):
+        with pytest.raises(SolverError):
+            self.forest.run(self.prize_file)
+        before = open_fds()
+        for i in range(5):
+            with pytest.raises(SolverError) as error:
+                self.forest.run(self.prize_file)
+            assert 'fake msgsteiner failed' in str(error.value)
+        assert open_fds() == before
+
+    def test_sweep(self):
+        jobs = [
+            dict(prizeFile=self.prize_file, parameters={'w': 2}),
+            dict(prizeFile=os.path.join(self.tmpdir, 'missing.txt')),
+            dict(prizeFile=self.prize_file, dummyMode='all'),
+        ]
+        results = list(self.forest.sweep(jobs))
+        assert [result.ok for result in results] == [True, False, True]
+        assert isinstance(results[1].error, InputError)
+        assert results[0].output.inputObj.w == 2
+        assert results[2].output.inputObj.w == 1
+        # The interactome is kept for later sweeps and runs
+        results = list(self.forest.sweep(jobs[:1]))
+        assert results[0].ok
+        assert self.forest.run(self.prize_file).ok
+
+    def test_sweep_longest_first(self):
+        log = os.path.join(self.tmpdir, 'depths.txt')
+        self.monkeypatch.setenv('FAKE_MSGSTEINER_LOG', log)
+        jobs = [dict(prizeFile=self.prize_file, parameters={'D': D})
+                for D in (2, 8, 4)]
+        results = list(self.forest.sweep(jobs))
+        # The deepest runs are predicted to take longest and start first,
+        # the results keep the order of the jobs
+        with open(log) as f:
+            assert f.read().split() == ['8', '4', '2']
+        assert [result.output.inputObj.D for result in results] == [2, 8, 4]
+        assert len(self.forest.runtimes.times) == 3
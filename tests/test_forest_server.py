@@ -0,0 +1,139 @@
+'''
+Test running jobs on a Forest server with a stand-in for msgsteiner
+'''
+
+import os, sys, time, threading
+import pytest
+
+# Create the path to OmicsIntegrator and scripts relative to the
+# test_forest_server.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+scripts = os.path.join(path, 'scripts')
+if not scripts in sys.path:
+    sys.path.insert(1, scripts)
+del path, scripts
+
+from OmicsIntegrator.forest import PCSFInput
+from OmicsIntegrator.forest_server import ForestServer, submitJob
+from forest import buildParser, checkOptions
+
+# Connects every node with a prize to the dummy node, and logs its depth
+# with the times it started and finished
+TIMED_MSGSTEINER = '''
+import os, sys, time
+start = time.time()
+time.sleep(float(os.environ['SLEEP']))
+for line in sys.stdin:
+    parts = line.split()
+    if parts and parts[0] == 'W' and parts[1] != 'DUMMY':
+        sys.stdout.write('%s DUMMY\\n' % parts[1])
+with open(os.environ['FAKE_MSGSTEINER_LOG'], 'a') as log:
+    log.write('%s %f %f\\n' % (sys.argv[sys.argv.index('-d') + 1], start,
+                               time.time()))
+'''
+
+FORESTS = ['augmentedForest.sif', 'dummyForest.sif', 'edgeattributes.tsv',
+           'nodeattributes.tsv', 'optimalForest.sif']
+
+def parseOptions(args):
+    '''Parses the options of a job as scripts/forest_server.py does'''
+    parser = buildParser()
+    parser.set_defaults(confFile=None)
+    options = parser.parse_args(args)
+    return (options, checkOptions(options))
+
+class TestForestServer:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files, monkeypatch):
+        self.files = forest_files
+        self.outdir = os.path.join(forest_files.tmpdir, 'out')
+        os.mkdir(self.outdir)
+        # Every msgsteiner run takes long enough for jobs to overlap. Set
+        # before the workers of the server are forked.
+        monkeypatch.setenv('SLEEP', '0.3')
+        self.log = os.path.join(forest_files.tmpdir, 'depths.txt')
+        monkeypatch.setenv('FAKE_MSGSTEINER_LOG', self.log)
+        interactome = PCSFInput.interactome(forest_files.edge_file,
+                                            forest_files.conf_file)
+        self.server = ForestServer({'network': interactome}, parseOptions, 2)
+        self.address = os.path.join(forest_files.tmpdir, 'server.sock')
+        thread = threading.Thread(target=self.server.serve,
+                                  args=(self.address,))
+        thread.daemon = True
+        thread.start()
+        # Set once the server listens
+        while self.server.server is None:
+            time.sleep(0.01)
+        yield
+        self.server.shutdown()
+        thread.join()
+
+    def job_args(self, label):
+        return ['--prize', self.files.prize_file, '--outpath', self.outdir,
+                '--outlabel', label, '--seed', '2', '--noisyEdges', '2']
+
+    def expected_files(self, label):
+        expected = ['%s_info.txt' % label,
+                    '%s_noisyEdges_ensemble.txt' % label,
+                    '%s_noisyEdges_runs.jsonl' % label]
+        expected += ['%s_%s' % (label, name) for name in FORESTS]
+        for i in (0, 1):
+            run = 'noisyEdges_%i' % i
+            expected.append('%s_%s_info.txt' % (label, run))
+            expected += [os.path.join(run, '%s_%s' % (run, name))
+                         for name in FORESTS]
+        return sorted(os.path.join(self.outdir, name) for name in expected)
+
+    @pytest.mark.parametrize('solver_body', [TIMED_MSGSTEINER])
+    def test_same_outpath(self):
+        # The second job runs msgsteiner with another depth, so the log of
+        # the fake msgsteiner tells the runs of the jobs apart
+        conf_file = os.path.join(self.files.tmpdir, 'conf6.txt')
+        with open(conf_file, 'w') as f:
+            f.write('w = 1\nb = 1\nD = 6\n')
+        args = {'first': self.job_args('first'),
+                'second': self.job_args('second') + ['--conf', conf_file]}
+        replies = {}
+
+        def submit(label):
+            replies[label] = list(submitJob(self.address, args[label]))
+        threads = [threading.Thread(target=submit, args=(label,))
+                   for label in ('first', 'second')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for label in ('first', 'second'):
+            assert [reply['status'] for reply in replies[label]] == \
+                ['queued', 'running', 'done']
+            done = replies[label][-1]
+            assert done['outputpath'] == self.outdir
+            # Only the files of the job, although both wrote the files of
+            # their runs to the same directories
+            assert done['files'] == self.expected_files(label)
+        # The jobs ran one after the other
+        runs = {}
+        with open(self.log) as f:
+            for line in f:
+                (depth, start, end) = line.split()
+                runs.setdefault(depth, []).append((float(start), float(end)))
+        assert sorted((depth, len(times)) for (depth, times) in runs.items()) \
+            == [('5', 3), ('6', 3)]
+        (first, second) = sorted(runs.values())
+        assert max(end for (start, end) in first) < \
+            min(start for (start, end) in second)
+        # The lock of the directory is dropped once no job needs it
+        assert self.server.outputLocks.locks == {}
+
+    def test_failed_job(self):
+        args = self.job_args('job') + ['--edge', self.files.edge_file]
+        replies = list(submitJob(self.address, args))
+        assert [reply['status'] for reply in replies] == ['queued', 'failed']
+        assert '--edge' in replies[-1]['error']
+        # The server goes on with the next job
+        replies = list(submitJob(self.address, self.job_args('job')))
+        assert replies[-1]['status'] == 'done'
+        assert replies[-1]['files'] == self.expected_files('job')
@@ -26,7 +26,7 @@ def write_valid_graph(tmpf):
 class TestLoadGraph:
     
     def test_valid_graph(self):
-        sifFilename= tempfile.NamedTemporaryFile(suffix='.sif', delete=False)
+        sifFilename= tempfile.NamedTemporaryFile(mode='w', suffix='.sif', delete=False)
         try:
             # Write the network file
             write_valid_graph(sifFilename)
@@ -53,7 +53,7 @@ class TestLoadGraph:
         os.remove(sifFilename.name)
 
     def test_invalid_edge_type(self):
-        sifFilename= tempfile.NamedTemporaryFile(suffix='.sif', delete=False)
+        sifFilename= tempfile.NamedTemporaryFile(mode='w', suffix='.sif', delete=False)
         try:
             # Write the network file
             write_valid_graph(sifFilename)
@@ -70,7 +70,7 @@ class TestLoadGraph:
         os.remove(sifFilename.name)
 
     def test_invalid_columns(self):
-        sifFilename= tempfile.NamedTemporaryFile(suffix='.sif', delete=False)
+        sifFilename= tempfile.NamedTemporaryFile(mode='w', suffix='.sif', delete=False)
         try:
             # Write the network file
             write_valid_graph(sifFilename)
@@ -0,0 +1,82 @@
+'''
+Test loading Forest output directories with forest_util
+'''
+
+import os, sys
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_load_output.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFOutput, mergeOutputs
+from OmicsIntegrator.forest_util import loadOutput, loadOutputs, \
+    loadSummary, loadEnsemble
+
+def read(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+class TestLoadOutput:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files, output_input):
+        self.tmpdir = forest_files.tmpdir
+        # msgsteiner output, one "child parent" edge per line
+        self.dirs = []
+        self.outputs = []
+        for (i, edges) in enumerate(['B A\nC B\nD A\nA DUMMY\n',
+                                     'D A\nA DUMMY\nC DUMMY\n']):
+            outdir = os.path.join(self.tmpdir, 'run%i' % i)
+            os.mkdir(outdir)
+            output = PCSFOutput(output_input, edges, '', outdir, 'result', 0)
+            output.writeCytoFiles(outdir, 'result', True, i == 1)
+            self.dirs.append(outdir)
+            self.outputs.append(output)
+
+    def test_round_trip(self):
+        loaded = loadOutput(self.dirs[0])
+        output = self.outputs[0]
+        assert sorted(loaded.optForest.edges()) == \
+            sorted(output.optForest.edges())
+        assert sorted(loaded.augForest.edges()) == \
+            sorted(output.augForest.edges())
+        assert loaded.augForest['C']['D']['fracOptContaining'] == 0.0
+        assert loaded.augForest.nodes['D']['prize'] == \
+            output.augForest.nodes['D']['prize']
+        # The info file has the objective function terms to 6 decimals
+        for key in output.objective:
+            assert abs(loaded.objective[key] - output.objective[key]) < 1e-6
+        assert loaded.inputObj.dirEdges == {'A': {'D': 0.7}}
+
+        # Writing the loaded output gives the same files
+        outdir = os.path.join(self.tmpdir, 'copy')
+        os.mkdir(outdir)
+        loaded.writeCytoFiles(outdir, 'result', True)
+        for name in ['optimalForest.sif', 'augmentedForest.sif',
+                     'dummyForest.sif', 'edgeattributes.tsv']:
+            assert read(os.path.join(outdir, 'result_' + name)) == \
+                read(os.path.join(self.dirs[0], 'result_' + name))
+
+    def test_gzip(self):
+        loaded = loadOutput(self.dirs[1])
+        assert sorted(loaded.optForest.edges()) == [('A', 'D')]
+        assert sorted(loaded.dumForest.edges()) == [('DUMMY', 'A'),
+                                                    ('DUMMY', 'C')]
+        summary = loadSummary(self.dirs[1])
+        assert sorted(summary['roots']) == ['A', 'C']
+
+    def test_merge_loaded(self):
+        (first, second) = loadOutputs(self.dirs, processes=1)
+        assert first.inputObj is second.inputObj
+        merged = mergeOutputs(first, second, False, 1, 1)
+        assert merged.optForest.nodes['B']['fracOptContaining'] == 0.5
+        assert merged.optForest.nodes['D']['fracOptContaining'] == 1.0
+
+    def test_ensemble(self):
+        ensemble = loadEnsemble(self.dirs, processes=2)
+        assert ensemble.numRuns == 2
+        frequencies = dict(zip(ensemble.nodes, ensemble.nodeFrequencies()))
+        assert frequencies == {'A': 1.0, 'B': 0.5, 'C': 0.5, 'D': 1.0}
@@ -0,0 +1,59 @@
+'''
+Test the cached node degrees and the negative prizes computed from them
+'''
+
+import os, sys
+import networkx as nx
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_negative_prizes.py
+# path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFInput, PCSFInputOverlay, score
+
+cur_dir = os.path.dirname(__file__)
+test_dir = os.path.join(cur_dir, 'small_forest_tests')
+
+class TestNegativePrizes:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        conf = tmp_path / 'conf.txt'
+        conf.write_text('w = 1\nb = 1\nD = 5\nmu = 0.3\n')
+        self.inputObj = PCSFInput(
+            os.path.join(test_dir, 'beta_mu_test_prizes.txt'),
+            os.path.join(test_dir, 'beta_mu_test_network.txt'), str(conf),
+            'terminals', [], None, 0, False, False)
+        self.G = nx.Graph()
+        for edges in (self.inputObj.dirEdges, self.inputObj.undirEdges):
+            for protA in edges:
+                for protB in edges[protA]:
+                    self.G.add_edge(protA, protB)
+
+    def test_degrees(self):
+        (nodes, degrees, position) = self.inputObj.nodeDegrees()
+        assert nodes == list(self.G.nodes())
+        assert degrees.tolist() == [self.G.degree(node) for node in nodes]
+        assert [position[node] for node in nodes] == list(range(len(nodes)))
+
+    def test_overlay_shares_degrees(self):
+        overlay = PCSFInputOverlay(self.inputObj, {'B': 2.0})
+        assert overlay.nodeDegrees() is self.inputObj.nodeDegrees()
+
+    @pytest.mark.parametrize('musquared', [False, True])
+    def test_negative_prizes(self, musquared):
+        overlay = PCSFInputOverlay(self.inputObj, {'B': 2.0})
+        overlay.assignNegPrizes(musquared, False)
+        for node in self.G.nodes():
+            neg = score(self.G.degree(node), 0.3, musquared)
+            if node == 'B':
+                assert overlay.totalPrizes[node] == 2.0 + neg
+            elif neg == 0:
+                assert node not in overlay.totalPrizes
+            else:
+                assert overlay.negPrizes[node] == neg
+                assert overlay.totalPrizes[node] == neg
@@ -0,0 +1,42 @@
+'''
+Test the order of the interactome nodes and of the dummy node neighbors
+'''
+
+import os, sys
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_node_order.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFInput
+
+class TestNodeOrder:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        network = tmp_path / 'network.txt'
+        network.write_text('C\tA\t0.5\tU\nA\tB\t0.6\tD\nB\tC\t0.7\tU\n'
+                           'A\tC\t0.8\tU\nD\tB\t0.4\tD\n')
+        self.prizes = tmp_path / 'prizes.txt'
+        self.prizes.write_text('B\t1\n')
+        conf = tmp_path / 'conf.txt'
+        conf.write_text('w = 1\nb = 1\nD = 5\nmu = 0\n')
+        self.interactome = PCSFInput.interactome(str(network), str(conf))
+
+    def test_interactome_nodes(self):
+        # Nodes in the order they are first seen in the edges
+        assert self.interactome.interactomeNodes == ['C', 'A', 'B', 'D']
+
+    def test_dummy_mode_all(self):
+        inputObj = self.interactome.withPrizes(str(self.prizes),
+                                               dummyMode='all')
+        assert inputObj.dummyNodeNeighbors == ['C', 'A', 'B', 'D']
+
+    def test_dummy_mode_others(self):
+        # Neighbors before their node, undirected edges first
+        inputObj = self.interactome.withPrizes(str(self.prizes),
+                                               dummyMode='others')
+        assert inputObj.dummyNodeNeighbors == ['A', 'C', 'D']
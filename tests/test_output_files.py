@@ -0,0 +1,85 @@
+'''
+Test the output files written for Cytoscape and in the other formats
+'''
+
+import os, sys, gzip, json
+import networkx as nx
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_output_files.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFOutput
+
+def read(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+class TestOutputFiles:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files, output_input):
+        self.tmpdir = forest_files.tmpdir
+        # msgsteiner output, one "child parent" edge per line
+        self.output = PCSFOutput(output_input, 'B A\nC B\nD A\nA DUMMY\n',
+                                 '', self.tmpdir, 'run', 0)
+        self.prefix = os.path.join(self.tmpdir, 'result')
+
+    def test_cyto30(self):
+        self.output.writeCytoFiles(self.tmpdir, 'result', True)
+        # Undirected interactions are written once, C pp D is only in the
+        # augmented forest
+        assert read(self.prefix + '_augmentedForest.sif') == [
+            'A\tpp\tB', 'A\tpd\tD', 'B\tpp\tC', 'C\tpp\tD']
+        assert read(self.prefix + '_optimalForest.sif') == [
+            'A\tpp\tB', 'A\tpd\tD', 'B\tpp\tC']
+        assert read(self.prefix + '_dummyForest.sif') == [
+            'A\tpp\tB', 'A\tpd\tD', 'B\tpp\tC', 'DUMMY\tpd\tA']
+        edges = read(self.prefix + '_edgeattributes.tsv')
+        assert edges[0] == 'Edge\tWeight\tFractionOfOptimalForestsContaining'
+        assert edges[1:] == ['A (pp) B\t0.5\t1.0', 'A (pd) D\t0.7\t1.0',
+                             'B (pp) C\t0.6\t1.0', 'C (pp) D\t0.8\t0.0']
+        nodes = read(self.prefix + '_nodeattributes.tsv')
+        assert [line.split('\t')[0] for line in nodes] == [
+            'Protein', 'A', 'B', 'C', 'D']
+
+    def test_cyto28(self):
+        self.output.writeCytoFiles(self.tmpdir, 'result', False)
+        assert read(self.prefix + '_weights.eda') == [
+            'Weight (class=Double)', 'A (pp) B = 0.5', 'A (pd) D = 0.7',
+            'B (pp) C = 0.6', 'C (pp) D = 0.8']
+        assert read(self.prefix + '_fracOptContaining.noa')[1] == 'A = 1.0'
+        assert read(self.prefix + '_dummyForest.sif')[-1] == 'DUMMY\tpd\tA'
+
+    def test_gzip(self):
+        self.output.writeCytoFiles(self.tmpdir, 'plain', True)
+        self.output.writeCytoFiles(self.tmpdir, 'result', True, True)
+        with gzip.open(self.prefix + '_augmentedForest.sif.gz', 'rt') as f:
+            assert f.read().splitlines() == read(
+                os.path.join(self.tmpdir, 'plain_augmentedForest.sif'))
+        assert not os.path.exists(self.prefix + '_augmentedForest.sif')
+
+    def test_graph_formats(self):
+        self.output.writeFiles(self.tmpdir, 'result', True,
+                               ['graphml', 'json', 'tsv'])
+        assert not os.path.exists(self.prefix + '_augmentedForest.sif')
+
+        graph = nx.read_graphml(self.prefix + '_augmentedForest.graphml')
+        assert sorted(graph.edges()) == [('A', 'B'), ('A', 'D'), ('B', 'C'),
+                                         ('C', 'D')]
+        assert graph['A']['D']['interaction'] == 'pd'
+        assert graph.nodes['A']['root']
+
+        with open(self.prefix + '_augmentedForest.json') as f:
+            data = json.load(f)
+        assert len(data['nodes']) == 4
+        assert {'source': 'C', 'target': 'D', 'interaction': 'pp',
+                'weight': 0.8, 'fracOptContaining': 0.0} in data['edges']
+
+        assert read(self.prefix + '_edges.tsv')[1:] == [
+            'A\tpp\tB\t0.5\t1.0', 'A\tpd\tD\t0.7\t1.0', 'B\tpp\tC\t0.6\t1.0',
+            'C\tpp\tD\t0.8\t0.0']
+        assert read(self.prefix + '_nodes.tsv')[1].endswith('\tTrue')
@@ -0,0 +1,128 @@
+'''
+Test the copy-on-write prize overlays used for shuffled prizes, random
+terminals and cross validation
+'''
+
+import os, sys, pickle, tempfile
+
+# Create the path to OmicsIntegrator relative to the test_prize_overlay.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFInput, PCSFInputOverlay, shufflePrizes, \
+    noiseEdges, shareInputs
+
+cur_dir = os.path.dirname(__file__)
+test_dir = os.path.join(cur_dir, 'small_forest_tests')
+
+def build_input(mu=0.1, interactome=False):
+    '''Build a PCSFInput object from the beta/mu test network, or only
+    its interactome if interactome is True'''
+    conf = tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False)
+    try:
+        conf.write('w = 1\nb = 1\nD = 5\nmu = %f\n' % mu)
+    finally:
+        conf.close()
+    network = os.path.join(test_dir, 'beta_mu_test_network.txt')
+    try:
+        if interactome:
+            inputObj = PCSFInput.interactome(network, conf.name)
+        else:
+            inputObj = PCSFInput(
+                os.path.join(test_dir, 'beta_mu_test_prizes.txt'), network,
+                conf.name, 'terminals', [], None, 0, False, False)
+    finally:
+        os.remove(conf.name)
+    return inputObj
+
+class TestPrizeOverlay:
+
+    def test_shares_interactome(self):
+        inputObj = build_input()
+        overlay = PCSFInputOverlay(inputObj, {'B': 2.0})
+
+        # Edges and parameters come from the base object without copies
+        assert overlay.dirEdges is inputObj.dirEdges
+        assert overlay.undirEdges is inputObj.undirEdges
+        assert overlay.w == inputObj.w
+
+        # Prizes are recomputed for the overlay only
+        assert overlay.origPrizes == {'B': 2.0}
+        assert 'A' not in overlay.origPrizes
+        assert 'A' in inputObj.origPrizes
+        # B is connected to A and C
+        assert overlay.totalPrizes['B'] == 2.0 - 2 * inputObj.mu
+
+    def test_explicit_prizes(self):
+        inputObj = build_input()
+        totalPrizes = dict(inputObj.totalPrizes)
+        totalPrizes['A'] = inputObj.negPrizes['A']
+        overlay = PCSFInputOverlay(inputObj, {'B': 6.0}, inputObj.negPrizes,
+                                   totalPrizes)
+        assert overlay.totalPrizes is totalPrizes
+        assert overlay.negPrizes is inputObj.negPrizes
+
+    def test_overlays_do_not_stack(self):
+        inputObj = build_input()
+        overlay = PCSFInputOverlay(inputObj, {'B': 2.0})
+        overlay2 = PCSFInputOverlay(overlay, {'C': 2.0})
+        assert overlay2.base is inputObj
+
+    def test_pickle(self):
+        inputObj = build_input()
+        overlay = pickle.loads(pickle.dumps(PCSFInputOverlay(inputObj, {'B': 2.0})))
+        assert overlay.origPrizes == {'B': 2.0}
+        assert overlay.dirEdges == inputObj.dirEdges
+
+    def test_shuffle(self):
+        inputObj = build_input()
+        shuffled = shufflePrizes(inputObj, 2016, False)
+        assert isinstance(shuffled, PCSFInputOverlay)
+        assert sorted(shuffled.origPrizes.values()) == \
+            sorted(inputObj.origPrizes.values())
+        assert shuffled.dirEdges is inputObj.dirEdges
+
+    def test_with_prizes(self):
+        inputObj = build_input()
+        interactome = build_input(interactome=True)
+        assert interactome.origPrizes == {}
+        overlay = interactome.withPrizes(
+            os.path.join(test_dir, 'beta_mu_test_prizes.txt'))
+        assert overlay.base is interactome
+        assert overlay.origPrizes == inputObj.origPrizes
+        assert overlay.totalPrizes == inputObj.totalPrizes
+        assert overlay.dummyNodeNeighbors == inputObj.dummyNodeNeighbors
+
+    def test_stacked_overlay_keeps_parameters(self):
+        interactome = build_input(interactome=True)
+        overlay = interactome.withPrizes(
+            os.path.join(test_dir, 'beta_mu_test_prizes.txt'), 'all',
+            parameters={'w': 3})
+        shuffled = shufflePrizes(overlay, 2016, False)
+        assert shuffled.base is interactome
+        assert shuffled.w == 3.0 and interactome.w == 1.0
+        assert shuffled.dummyNodeNeighbors == overlay.dummyNodeNeighbors
+
+    def test_shared_pickle(self):
+        interactome = build_input(interactome=True)
+        shareInputs({'test': interactome})
+        overlay = interactome.withPrizes(
+            os.path.join(test_dir, 'beta_mu_test_prizes.txt')).share('test')
+        data = pickle.dumps(overlay)
+        assert len(data) < len(pickle.dumps(interactome))
+        overlay = pickle.loads(data)
+        assert overlay.base is interactome
+        assert overlay.origPrizes == {'A': 5.0, 'B': 6.0, 'C': 6.0,
+                                      'D': 6.0, 'E': 6.0}
+
+    def test_noise_keeps_base(self):
+        inputObj = build_input()
+        edges = dict((node, dict(neighbors)) for (node, neighbors)
+                     in inputObj.dirEdges.items())
+        overlay = PCSFInputOverlay(inputObj, {'B': 2.0})
+        noisy = noiseEdges(overlay, 2016, False)
+        assert inputObj.dirEdges == edges
+        assert noisy.dirEdges != edges
+        assert noisy.origPrizes == {'B': 2.0}
@@ -0,0 +1,70 @@
+'''
+Test the profiles of the parent and the pool workers of forest_profile
+'''
+
+import os, sys, pstats, shutil, tempfile, cProfile
+import multiprocessing as mp
+
+# Create the path to OmicsIntegrator relative to the test_profile.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest_profile import startProfiling, writeProfiles, \
+    profiledTask, collapsedStacks
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+@profiledTask
+def square_sums(n):
+    return busy(n) + busy(2 * n)
+
+class TestProfile:
+
+    def setup_method(self, method):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.tmpdir)
+
+    def test_disabled(self):
+        assert square_sums(10) == busy(10) + busy(20)
+        writeProfiles()
+        assert os.listdir(self.tmpdir) == []
+
+    def test_workers(self):
+        startProfiling(self.tmpdir, 'result')
+        pool = mp.Pool(2)
+        assert pool.map(square_sums, [1000] * 4) == [busy(1000) +
+                                                     busy(2000)] * 4
+        pool.close()
+        pool.join()
+        writeProfiles(stacks=True)
+        assert sorted(os.listdir(self.tmpdir)) == [
+            'result_profile_parent.collapsed', 'result_profile_parent.pstats',
+            'result_profile_workers.collapsed',
+            'result_profile_workers.pstats']
+        workers = pstats.Stats(os.path.join(self.tmpdir,
+                                            'result_profile_workers.pstats'))
+        calls = dict((name, entry[1]) for ((filename, line, name), entry)
+                     in workers.stats.items())
+        # The tasks of both workers are merged
+        assert calls['square_sums'] == 4
+        assert calls['busy'] == 8
+
+    def test_collapsed_stacks(self):
+        profiler = cProfile.Profile()
+        profiler.runcall(square_sums, 100000)
+        stats = pstats.Stats(profiler)
+        lines = collapsedStacks(stats)
+        stacks = dict((line.rsplit(' ', 1)[0], int(line.rsplit(' ', 1)[1]))
+                      for line in lines)
+        busy_stacks = [stack for stack in stacks
+                       if stack.split(';')[-1].startswith('busy ')]
+        assert len(busy_stacks) == 1
+        assert busy_stacks[0].split(';')[-2].startswith('square_sums ')
+        # The stacks add up to the time of the profile
+        total = sum(entry[2] for entry in stats.stats.values())
+        assert abs(sum(stacks.values()) - total * 1e6) <= 0.05 * total * 1e6
@@ -0,0 +1,74 @@
+'''
+Test the degree index and the degree-matched random terminal sampling
+'''
+
+import os, sys, random, shutil, tempfile
+
+# Create the path to OmicsIntegrator relative to the test_random_terminals.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFInput, randomTerminals
+
+def build_input(tmpdir):
+    '''Write a random 200 node network with 20 prizes and load it'''
+    rng = random.Random(7)
+    edge_file = os.path.join(tmpdir, 'network.txt')
+    with open(edge_file, 'w') as f:
+        for i in range(1, 200):
+            # Preferential attachment gives a wide range of degrees
+            for j in set(rng.randint(0, i - 1) for _ in range(rng.randint(1, 3))):
+                f.write('N%d\tN%d\t0.5\n' % (i, j))
+    prize_file = os.path.join(tmpdir, 'prizes.txt')
+    with open(prize_file, 'w') as f:
+        for i in range(0, 200, 10):
+            f.write('N%d\t%d\n' % (i, i + 1))
+    conf_file = os.path.join(tmpdir, 'conf.txt')
+    with open(conf_file, 'w') as f:
+        f.write('w = 1\nb = 1\nD = 5\n')
+    return PCSFInput(prize_file, edge_file, conf_file, 'terminals', [], None,
+                     0, False, False)
+
+class TestRandomTerminals:
+
+    def setup_method(self, method):
+        self.tmpdir = tempfile.mkdtemp()
+        self.inputObj = build_input(self.tmpdir)
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.tmpdir)
+
+    def test_degree_index(self):
+        nodes, degrees, bucketStart, bucketEnd, rank = self.inputObj.degreeIndex()
+        assert len(nodes) == 200
+        assert all(degrees[i] <= degrees[i + 1] for i in range(len(nodes) - 1))
+        for i, node in enumerate(nodes):
+            assert rank[node] == i
+            assert degrees[i] == len(self.inputObj.undirEdges[node])
+            # Every position in a bucket has the same degree and the buckets
+            # are maximal
+            assert all(degrees[bucketStart[i]:bucketEnd[i]] == degrees[i])
+            assert bucketStart[i] == 0 or degrees[bucketStart[i] - 1] < degrees[i]
+            assert bucketEnd[i] == 200 or degrees[bucketEnd[i]] > degrees[i]
+
+        # The index is built once and reused
+        assert self.inputObj.degreeIndex() is self.inputObj.degreeIndex()
+
+    def test_random_terminals(self):
+        newInput = randomTerminals(self.inputObj, 2016, False)
+        origPrizes = self.inputObj.origPrizes
+        # Same number of distinct terminals with the same prize values
+        assert len(newInput.origPrizes) == len(origPrizes)
+        assert sorted(newInput.origPrizes.values()) == sorted(origPrizes.values())
+        assert all(node in self.inputObj.undirEdges for node in newInput.origPrizes)
+        # Original input is unchanged and shares its index with the overlay
+        assert newInput.degreeIndex() is self.inputObj.degreeIndex()
+
+    def test_seed(self):
+        newInput1 = randomTerminals(self.inputObj, 2016, False)
+        newInput2 = randomTerminals(self.inputObj, 2016, False)
+        newInput3 = randomTerminals(self.inputObj, 2017, False)
+        assert newInput1.origPrizes == newInput2.origPrizes
+        assert newInput1.origPrizes != newInput3.origPrizes
@@ -0,0 +1,68 @@
+'''
+Test the run manifests used to resume and extend ensembles
+'''
+
+import os, sys, shutil, tempfile, pytest
+
+# Create the path to OmicsIntegrator relative to the test_run_manifest.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import RunManifest, InputError
+
+HEADER = {'run_type': 'noisyEdges', 'seed': 1, 'params': {'w': 1.0}}
+
+def record(run):
+    return {'run': run, 'seed': 1 + run, 'nodes': ['A'], 'edges': [],
+            'roots': ['A'], 'objective': {'total': 1.0}}
+
+class TestRunManifest:
+
+    def setup_method(self, method):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'result_noisyEdges_runs.jsonl')
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.tmpdir)
+
+    def write_runs(self, runs):
+        manifest = RunManifest(self.path, HEADER)
+        manifest.open({})
+        for run in runs:
+            manifest.append(record(run))
+        manifest.close()
+
+    def test_missing(self):
+        assert RunManifest(self.path, HEADER).load(10) == {}
+
+    def test_round_trip(self):
+        self.write_runs([0, 2, 1])
+        records = RunManifest(self.path, HEADER).load(10)
+        assert sorted(records) == [0, 1, 2]
+        assert records[2] == record(2)
+
+    def test_fewer_runs(self):
+        self.write_runs(range(5))
+        assert sorted(RunManifest(self.path, HEADER).load(3)) == [0, 1, 2]
+
+    def test_incomplete_line(self):
+        self.write_runs(range(3))
+        with open(self.path, 'a') as f:
+            f.write('{"run": 3, "see')
+        manifest = RunManifest(self.path, HEADER)
+        records = manifest.load(10)
+        assert sorted(records) == [0, 1, 2]
+
+        # Reopening drops the incomplete line so new runs can be appended
+        manifest.open(records)
+        manifest.append(record(3))
+        manifest.close()
+        assert sorted(RunManifest(self.path, HEADER).load(10)) == [0, 1, 2, 3]
+
+    def test_different_header(self):
+        self.write_runs(range(3))
+        header = dict(HEADER, seed=2)
+        with pytest.raises(InputError):
+            RunManifest(self.path, header).load(10)
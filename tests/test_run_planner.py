@@ -0,0 +1,138 @@
+'''
+Test planning and executing the runs of a Forest job with a stand-in for
+msgsteiner
+'''
+
+import os, sys
+import pytest
+
+# Create the path to OmicsIntegrator and scripts relative to the
+# test_run_planner.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+scripts = os.path.join(path, 'scripts')
+if not scripts in sys.path:
+    sys.path.insert(1, scripts)
+del path, scripts
+
+from OmicsIntegrator import forest_runner
+from OmicsIntegrator.forest import PCSFInput, SolverError, OutputError
+from OmicsIntegrator.forest_runner import RunPlanner, planRuns
+from forest import buildParser
+
+FAILING_MSGSTEINER = '''
+import sys
+sys.stderr.write('fake msgsteiner failed\\n')
+sys.exit(3)
+'''
+
+class PoolSpy(object):
+    '''A pool recording how it is shut down'''
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.calls = []
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
+
+    def close(self):
+        self.calls.append('close')
+        self.pool.close()
+
+    def terminate(self):
+        self.calls.append('terminate')
+        self.pool.terminate()
+
+    def join(self):
+        self.calls.append('join')
+        self.pool.join()
+
+class TestRunPlanner:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files, monkeypatch):
+        self.files = forest_files
+        self.outdir = os.path.join(forest_files.tmpdir, 'out')
+        os.mkdir(self.outdir)
+        self.inputObj = PCSFInput(
+            forest_files.prize_file, forest_files.edge_file,
+            forest_files.conf_file, 'terminals', [], None, 2, False, False)
+        self.inputObj.processes = 2
+        self.pools = []
+        createPool = forest_runner.createPool
+
+        def spyPool(inputObj):
+            pool = PoolSpy(createPool(inputObj))
+            self.pools.append(pool)
+            return pool
+        monkeypatch.setattr(forest_runner, 'createPool', spyPool)
+
+    def files_written(self):
+        found = set()
+        for (root, dirs, names) in os.walk(self.outdir):
+            for name in names:
+                found.add(os.path.relpath(os.path.join(root, name),
+                                          self.outdir))
+        return found
+
+    def test_plan_runs(self):
+        options = buildParser().parse_args([
+            '--prize', self.files.prize_file, '--edge', self.files.edge_file,
+            '--conf', self.files.conf_file, '--outpath', self.outdir,
+            '--outlabel', 'job', '--seed', '2', '--noisyEdges', '2',
+            '--shuffledPrizes', '2', '--cv', '2', '--merge', 'True'])
+        files = planRuns(self.inputObj, options, ['cytoscape']).execute()
+        forests = ['augmentedForest.sif', 'dummyForest.sif',
+                   'edgeattributes.tsv', 'nodeattributes.tsv',
+                   'optimalForest.sif']
+        expected = set(['job_info.txt'] + ['job_' + name for name in forests])
+        for (run_type, merged) in [('noisyEdges', 'noisy'),
+                                   ('shufflePrizes', 'shuffled')]:
+            expected.update('job_%s_%s' % (merged, name) for name in forests)
+            expected.update(['job_%s_ensemble.txt' % run_type,
+                             'job_%s_runs.jsonl' % run_type])
+            for i in (0, 1):
+                run = '%s_%i' % (run_type, i)
+                expected.add('job_%s_info.txt' % run)
+                expected.update(os.path.join(run, '%s_%s' % (run, name))
+                                for name in forests)
+        expected.update(['job_cvIntermediate_rep1k0.txt',
+                         'job_cvIntermediate_rep1k1.txt',
+                         'job_cvResults_1.txt', 'job_cvSummary.txt'])
+        assert self.files_written() == expected
+        # The files of the runs are written by the workers after their tasks
+        # return, only their info files are listed
+        listed = set(os.path.relpath(path, self.outdir) for path in files)
+        assert listed == set(name for name in expected
+                             if name.endswith('.txt') or
+                             name.startswith(('job_noisy_', 'job_shuffled_'))
+                             or name.endswith('_runs.jsonl'))
+        # The fake msgsteiner connects the prizes to the dummy node
+        for label in ('job', 'job_noisy'):
+            path = os.path.join(self.outdir, label + '_dummyForest.sif')
+            with open(path) as f:
+                assert sorted(f.read().splitlines()) == ['DUMMY\tpd\tA',
+                                                         'DUMMY\tpd\tC']
+        assert [pool.calls for pool in self.pools] == [['close', 'join']]
+
+    @pytest.mark.parametrize('solver_body', [FAILING_MSGSTEINER])
+    def test_failed_step(self):
+        planner = RunPlanner(self.inputObj, 2, self.outdir, 'job', False)
+        planner.addMainRun()
+        planner.addEnsemble('noisyEdges', 2)
+        with pytest.raises(SolverError):
+            planner.execute()
+        assert [pool.calls for pool in self.pools] == [['terminate', 'join']]
+
+    def test_failed_writer(self):
+        planner = RunPlanner(self.inputObj, 2, self.outdir, 'job', False)
+        planner.addMainRun()
+        # The merged files go to a directory that does not exist
+        planner.addEnsemble('noisyEdges', 2, os.path.join('missing', 'job'))
+        with pytest.raises(OutputError):
+            planner.execute()
+        # The runs were done, only the background writes failed
+        assert [pool.calls for pool in self.pools] == [['close', 'join']]
+        assert 'job_optimalForest.sif' in self.files_written()
@@ -0,0 +1,109 @@
+'''
+Test the SQLite store for ensemble runs
+'''
+
+import os, sys, shutil, sqlite3, tempfile
+
+# Create the path to OmicsIntegrator relative to the test_run_store.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest_store import RunStore
+
+OBJECTIVE = {'total': 3.0, 'excludedPrizes': 1.0, 'edgeCosts': 1.5,
+             'trees': 0.5}
+
+def record(run, nodes, edges, roots):
+    return {'run': run, 'seed': 1 + run, 'elapsed': 2.0, 'nodes': nodes,
+            'edges': edges, 'roots': roots, 'objective': OBJECTIVE}
+
+RUNS = [
+    record(0, ['A', 'B', 'C'], [['A', 'B'], ['A', 'C']], ['A']),
+    # E is a root without edges, so it is not in the optimal forest
+    record(1, ['A', 'B', 'D'], [['A', 'B'], ['A', 'D']], ['A', 'E']),
+]
+
+class TestRunStore:
+
+    def setup_method(self, method):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'result_runs.sqlite')
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.tmpdir)
+
+    def query(self, sql):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_runs(self):
+        store = RunStore(self.path)
+        store.startEnsemble('noisyEdges', {'seed': 1})
+        for summary in RUNS:
+            store.addRun('noisyEdges', summary)
+        store.close()
+
+        assert self.query('SELECT run, seed, objective, trees FROM runs'
+                          ' ORDER BY run') == [(0, 1, 3.0, 0.5), (1, 2, 3.0, 0.5)]
+        # Node and edge names are stored once
+        assert self.query('SELECT count(*) FROM nodes') == [(5,)]
+        assert self.query('SELECT count(*) FROM edges') == [(3,)]
+        assert self.query(
+            'SELECT name, forest, root FROM run_nodes JOIN nodes USING'
+            ' (node_id) JOIN runs USING (run_id) WHERE run = 1 ORDER BY name'
+        ) == [('A', 1, 1), ('B', 1, 0), ('D', 1, 0), ('E', 0, 1)]
+        assert self.query(
+            'SELECT count(*) FROM run_edges JOIN edges USING (edge_id) JOIN'
+            ' nodes ON node_id = node2 WHERE name = "B"') == [(2,)]
+
+    def test_start_replaces_runs(self):
+        store = RunStore(self.path)
+        store.startEnsemble('noisyEdges', {'seed': 1}, RUNS)
+        store.startEnsemble('shufflePrizes', {'seed': 1}, RUNS[:1])
+        store.close()
+
+        # Reopening keeps the node ids and replaces the runs of one type
+        store = RunStore(self.path)
+        store.startEnsemble('noisyEdges', {'seed': 2}, RUNS[1:])
+        store.close()
+        assert self.query('SELECT run_type, run FROM runs ORDER BY run_type'
+                          ) == [('noisyEdges', 1), ('shufflePrizes', 0)]
+        assert self.query('SELECT count(*) FROM nodes') == [(5,)]
+        assert self.query('SELECT count(*) FROM run_nodes') == [(4 + 3,)]
+        assert self.query('SELECT header FROM ensembles WHERE'
+                          ' run_type = "noisyEdges"') == [('{"seed": 2}',)]
+
+    def test_solver_usage(self):
+        usage = {'wallSeconds': 2.0, 'userSeconds': 3.5, 'systemSeconds': 0.5,
+                 'maxRssKb': 1000, 'threads': 2, 'nodes': 10, 'edges': 20,
+                 'prizes': 5, 'dummyEdges': 5}
+        store = RunStore(self.path)
+        store.startEnsemble('noisyEdges', {'seed': 1},
+                            [dict(RUNS[0], solver=usage), RUNS[1]])
+        store.close()
+        assert self.query('SELECT run, user_seconds, max_rss_kb, edges FROM'
+                          ' run_solver JOIN runs USING (run_id)'
+                          ) == [(0, 3.5, 1000, 20)]
+
+        store = RunStore(self.path)
+        store.startEnsemble('noisyEdges', {'seed': 1}, RUNS[1:])
+        store.close()
+        assert self.query('SELECT count(*) FROM run_solver') == [(0,)]
+
+    def test_memberships(self):
+        store = RunStore(self.path)
+        store.startEnsemble('noisyEdges', {'seed': 1}, reversed(RUNS))
+        store.startEnsemble('shufflePrizes', {'seed': 1}, RUNS[:1])
+        (runs, nodeLists, edgeLists) = store.memberships('noisyEdges')
+        store.close()
+        assert runs == [0, 1]
+        # E is a root without edges, left out of the nodes of run 1
+        assert [sorted(nodes) for nodes in nodeLists] == \
+            [['A', 'B', 'C'], ['A', 'B', 'D']]
+        assert [sorted(edges) for edges in edgeLists] == \
+            [[('A', 'B'), ('A', 'C')], [('A', 'B'), ('A', 'D')]]
@@ -0,0 +1,84 @@
+'''
+Test the predicted msgsteiner run times of RuntimeModel
+'''
+
+import os, sys, math, json, shutil, tempfile
+import numpy as np
+
+# Create the path to OmicsIntegrator relative to the test_runtime_model.py
+# path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import RuntimeModel, RUNTIME_PRIOR
+from OmicsIntegrator.forest_store import RunStore
+
+def features(nodes=1000, edges=5000, D=5, dummyEdges=100, threads=1):
+    return dict(nodes=nodes, edges=edges, D=D, dummyEdges=dummyEdges,
+                threads=threads, prizes=dummyEdges)
+
+def usage(seconds, **kwargs):
+    return dict(features(**kwargs), wallSeconds=seconds, userSeconds=None,
+                systemSeconds=None, maxRssKb=None)
+
+class TestRuntimeModel:
+
+    def setup_method(self, method):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.tmpdir)
+
+    def test_prior(self):
+        model = RuntimeModel()
+        runs = [features(D=5), features(D=10), features(edges=50000),
+                features(dummyEdges=1000), features(threads=4)]
+        assert model.longestFirst(runs) == [2, 1, 3, 0, 4]
+        # Runs predicted to take the same time keep their order
+        assert model.longestFirst([features()] * 3) == [0, 1, 2]
+
+    def test_fit(self):
+        model = RuntimeModel(ridge=1e-6)
+        rng = np.random.RandomState(1)
+        for i in range(200):
+            (edges, D, dummyEdges) = (rng.randint(100, 100000),
+                                      rng.randint(2, 15),
+                                      rng.randint(0, 5000))
+            # Time grows with the dummy edges much more than in the prior
+            seconds = 1e-4 * edges * D ** 0.5 * (1 + dummyEdges) ** 0.8
+            model.add(usage(seconds, edges=edges, D=D, dummyEdges=dummyEdges,
+                            nodes=edges // 5), D)
+        model.fit()
+        assert abs(model.coefficients[4] - 0.8) < 0.01
+        assert abs(model.predict(features(edges=1000, D=4, dummyEdges=99))
+                   - 0.1 * 2 * 100 ** 0.8) < 0.1
+        # A few runs of one size only move the prior a little
+        model = RuntimeModel()
+        for i in range(3):
+            model.add(usage(2.0), 5)
+        model.fit()
+        assert abs(model.predict(features()) - 2.0) < 0.01
+        assert np.allclose(model.coefficients[1:], RUNTIME_PRIOR[1:],
+                           atol=0.1)
+
+    def test_recorded_runs(self):
+        header = {'params': {'D': 7}, 'run_type': 'noisyEdges'}
+        with open(os.path.join(self.tmpdir, 'a_noisyEdges_runs.jsonl'),
+                  'w') as f:
+            f.write(json.dumps(header) + '\n')
+            f.write(json.dumps({'run': 0, 'solver': usage(3.0)}) + '\n')
+            f.write(json.dumps({'run': 1}) + '\n')
+        store = RunStore(os.path.join(self.tmpdir, 'b_runs.sqlite'))
+        store.startEnsemble('noisyEdges', header)
+        store.addRun('noisyEdges', {
+            'run': 0, 'seed': 1, 'elapsed': 4.0, 'solver': usage(4.0),
+            'objective': {'total': 1.0, 'excludedPrizes': 0.5,
+                          'edgeCosts': 0.5, 'trees': 0.0},
+            'nodes': ['A'], 'roots': [], 'edges': []})
+        store.close()
+        model = RuntimeModel()
+        model.addDirectory(self.tmpdir)
+        assert model.times == [math.log(3.0), math.log(4.0)]
+        assert model.rows[0][3] == math.log(7)
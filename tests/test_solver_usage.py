@@ -0,0 +1,47 @@
+'''
+Test the accounting of the resources used by msgsteiner
+'''
+
+import os, sys, time
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_solver_usage.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFInput, BudgetExceeded, \
+    summarizeSolverUsage
+
+class TestSolverUsage:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files, monkeypatch):
+        self.monkeypatch = monkeypatch
+        self.inputObj = PCSFInput(
+            forest_files.prize_file, forest_files.edge_file,
+            forest_files.conf_file, 'terminals', [], None, 0, False, False)
+
+    def test_usage(self):
+        (edge_list, info) = self.inputObj.runPCSF(1)
+        assert sorted(edge_list.split('\n')) == ['', 'A DUMMY', 'C DUMMY']
+        usage = self.inputObj.solverUsage
+        assert (usage['nodes'], usage['edges'], usage['prizes'],
+                usage['dummyEdges']) == (4, 3, 2, 2)
+        assert usage['wallSeconds'] > 0
+        if hasattr(os, 'wait4'):
+            assert usage['userSeconds'] > 0
+            assert usage['maxRssKb'] > 0
+        assert 'msgsteiner input: 4 nodes, 3 edges, 2 prizes, 2 dummy' \
+            ' edges.' in info
+
+        line = summarizeSolverUsage([usage, usage])
+        assert line.startswith('msgsteiner per run: mean wall seconds')
+
+    def test_deadline(self):
+        self.monkeypatch.setenv('SLEEP', '10')
+        start = time.time()
+        with pytest.raises(BudgetExceeded):
+            self.inputObj.runPCSF(1, start + 0.5)
+        assert time.time() - start < 5
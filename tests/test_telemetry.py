@@ -0,0 +1,74 @@
+'''
+Test the per-stage telemetry of forest_telemetry
+'''
+
+import os, sys, json
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_telemetry.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import PCSFOutput
+from OmicsIntegrator.forest_telemetry import enableTelemetry, \
+    disableTelemetry, stage, telemetryMark, telemetryRecords, summarize, \
+    writeTelemetry, NULL_STAGE
+
+class TestTelemetry:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files):
+        self.files = forest_files
+        self.tmpdir = forest_files.tmpdir
+        # With negative prizes
+        forest_files.write('conf.txt', 'w = 1\nb = 1\nD = 5\nmu = 0.1\n')
+        yield
+        disableTelemetry()
+
+    def build_output(self):
+        return PCSFOutput(self.files.inputs(), 'B A\nC B\nA DUMMY\n', '',
+                          self.tmpdir, 'result', 1)
+
+    def test_disabled(self):
+        assert stage('parse_edges') is NULL_STAGE
+        self.build_output()
+        assert telemetryRecords() == []
+
+    def test_stages(self):
+        enableTelemetry(memory=True)
+        start = telemetryMark()
+        self.build_output()
+        records = telemetryRecords(start, 'main')
+        assert [record['stage'] for record in records] == [
+            'parse_edges', 'read_prizes', 'neg_prizes', 'parse_output',
+            'aug_forest', 'betweenness']
+        for record in records:
+            assert record['run'] == 'main'
+            assert record['wallSeconds'] >= 0
+            assert record['peakBytes'] >= 0
+
+    def test_write(self):
+        enableTelemetry()
+        self.build_output()
+        with stage('merge'):
+            pass
+        records = telemetryRecords(0, 'parent')
+        records += [dict(record, run='noisyEdges_%i' % i)
+                    for i in range(2) for record in records[3:5]]
+        totals = summarize(records)
+        noisy = [total for total in totals if total['runs'] == 'noisyEdges']
+        assert [total['count'] for total in noisy] == [2, 2]
+        assert noisy[0]['allocatedBytes'] is None
+
+        writeTelemetry(self.tmpdir, 'result', records)
+        with open(os.path.join(self.tmpdir, 'result_info.txt')) as f:
+            lines = f.read().splitlines()
+        # The run information stays first, the telemetry block is appended
+        assert lines[1].startswith('Total objective function')
+        block = lines[lines.index('Telemetry:') + 1:]
+        assert [json.loads(line) for line in block] == totals
+        with open(os.path.join(self.tmpdir, 'result_telemetry.json')) as f:
+            sidecar = json.load(f)
+        assert len(sidecar['records']) == len(records)
@@ -0,0 +1,118 @@
+'''
+Test the msgsteiner threads chosen by the ThreadScheduler
+'''
+
+import os, sys, copy, subprocess
+from types import SimpleNamespace
+
+# Create the path to OmicsIntegrator relative to the test_thread_scheduler.py
+# path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+REPO = path
+del path
+
+from OmicsIntegrator.forest import PCSFInput, ThreadScheduler
+
+class TestThreadScheduler:
+
+    def start(self, scheduler, numTasks):
+        '''Starts numTasks tasks, each in a worker of its own'''
+        workers = [copy.copy(scheduler) for i in range(numTasks)]
+        for worker in workers:
+            worker.taskStarted()
+        return workers
+
+    def test_threads_auto(self, forest_files):
+        forest_files.write('conf.txt', 'w = 1\nb = 1\nD = 5\nthreads = auto\n')
+        assert PCSFInput.interactome(forest_files.edge_file,
+                                     forest_files.conf_file).threads == 0
+
+    def test_full_pool(self):
+        scheduler = ThreadScheduler(processes=8, cores=8)
+        scheduler.submitted(20)
+        workers = self.start(scheduler, 8)
+        # Enough runs for every core, one thread each
+        assert [worker.acquire() for worker in workers] == [1] * 8
+        for worker in workers:
+            worker.release(1, 10.0, None)
+            worker.taskFinished()
+        assert scheduler.busyThreads.value == 0
+        assert scheduler.running.value == 0
+
+    def test_stragglers(self):
+        scheduler = ThreadScheduler(processes=8, cores=8)
+        scheduler.submitted(3)
+        workers = self.start(scheduler, 3)
+        threads = [worker.acquire() for worker in workers]
+        # The idle cores are shared by the last runs
+        assert threads == [2, 3, 3]
+        workers[0].release(2, 10.0, None)
+        workers[0].taskFinished()
+        # A failed task frees its worker without running msgsteiner
+        scheduler.submitted(2)
+        (failed, last) = self.start(scheduler, 2)
+        failed.taskFinished()
+        assert last.acquire() == 2
+        assert scheduler.busyThreads.value == 8
+
+    def test_poor_scaling(self):
+        scheduler = ThreadScheduler(processes=2, cores=8)
+        scheduler.submitted(1)
+        (worker,) = self.start(scheduler, 1)
+        assert worker.acquire() == 8
+        # msgsteiner kept 1.5 CPUs busy with 8 threads
+        worker.release(8, 10.0, SimpleNamespace(ru_utime=14.0, ru_stime=1.0))
+        worker.taskFinished()
+        scheduler.submitted(1)
+        (worker,) = self.start(scheduler, 1)
+        assert worker.acquire() == 2
+
+    def run(self, scheduler, wall=10.0, rusage=None):
+        '''Runs one task, returns its threads'''
+        scheduler.submitted(1)
+        (worker,) = self.start(scheduler, 1)
+        threads = worker.acquire()
+        worker.release(threads, wall, rusage)
+        worker.taskFinished()
+        return threads
+
+    def test_cap_recovers(self):
+        scheduler = ThreadScheduler(processes=2, cores=8, window=3)
+        # A tiny run keeps 1 CPU busy with 8 threads
+        assert self.run(scheduler, 10.0,
+                        SimpleNamespace(ru_utime=5.0, ru_stime=1.0)) == 8
+        # The next runs, e.g. of other jobs of a server, get one thread
+        assert [self.run(scheduler) for i in range(3)] == [1, 1, 1]
+        # Once the tiny run is out of the window, the cap is lifted
+        assert self.run(scheduler, 10.0,
+                        SimpleNamespace(ru_utime=60.0, ru_stime=2.0)) == 8
+        # While a run that used its threads well is in the window, another
+        # tiny run does not cap the runs after it
+        assert self.run(scheduler, 10.0,
+                        SimpleNamespace(ru_utime=5.0, ru_stime=1.0)) == 8
+        assert self.run(scheduler) == 8
+
+    def test_spawned_workers(self, tmp_path):
+        # Workers started with spawn, the default on macOS, do not inherit
+        # the globals of the parent and get the scheduler from the pool
+        # initializer
+        script = tmp_path / 'spawn.py'
+        script.write_text('''
+import sys
+import multiprocessing as mp
+sys.path.insert(1, %r)
+from OmicsIntegrator.forest import ThreadScheduler, initWorker, \\
+    acquireThreads
+if __name__ == "__main__":
+    mp.set_start_method("spawn")
+    scheduler = ThreadScheduler(processes=1, cores=4)
+    pool = mp.Pool(1, initWorker, (None, scheduler))
+    print(pool.apply(acquireThreads))
+    pool.close()
+    pool.join()
+    print(scheduler.busyThreads.value)
+''' % REPO)
+        output = subprocess.check_output([sys.executable, str(script)])
+        assert output.split() == [b'4', b'4']
@@ -0,0 +1,42 @@
+'''
+Test the wall-clock budget for ensembles
+'''
+
+import os, sys, time, pytest
+
+# Create the path to OmicsIntegrator relative to the test_time_budget.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator.forest import TimeBudget
+
+class TestTimeBudget:
+
+    def test_start_once(self):
+        budget = TimeBudget(60)
+        assert budget.deadline is None
+        budget.start()
+        deadline = budget.deadline
+        budget.start()
+        assert budget.deadline == deadline
+        assert 59 < budget.remaining() <= 60
+
+    def test_allows(self):
+        budget = TimeBudget(100)
+        budget.start()
+        # Before any run finished, only the deadline counts
+        assert budget.allows(None, 10, 2)
+        # 10 runs on 4 processes take 3 waves
+        assert budget.allows(30, 10, 4)
+        assert not budget.allows(40, 10, 4)
+
+    def test_deadline_passed(self):
+        budget = TimeBudget(60)
+        budget.deadline = time.time() - 1
+        assert not budget.allows(None, 1, 1)
+
+    def test_positive(self):
+        with pytest.raises(ValueError):
+            TimeBudget(0)
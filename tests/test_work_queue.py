@@ -0,0 +1,148 @@
+'''
+Test the shared directory work queue with several local worker processes
+'''
+
+import os, sys, json
+import multiprocessing as mp
+import pytest
+
+# Create the path to OmicsIntegrator relative to the test_work_queue.py path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from OmicsIntegrator import forest_queue
+from OmicsIntegrator.forest_queue import submitSpec, queueStatus, \
+    QueueWorker, reduceQueue
+
+class TestWorkQueue:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, forest_files, monkeypatch):
+        self.tmpdir = forest_files.tmpdir
+        self.log = os.path.join(self.tmpdir, 'solves.txt')
+        monkeypatch.setenv('FAKE_MSGSTEINER_LOG', self.log)
+        self.spec = {'edgeFile': forest_files.edge_file,
+                     'confFile': forest_files.conf_file,
+                     'prizeFile': forest_files.prize_file, 'seed': 3}
+        self.queue = os.path.join(self.tmpdir, 'queue')
+        self.outdir = os.path.join(self.tmpdir, 'out')
+        os.mkdir(self.outdir)
+
+    def run_workers(self, count):
+        worker = QueueWorker(self.queue)
+        processes = [mp.Process(target=worker.work) for i in range(count)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+
+    def solves(self):
+        with open(self.log) as f:
+            return f.read().split()
+
+    def test_sweep(self):
+        spec = dict(self.spec, sweep={'w': [1, 2], 'D': [3, 4, 6]})
+        assert submitSpec(self.queue, spec) == 6
+        assert queueStatus(self.queue)['todo'] == 6
+        self.run_workers(3)
+        assert queueStatus(self.queue) == {'todo': 0, 'claimed': 0,
+                                           'done': 6, 'failed': 0}
+        # Every task was run exactly once
+        assert sorted(self.solves()) == ['3', '3', '4', '4', '6', '6']
+        reduceQueue(self.queue, self.outdir, 'grid')
+        with open(os.path.join(self.outdir, 'grid_sweep.txt')) as f:
+            rows = [line.split('\t') for line in f.read().splitlines()]
+        assert rows[0][:3] == ['task', 'D', 'w']
+        assert [(row[1], row[2]) for row in rows[1:]] == [
+            ('3', '1.0'), ('3', '2.0'), ('4', '1.0'), ('4', '2.0'),
+            ('6', '1.0'), ('6', '2.0')]
+        assert all(row[5] == '0' for row in rows[1:])
+
+    def test_ensemble(self):
+        spec = dict(self.spec,
+                    ensemble={'runType': 'noisyEdges', 'runs': 5})
+        submitSpec(self.queue, spec)
+        self.run_workers(2)
+        assert len(self.solves()) == 5
+        reduceQueue(self.queue, self.outdir, 'ens')
+        assert os.path.exists(os.path.join(
+            self.outdir, 'ens_noisyEdges_merged_optimalForest.sif'))
+        # The reduced runs form a run manifest that forest.py can resume
+        with open(os.path.join(self.outdir,
+                               'ens_noisyEdges_runs.jsonl')) as f:
+            lines = [json.loads(line) for line in f]
+        assert lines[0]['run_type'] == 'noisyEdges'
+        assert [record['seed'] for record in lines[1:]] == [3, 4, 5, 6, 7]
+
+    def test_stale_and_failed(self):
+        spec = dict(self.spec, sweep={'prizeFile': [
+            self.spec['prizeFile'], os.path.join(self.tmpdir, 'missing.txt')
+        ]})
+        submitSpec(self.queue, spec)
+        worker = QueueWorker(self.queue, staleAfter=60.0)
+        # A worker claims a task and dies
+        (task, claimed) = worker.claim()
+        assert worker.requeueStale() == 0
+        os.utime(claimed, (0, 0))
+        assert worker.work() == 2
+        status = queueStatus(self.queue)
+        assert (status['done'], status['failed'], status['claimed']) == \
+            (1, 1, 0)
+        assert len(self.solves()) == 1
+
+    def test_old_queue(self):
+        spec = dict(self.spec, sweep={'D': [2, 3, 4, 5, 6, 7, 8, 9]})
+        submitSpec(self.queue, spec)
+        # Submitted long before the workers start, fresh claims must not be
+        # taken for stale ones by the other worker
+        todo = os.path.join(self.queue, 'todo')
+        for name in os.listdir(todo):
+            os.utime(os.path.join(todo, name), (0, 0))
+        worker = QueueWorker(self.queue, staleAfter=60.0)
+        processes = [mp.Process(target=worker.work) for i in range(2)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+        assert queueStatus(self.queue) == {'todo': 0, 'claimed': 0,
+                                           'done': 8, 'failed': 0}
+        # No task was requeued and run twice
+        assert sorted(self.solves()) == [str(d) for d in range(2, 10)]
+
+    def sweep_after_rename(self, monkeypatch, staleAfter):
+        '''Makes another worker put stale claims back in todo right after
+        the next claim renames its task'''
+        other = QueueWorker(self.queue, staleAfter=staleAfter)
+        rename = os.rename
+        requeued = []
+
+        def renameAndSweep(src, dst):
+            rename(src, dst)
+            if not requeued:
+                requeued.append(None)
+                requeued.append(other.requeueStale())
+        monkeypatch.setattr(forest_queue.os, 'rename', renameAndSweep)
+        return requeued
+
+    def test_fresh_claim(self, monkeypatch):
+        submitSpec(self.queue, dict(self.spec, sweep={'D': [2]}))
+        todo = os.path.join(self.queue, 'todo', 'task000000.json')
+        os.utime(todo, (0, 0))
+        worker = QueueWorker(self.queue, staleAfter=60.0)
+        requeued = self.sweep_after_rename(monkeypatch, 60.0)
+        (task, claimed) = worker.claim()
+        assert requeued == [None, 0]
+        assert os.path.exists(claimed)
+
+    def test_lost_claim(self, monkeypatch):
+        submitSpec(self.queue, dict(self.spec, sweep={'D': [2]}))
+        worker = QueueWorker(self.queue, staleAfter=60.0)
+        # The other worker takes every claim for a stale one
+        requeued = self.sweep_after_rename(monkeypatch, -1.0)
+        assert worker.claim() is None
+        assert requeued == [None, 1]
+        assert queueStatus(self.queue)['todo'] == 1